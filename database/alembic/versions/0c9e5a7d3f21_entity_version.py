@@ -0,0 +1,36 @@
+"""entity-version
+
+Revision ID: 0c9e5a7d3f21
+Revises: b7d41c2e9a10
+Create Date: 2026-10-17 11:40:07.502316
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0c9e5a7d3f21"
+down_revision = "b7d41c2e9a10"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "entity_version",
+        sa.Column("name", sa.Unicode, primary_key=True),
+        sa.Column(
+            "version", sa.BigInteger, nullable=False, server_default="0"
+        ),
+        sa.Column(
+            "updated",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+
+
+def downgrade():
+    op.drop_table("entity_version")
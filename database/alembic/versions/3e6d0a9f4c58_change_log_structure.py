@@ -0,0 +1,122 @@
+"""change-log of structural changes
+
+Revision ID: 3e6d0a9f4c58
+Revises: 9c4f2b7e5a31
+Create Date: 2026-10-18 14:27:03.604118
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3e6d0a9f4c58"
+down_revision = "9c4f2b7e5a31"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Changes which make cells (un)reachable, or add cells, are logged as
+    # changes of all affected cells.
+    op.execute("""
+        CREATE FUNCTION log_team_cells() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO change_log (table_name, team_name, key_name)
+            SELECT 'team_station_state', NEW.name, station.name
+            FROM station;
+            RETURN NULL;
+        END;
+        $$
+        """)
+    op.execute("""
+        CREATE FUNCTION log_station_cells() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO change_log (table_name, team_name, key_name)
+            SELECT 'team_station_state', team.name, NEW.name
+            FROM team;
+            RETURN NULL;
+        END;
+        $$
+        """)
+    op.execute("""
+        CREATE FUNCTION log_route_cells() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                INSERT INTO change_log (table_name, team_name, key_name)
+                SELECT 'team_station_state', team.name, OLD.station_name
+                FROM team
+                WHERE team.route_name = OLD.route_name;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO change_log (table_name, team_name, key_name)
+                SELECT 'team_station_state', team.name, NEW.station_name
+                FROM team
+                WHERE team.route_name = NEW.route_name;
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """)
+    # Rows and columns which disappear from the dashboard can not be sent as
+    # changes. The horizon is moved past the writing transaction instead, so
+    # clients have to reload the full dashboard.
+    op.execute("""
+        CREATE FUNCTION reset_change_log_horizon() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE change_log_horizon
+            SET txid = greatest(
+                txid, pg_current_xact_id()::text::bigint + 1
+            );
+            RETURN NULL;
+        END;
+        $$
+        """)
+    op.execute("""
+        CREATE TRIGGER log_cells
+        AFTER INSERT OR UPDATE OF route_name ON team
+        FOR EACH ROW
+        EXECUTE FUNCTION log_team_cells()
+        """)
+    op.execute("""
+        CREATE TRIGGER log_cells
+        AFTER INSERT ON station
+        FOR EACH ROW
+        EXECUTE FUNCTION log_station_cells()
+        """)
+    op.execute("""
+        CREATE TRIGGER log_cells
+        AFTER INSERT OR UPDATE OR DELETE ON route_station
+        FOR EACH ROW
+        EXECUTE FUNCTION log_route_cells()
+        """)
+    for table in ("team", "station", "questionnaire"):
+        op.execute(f"""
+            CREATE TRIGGER reset_horizon
+            AFTER DELETE ON {table}
+            FOR EACH ROW
+            EXECUTE FUNCTION reset_change_log_horizon()
+            """)
+        op.execute(f"""
+            CREATE TRIGGER reset_horizon_rename
+            AFTER UPDATE OF name ON {table}
+            FOR EACH ROW
+            WHEN (OLD.name IS DISTINCT FROM NEW.name)
+            EXECUTE FUNCTION reset_change_log_horizon()
+            """)
+
+
+def downgrade():
+    for table in ("team", "station", "questionnaire"):
+        op.execute(f"DROP TRIGGER reset_horizon_rename ON {table}")
+        op.execute(f"DROP TRIGGER reset_horizon ON {table}")
+    op.execute("DROP TRIGGER log_cells ON route_station")
+    op.execute("DROP TRIGGER log_cells ON station")
+    op.execute("DROP TRIGGER log_cells ON team")
+    op.execute("DROP FUNCTION reset_change_log_horizon()")
+    op.execute("DROP FUNCTION log_route_cells()")
+    op.execute("DROP FUNCTION log_station_cells()")
+    op.execute("DROP FUNCTION log_team_cells()")
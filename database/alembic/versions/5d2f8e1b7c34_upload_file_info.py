@@ -0,0 +1,29 @@
+"""upload-file-info
+
+Revision ID: 5d2f8e1b7c34
+Revises: 0c9e5a7d3f21
+Create Date: 2026-10-17 14:02:51.118304
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d2f8e1b7c34"
+down_revision = "0c9e5a7d3f21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("uploads", sa.Column("size", sa.BigInteger, nullable=True))
+    op.add_column(
+        "uploads",
+        sa.Column("mtime", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_column("uploads", "mtime")
+    op.drop_column("uploads", "size")
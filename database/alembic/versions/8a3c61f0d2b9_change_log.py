@@ -0,0 +1,95 @@
+"""change-log
+
+Revision ID: 8a3c61f0d2b9
+Revises: 5d2f8e1b7c34
+Create Date: 2026-10-17 16:41:09.551920
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8a3c61f0d2b9"
+down_revision = "5d2f8e1b7c34"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "change_log",
+        sa.Column("id", sa.BigInteger, primary_key=True),
+        sa.Column(
+            "txid",
+            sa.BigInteger,
+            nullable=False,
+            server_default=sa.text("pg_current_xact_id()::text::bigint"),
+            index=True,
+        ),
+        sa.Column("table_name", sa.Unicode, nullable=False),
+        sa.Column("team_name", sa.Unicode, nullable=False),
+        sa.Column("key_name", sa.Unicode, nullable=False),
+        sa.Column(
+            "inserted",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    # The trigger arguments are the names of the team and station (or
+    # questionnaire) columns of the logged table.
+    op.execute("""
+        CREATE FUNCTION log_team_change() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            old_row jsonb := to_jsonb(OLD);
+            new_row jsonb := to_jsonb(NEW);
+        BEGIN
+            IF TG_OP = 'DELETE' OR (
+                TG_OP = 'UPDATE' AND (
+                    old_row ->> TG_ARGV[0],
+                    old_row ->> TG_ARGV[1]
+                ) IS DISTINCT FROM (
+                    new_row ->> TG_ARGV[0],
+                    new_row ->> TG_ARGV[1]
+                )
+            ) THEN
+                INSERT INTO change_log (table_name, team_name, key_name)
+                VALUES (
+                    TG_TABLE_NAME,
+                    old_row ->> TG_ARGV[0],
+                    old_row ->> TG_ARGV[1]
+                );
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO change_log (table_name, team_name, key_name)
+                VALUES (
+                    TG_TABLE_NAME,
+                    new_row ->> TG_ARGV[0],
+                    new_row ->> TG_ARGV[1]
+                );
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """)
+    op.execute("""
+        CREATE TRIGGER log_change
+        AFTER INSERT OR UPDATE OR DELETE ON team_station_state
+        FOR EACH ROW
+        EXECUTE FUNCTION log_team_change('team_name', 'station_name')
+        """)
+    op.execute("""
+        CREATE TRIGGER log_change
+        AFTER INSERT OR UPDATE OR DELETE ON questionnaire_score
+        FOR EACH ROW
+        EXECUTE FUNCTION log_team_change('team', 'questionnaire')
+        """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER log_change ON questionnaire_score")
+    op.execute("DROP TRIGGER log_change ON team_station_state")
+    op.execute("DROP FUNCTION log_team_change()")
+    op.drop_table("change_log")
@@ -0,0 +1,30 @@
+"""change-log retention
+
+Revision ID: 9c4f2b7e5a31
+Revises: f7a2c93e1d48
+Create Date: 2026-10-18 09:12:40.318204
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9c4f2b7e5a31"
+down_revision = "f7a2c93e1d48"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_change_log_inserted", "change_log", ["inserted"])
+    op.create_table(
+        "change_log_horizon",
+        sa.Column("txid", sa.BigInteger, primary_key=True),
+    )
+    op.execute("INSERT INTO change_log_horizon (txid) VALUES (0)")
+
+
+def downgrade():
+    op.drop_table("change_log_horizon")
+    op.drop_index("ix_change_log_inserted", table_name="change_log")
@@ -0,0 +1,71 @@
+"""team-score
+
+Revision ID: b7d41c2e9a10
+Revises: 4e827a0d51ba
+Create Date: 2026-10-17 09:12:41.118203
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b7d41c2e9a10"
+down_revision = "4e827a0d51ba"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "team_score",
+        sa.Column(
+            "team_name",
+            sa.Unicode,
+            sa.ForeignKey("team.name", onupdate="CASCADE", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "station_score", sa.Integer, nullable=False, server_default="0"
+        ),
+        sa.Column(
+            "questionnaire_score",
+            sa.Integer,
+            nullable=False,
+            server_default="0",
+        ),
+        sa.Column(
+            "updated",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.execute(
+        """
+        INSERT INTO team_score (team_name, station_score, questionnaire_score)
+        SELECT
+            team.name,
+            COALESCE(
+                (
+                    SELECT SUM(score)
+                    FROM team_station_state
+                    WHERE team_name = team.name
+                ),
+                0
+            ),
+            COALESCE(
+                (
+                    SELECT SUM(score)
+                    FROM questionnaire_score
+                    WHERE team = team.name
+                ),
+                0
+            )
+        FROM team
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("team_score")
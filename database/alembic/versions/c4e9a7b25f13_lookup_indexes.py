@@ -0,0 +1,65 @@
+"""lookup-indexes
+
+Revision ID: c4e9a7b25f13
+Revises: 8a3c61f0d2b9
+Create Date: 2026-10-17 18:12:40.318204
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4e9a7b25f13"
+down_revision = "8a3c61f0d2b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Station.team_states and Station.states. The included columns allow
+    # index-only scans.
+    op.create_index(
+        "team_station_state_station_idx",
+        "team_station_state",
+        ["station_name"],
+        postgresql_include=["state", "score"],
+    )
+    # Station.team_states and Station.routes
+    op.create_index(
+        "route_station_station_idx", "route_station", ["station_name"]
+    )
+    # Station.team_states and Route.teams (ordered by team-name)
+    op.create_index("team_route_idx", "team", ["route_name", "name"])
+    # Station.questionnaires
+    op.create_index(
+        "questionnaire_station_idx",
+        "questionnaire",
+        ["station_name"],
+        postgresql_include=["name"],
+    )
+    # Questionnaire.teams
+    op.create_index(
+        "questionnaire_score_questionnaire_idx",
+        "questionnaire_score",
+        ["questionnaire"],
+        postgresql_include=["score"],
+    )
+    # Upload.list with the keyset-pagination of Upload.page
+    op.create_index("uploads_username_id_idx", "uploads", ["username", "id"])
+    # The audit-log, newest first
+    op.create_index("auditlog_timestamp_idx", "auditlog", ["timestamp"])
+
+
+def downgrade():
+    op.drop_index("auditlog_timestamp_idx", table_name="auditlog")
+    op.drop_index("uploads_username_id_idx", table_name="uploads")
+    op.drop_index(
+        "questionnaire_score_questionnaire_idx",
+        table_name="questionnaire_score",
+    )
+    op.drop_index("questionnaire_station_idx", table_name="questionnaire")
+    op.drop_index("team_route_idx", table_name="team")
+    op.drop_index("route_station_station_idx", table_name="route_station")
+    op.drop_index(
+        "team_station_state_station_idx", table_name="team_station_state"
+    )
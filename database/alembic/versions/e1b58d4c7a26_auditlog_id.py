@@ -0,0 +1,39 @@
+"""auditlog-id
+
+Revision ID: e1b58d4c7a26
+Revises: c4e9a7b25f13
+Create Date: 2026-10-17 19:03:27.804615
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "e1b58d4c7a26"
+down_revision = "c4e9a7b25f13"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Entries can share the same timestamp (and user), so the keyset of the
+    # audit-log pages needs a unique column as tie-breaker.
+    op.add_column(
+        "auditlog",
+        sa.Column("id", sa.BigInteger, sa.Identity(), nullable=False),
+    )
+    op.create_primary_key("auditlog_pkey", "auditlog", ["id"])
+    op.drop_index("auditlog_timestamp_idx", table_name="auditlog")
+    op.create_index("auditlog_timestamp_idx", "auditlog", ["timestamp", "id"])
+    op.create_index(
+        "auditlog_user_timestamp_idx", "auditlog", ["user", "timestamp", "id"]
+    )
+
+
+def downgrade():
+    op.drop_index("auditlog_user_timestamp_idx", table_name="auditlog")
+    op.drop_index("auditlog_timestamp_idx", table_name="auditlog")
+    op.create_index("auditlog_timestamp_idx", "auditlog", ["timestamp"])
+    op.drop_constraint("auditlog_pkey", "auditlog")
+    op.drop_column("auditlog", "id")
@@ -0,0 +1,31 @@
+"""auditlog-outbox
+
+Revision ID: f7a2c93e1d48
+Revises: e1b58d4c7a26
+Create Date: 2026-10-17 20:26:51.117342
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f7a2c93e1d48"
+down_revision = "e1b58d4c7a26"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "auditlog_outbox",
+        sa.Column("id", sa.BigInteger, sa.Identity(), primary_key=True),
+        sa.Column("timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("user", sa.Unicode),
+        sa.Column("type", sa.Unicode, nullable=False),
+        sa.Column("message", sa.Unicode, nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("auditlog_outbox")
@@ -0,0 +1,268 @@
+"""
+Writing entries to the audit-trail.
+
+* :py:class:`SyncSink` inserts the entries into the audit-log right away.
+* :py:class:`OutboxSink` collects the entries of a transaction and writes
+  them with one statement into an outbox table when the transaction is
+  committed. A background thread moves them from there into the audit-log
+  in batches.
+
+With both, the entries are stored (or discarded) together with the changes
+they describe.
+"""
+
+import logging
+import threading
+from configparser import ConfigParser
+from datetime import datetime, timezone
+from typing import Tuple
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import core, model, versioning
+
+LOG = logging.getLogger(__name__)
+
+#: The key in "session.info" collecting the entries for the outbox
+PENDING_ENTRIES = "powonline.audit_entries"
+
+
+class AuditSink:
+    @staticmethod
+    def create(config: ConfigParser) -> "AuditSink":
+        sink = config.get("audit", "sink", fallback="sync")
+        if sink == "outbox":
+            return OutboxSink(
+                config.getint("audit", "batch_size", fallback=500),
+                config.getfloat("audit", "flush_interval", fallback=5),
+            )
+        elif sink != "sync":
+            LOG.warning("Unknown audit sink %r. Using 'sync'", sink)
+        return SyncSink()
+
+    def add(
+        self,
+        session: Session,
+        username: str,
+        entries: list[Tuple[model.AuditType, str]],
+    ) -> None:
+        """
+        Add ``(type, message)`` entries to the audit-trail in the current
+        transaction of *session*.
+        """
+        raise NotImplementedError("Not yet implemented")
+
+    def flush(self) -> None:
+        """
+        Make all committed entries visible in the audit-log
+        """
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+    def close(self) -> None:
+        """
+        Stop the background work of the sink (if any)
+        """
+
+
+class SyncSink(AuditSink):
+    """
+    Inserts entries into the audit-log with the statement adding them
+    """
+
+    def add(self, session, username, entries):
+        core.add_audit_logs(session, username, entries)
+
+
+class OutboxSink(AuditSink):
+    """
+    Writes entries into the "auditlog_outbox" table when the transaction is
+    committed, or earlier when *batch_size* entries are pending.
+
+    The entries are moved into the audit-log by a background thread (started
+    on first use) in batches of up to *batch_size* entries. This happens
+    every *flush_interval* seconds, or as soon as *batch_size* entries were
+    added by this process. Entries of all processes share the same outbox,
+    so any process may move them. Without *background*, they are only moved
+    by :py:meth:`flush`.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 5,
+        background: bool = True,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self.moved = 0
+        self.failed = 0
+        self._added = 0
+        self._engine: Engine | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self._condition = threading.Condition()
+
+    def add(self, session, username, entries):
+        if not entries:
+            return
+        # Begins the transaction (if necessary) which the entries belong to
+        session.connection()
+        now = datetime.now(timezone.utc)
+        pending = session.info.setdefault(PENDING_ENTRIES, [])
+        pending.extend(
+            {
+                "timestamp": now,
+                "user": username,
+                "type": type_.value,
+                "message": message,
+            }
+            for type_, message in entries
+        )
+        versioning.mark_changed(session, model.AuditOutbox.__tablename__)
+        if len(pending) >= self.batch_size:
+            write_pending(session)
+        self._start(model.DB.engine)
+        with self._condition:
+            self._added += len(entries)
+            if self._added >= self.batch_size:
+                self._condition.notify_all()
+
+    def _start(self, engine: Engine) -> None:
+        if not self.background:
+            return
+        with self._condition:
+            if self._stopped.is_set():
+                return
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._engine = engine
+            self._thread = threading.Thread(
+                target=self._run, name="audit-outbox", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._added >= self.batch_size
+                    or self._stopped.is_set(),
+                    self.flush_interval,
+                )
+                self._added = 0
+            if self._stopped.is_set():
+                return
+            try:
+                self.flush()
+            except Exception:
+                self.failed += 1
+                LOG.exception("Unable to move entries into the audit-log")
+
+    def flush(self) -> None:
+        if self._engine is None:
+            self._engine = model.DB.engine
+        while True:
+            with self._engine.begin() as connection:
+                moved = drain(connection, self.batch_size)
+            self.moved += moved
+            if moved < self.batch_size:
+                return
+
+    def stats(self) -> dict[str, int]:
+        return {"moved": self.moved, "failed": self.failed}
+
+    def close(self) -> None:
+        """
+        Stop the background thread and wait for it to finish. Committed
+        entries which were not moved yet remain in the outbox.
+        """
+        with self._condition:
+            self._stopped.set()
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+
+def write_pending(session: Session) -> None:
+    """
+    Write the entries collected by :py:class:`OutboxSink` with one statement
+    into the outbox.
+    """
+    pending = session.info.pop(PENDING_ENTRIES, None)
+    if not pending:
+        return
+    # Executed on the connection to bypass the session-events. The outbox
+    # was already marked as changed when the entries were added.
+    session.connection().execute(insert(model.AuditOutbox.__table__), pending)
+
+
+def drain(connection, limit: int) -> int:
+    """
+    Move up to *limit* of the oldest entries from the outbox into the
+    audit-log. Returns the number of moved entries.
+
+    Entries locked by a concurrent transaction are skipped. Users deleted
+    in the meantime are replaced with NULL (as the foreign-key of the
+    audit-log would do).
+    """
+    outbox = model.AuditOutbox.__table__
+    auditlog = model.AuditLog.__table__
+    user = model.User.__table__
+    oldest = (
+        select(outbox.c.id)
+        .order_by(outbox.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    batch = (
+        delete(outbox)
+        .where(outbox.c.id.in_(oldest.scalar_subquery()))
+        .returning(*outbox.c)
+        .cte("batch")
+    )
+    query = (
+        insert(auditlog)
+        .from_select(
+            ["timestamp", "user", "type", "message"],
+            select(
+                batch.c.timestamp, user.c.name, batch.c.type, batch.c.message
+            )
+            .select_from(batch.outerjoin(user, user.c.name == batch.c.user))
+            .order_by(batch.c.id),
+        )
+        .add_cte(batch)
+        .execution_options(preserve_rowcount=True)
+    )
+    return connection.execute(query).rowcount
+
+
+def _before_commit(session):
+    write_pending(session)
+
+
+def _after_rollback(session):
+    session.info.pop(PENDING_ENTRIES, None)
+
+
+LISTENERS = [
+    ("before_commit", _before_commit),
+    ("after_rollback", _after_rollback),
+]
+
+
+def install(session_class=Session) -> None:
+    """
+    Register the session-events writing the entries of
+    :py:class:`OutboxSink`.
+
+    Calling this more than once is harmless.
+    """
+    for name, listener in LISTENERS:
+        if not event.contains(session_class, name, listener):
+            event.listen(session_class, name, listener)
@@ -0,0 +1,206 @@
+"""
+Caches for rendered responses.
+
+Entries are keyed by entity-tags derived from data-versions (see
+:py:mod:`powonline.versioning`), so a write to the database naturally leads
+to new keys. The time-to-live only bounds how long unused entries linger.
+"""
+
+import logging
+import sqlite3
+import threading
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict
+from configparser import ConfigParser
+from time import monotonic, time
+
+LOG = logging.getLogger(__name__)
+
+
+class ResponseCache(metaclass=ABCMeta):
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def create(config: ConfigParser) -> "ResponseCache":
+        backend = config.get("cache", "backend", fallback="memory")
+        ttl = config.getfloat("cache", "ttl", fallback=60)
+        max_entries = config.getint("cache", "max_entries", fallback=512)
+        if backend == "memory":
+            return MemoryCache(ttl, max_entries)
+        elif backend == "sqlite":
+            path = config.get(
+                "cache", "path", fallback="/tmp/powonline-cache.sqlite"
+            )
+            return SqliteCache(path, ttl, max_entries)
+        elif backend != "none":
+            LOG.warning("Unknown cache backend %r. Caching disabled!", backend)
+        return NullCache()
+
+    @abstractmethod
+    def get(self, key: str) -> tuple[str, bytes] | None:
+        """
+        Return the mimetype and content stored for *key* if available
+        """
+        raise NotImplementedError("Not yet implemented")
+
+    @abstractmethod
+    def set(self, key: str, mimetype: str, data: bytes) -> None:
+        raise NotImplementedError("Not yet implemented")
+
+    def lookup(self, key: str) -> tuple[str, bytes] | None:
+        """
+        Same as :py:meth:`get` but keeps track of hits and misses
+        """
+        output = self.get(key)
+        if output is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return output
+
+    def stats(self) -> dict[str, int | str]:
+        return {
+            "backend": self.__class__.__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class NullCache(ResponseCache):
+    """
+    A cache which never stores anything
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, mimetype, data):
+        pass
+
+
+class MemoryCache(ResponseCache):
+    """
+    An in-process LRU cache with a time-to-live per entry.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str, bytes]]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, mimetype, data = entry
+            if expires < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return mimetype, data
+
+    def set(self, key, mimetype, data):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, mimetype, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        output = super().stats()
+        output["entries"] = len(self._entries)
+        return output
+
+
+class SqliteCache(ResponseCache):
+    """
+    A cache stored in a SQLite file which can be shared by all worker
+    processes on the same host.
+    """
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "   key TEXT PRIMARY KEY,"
+                "   mimetype TEXT NOT NULL,"
+                "   data BLOB NOT NULL,"
+                "   expires REAL NOT NULL,"
+                "   accessed REAL NOT NULL"
+                ")"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        now = time()
+        try:
+            with self._connection() as connection:
+                row = connection.execute(
+                    "SELECT mimetype, data FROM response_cache "
+                    "WHERE key = ? AND expires >= ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    connection.execute(
+                        "UPDATE response_cache SET accessed = ? WHERE key = ?",
+                        (now, key),
+                    )
+        except sqlite3.Error:
+            LOG.exception("Unable to read from the response cache")
+            return None
+        if row is None:
+            return None
+        return row[0], row[1]
+
+    def set(self, key, mimetype, data):
+        now = time()
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO response_cache "
+                    "(key, mimetype, data, expires, accessed) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, mimetype, data, now + self.ttl, now),
+                )
+                connection.execute(
+                    "DELETE FROM response_cache WHERE expires < ?", (now,)
+                )
+                connection.execute(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    "   SELECT key FROM response_cache"
+                    "   ORDER BY accessed DESC LIMIT -1 OFFSET ?"
+                    ")",
+                    (self.max_entries,),
+                )
+        except sqlite3.Error:
+            LOG.exception("Unable to write to the response cache")
+
+    def stats(self):
+        output = super().stats()
+        try:
+            with self._connection() as connection:
+                (output["entries"],) = connection.execute(
+                    "SELECT COUNT(*) FROM response_cache"
+                ).fetchone()
+        except sqlite3.Error:
+            LOG.exception("Unable to read from the response cache")
+        return output
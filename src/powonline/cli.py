@@ -1,8 +1,11 @@
 import logging
+import sys
 from configparser import NoOptionError, NoSectionError
+from os.path import join
 
 import click  # type: ignore
 
+from powonline.core import Upload
 from powonline.model import DB, Role, Route, User
 from powonline.pusher import PusherWrapper
 from powonline.web import make_app
@@ -196,7 +199,6 @@ def fetch_mails(force: bool, fail_fast: bool, quiet: bool) -> int:
 
     import powonline.model as mdl
     from powonline.config import default
-    from powonline.core import Upload
     from powonline.mailfetcher import MailFetcher
 
     if quiet:
@@ -208,6 +210,9 @@ def fetch_mails(force: bool, fail_fast: bool, quiet: bool) -> int:
     Simple.basicConfig(level=log_level)
 
     config = default()
+    upload_folder = config.get(
+        "app", "upload_folder", fallback=Upload.FALLBACK_FOLDER
+    )
 
     pusher = PusherWrapper.create(
         config,
@@ -224,7 +229,11 @@ def fetch_mails(force: bool, fail_fast: bool, quiet: bool) -> int:
             db_instance = mdl.Upload.get_or_create(
                 DB.session, filename, user.name or ""
             )
+            db_instance.record_file_info(join(upload_folder, filename))
             DB.session.commit()
+            app.thumbnails.submit(
+                db_instance.uuid, join(upload_folder, filename)
+            )
             pusher.trigger(
                 "file-events",
                 "file-added",
@@ -247,7 +256,7 @@ def fetch_mails(force: bool, fail_fast: bool, quiet: bool) -> int:
             login,
             password,
             ssl,
-            config.get("app", "upload_folder", fallback=Upload.FALLBACK_FOLDER),
+            upload_folder,
             force=force,
             file_saved_callback=callback,
             fail_fast=fail_fast,
@@ -256,3 +265,87 @@ def fetch_mails(force: bool, fail_fast: bool, quiet: bool) -> int:
         fetcher.fetch()
         fetcher.disconnect()
         return 0
+
+
+@click.command()
+@click.option(
+    "--repair/--no-repair",
+    default=False,
+    help="Rebuild the materialized scoreboard if drift was detected",
+)
+def check_scoreboard(repair: bool) -> None:
+    """
+    Compares the materialized scoreboard with the team-states and
+    questionnaire-scores and reports any drift. Exits with status 1 if drift
+    was detected (and not repaired).
+    """
+    from powonline.core import Scoreboard
+
+    app = make_app()  # type: ignore
+    with app.app_context():
+        drift = Scoreboard.drift(DB.session)
+        for team_name, expected, materialized in drift:
+            print(
+                "%s: expected %s, materialized %s"
+                % (team_name, expected, materialized)
+            )
+        if not drift:
+            print("The materialized scoreboard is consistent")
+            return
+        if repair:
+            Scoreboard.rebuild(DB.session)
+            DB.session.commit()
+            print("The materialized scoreboard has been rebuilt")
+            return
+    sys.exit(1)
+
+
+@click.command()
+@click.option(
+    "--jobs",
+    "-j",
+    default=0,
+    help="Number of worker processes (default: number of CPUs)",
+)
+def generate_thumbnails(jobs: int) -> None:
+    """
+    Renders the missing thumbnails of all existing uploads. Exits with
+    status 1 if any upload could not be rendered.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from powonline.thumbnails import backfill
+
+    app = make_app()  # type: ignore
+    with app.app_context():
+        upload_folder = app.localconfig.get(
+            "app", "upload_folder", fallback=Upload.FALLBACK_FOLDER
+        )
+        uploads = [
+            (str(row.uuid), join(upload_folder, row.filename))
+            for row in Upload.all(DB.session)
+        ]
+
+    cache = app.thumbnails
+    failures = 0
+    with ProcessPoolExecutor(jobs or None) as pool:
+        futures = {
+            pool.submit(backfill, cache.folder, uuid, source): source
+            for uuid, source in uploads
+        }
+        for future in as_completed(futures):
+            try:
+                created = future.result()
+            except FileNotFoundError:
+                failures += 1
+                LOG.warning("Missing file %r", futures[future])
+            except Exception:
+                failures += 1
+                LOG.exception(
+                    "Unable to render thumbnails of %r", futures[future]
+                )
+            else:
+                LOG.info("%s: %d new thumbnails", futures[future], len(created))
+    cache.evict()
+    if failures:
+        sys.exit(1)
@@ -1,16 +1,38 @@
 import logging
-from datetime import datetime, timezone
+import threading
+from base64 import b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta, timezone
 from enum import Enum, auto
 from os import makedirs
 from os.path import basename, dirname, join
 from random import SystemRandom
 from string import ascii_letters, digits, punctuation
-from typing import Generator, Optional, Tuple
-
-from sqlalchemy import and_, func
+from time import monotonic
+from typing import Any, Generator, Optional, Tuple
+
+from sqlalchemy import (
+    BigInteger,
+    Integer,
+    Table,
+    Text,
+    and_,
+    case,
+    cast,
+    delete,
+    event,
+    func,
+    literal,
+    null,
+    or_,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Query, Session, scoped_session
+from sqlalchemy.orm.util import identity_key
 
-from . import model
+from . import model, versioning
 from .exc import (
     NoQuestionnaireForStation,
     NoSuchQuestionnaire,
@@ -20,6 +42,8 @@ from .model import TeamState
 
 LOG = logging.getLogger(__name__)
 
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
 
 class StationRelation(Enum):
     """
@@ -30,6 +54,30 @@ class StationRelation(Enum):
     NEXT = auto()
 
 
+def name_cursor(row: Any) -> str:
+    """
+    Return the pagination-cursor following *row* for entities ordered by
+    name.
+
+    Names may contain any character, so the cursor is an opaque URL-safe
+    encoding of the name, which is also valid in HTTP headers.
+    """
+    return (
+        urlsafe_b64encode(row.name.encode("utf8")).decode("ascii").rstrip("=")
+    )
+
+
+def parse_name_cursor(cursor: str) -> str:
+    """
+    Return the name encoded in a cursor of :py:func:`name_cursor`
+
+    :raises ValueError: If the cursor is invalid
+    """
+    padded = cursor + "=" * (-len(cursor) % 4)
+    name = b64decode(padded.encode("ascii"), altchars=b"-_", validate=True)
+    return name.decode("utf8")
+
+
 def get_assignments(session):
     routes = session.query(model.Route)
 
@@ -49,15 +97,60 @@ def make_default_team_state():
     return {"state": TeamState.UNKNOWN}
 
 
-def scoreboard(session):
-    teams = session.query(model.Team)
-    scores = {}
-    for row in teams:
-        station_score = sum(state.score for state in row.station_states)
-        quest_score = sum(quest.score for quest in row.questionnaire_scores)
-        scores[row.name] = sum([station_score, quest_score])
-    output = reversed(sorted(scores.items(), key=lambda x: x[1]))
-    return output
+def ranked_scoreboard(
+    session,
+) -> Generator[Tuple[int, str, int], None, None]:
+    """
+    Stream the scoreboard as ``(rank, team, score)`` tuples.
+
+    Station- and questionnaire-scores are summed and ranked in one SQL
+    statement. Teams with the same score share the same rank (the next rank
+    is skipped accordingly) and are ordered by name.
+    """
+    station_totals = (
+        session.query(
+            model.TeamStation.team_name.label("team_name"),
+            func.sum(model.TeamStation.score).label("total"),
+        )
+        .group_by(model.TeamStation.team_name)
+        .subquery()
+    )
+    questionnaire_totals = (
+        session.query(
+            model.TeamQuestionnaire.team_name.label("team_name"),
+            func.sum(model.TeamQuestionnaire.score).label("total"),
+        )
+        .group_by(model.TeamQuestionnaire.team_name)
+        .subquery()
+    )
+    score = func.coalesce(station_totals.c.total, 0) + func.coalesce(
+        questionnaire_totals.c.total, 0
+    )
+    query = (
+        session.query(
+            func.rank().over(order_by=score.desc()).label("rank"),
+            model.Team.name,
+            score.label("score"),
+        )
+        .outerjoin(
+            station_totals, station_totals.c.team_name == model.Team.name
+        )
+        .outerjoin(
+            questionnaire_totals,
+            questionnaire_totals.c.team_name == model.Team.name,
+        )
+        .order_by(score.desc(), model.Team.name)
+    )
+    for row in query:
+        yield row.rank, row.name, row.score
+
+
+def scoreboard(session) -> Generator[Tuple[str, int], None, None]:
+    """
+    Stream ``(team, score)`` tuples, the highest score first.
+    """
+    for _, team_name, score in ranked_scoreboard(session):
+        yield team_name, score
 
 
 def questionnaire_scores(
@@ -84,18 +177,83 @@ def questionnaire_scores(
     return output
 
 
-def add_audit_log(
-    session: scoped_session, username: str, type_: model.AuditType, message: str
-) -> model.AuditLog:
-    entry = model.AuditLog(
-        timestamp=datetime.now(timezone.utc),
-        username=username,
-        type_=type_,
-        message=message,
-    )
-    LOG.debug("New entry on audit-trail: %r", entry)
-    session.add(entry)
-    return entry
+def _expire(session, entity, *identity) -> None:
+    """
+    Expire an instance held by the session after it was modified by a plain
+    SQL statement.
+    """
+    instance = session.identity_map.get(identity_key(entity, identity))
+    if instance is not None:
+        session.expire(instance)
+
+
+def _set_score(
+    session,
+    table: Table,
+    key: dict[str, str],
+    team_column: str,
+    scoreboard_column: str,
+    score: Optional[int],
+    defaults: dict[str, Any] | None = None,
+) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Set the "score" column of the row of *table* identified by *key*
+    (mapping column-names to values), and add the difference to the
+    materialized scoreboard (in *scoreboard_column*) of the team named in
+    *team_column*.
+
+    An existing row is locked, updated and its previous score returned with
+    one statement. A missing row is inserted with *defaults* (also one
+    statement) and its previous score is ``None``. If a concurrent
+    transaction inserted the row in the meantime, the update is retried.
+    """
+    conditions = [table.c[name] == value for name, value in key.items()]
+    while True:
+        old = (
+            select(*[table.c[name] for name in key], table.c.score)
+            .where(*conditions)
+            .with_for_update()
+            .cte("old")
+        )
+        changed = (
+            update(table)
+            .where(*[table.c[name] == old.c[name] for name in key])
+            .values(score=score, updated=func.now())
+            .returning(
+                table.c[team_column].label("team_name"),
+                old.c.score.label("old_score"),
+                table.c.score.label("new_score"),
+            )
+            .cte("changed")
+        )
+        query = select(changed.c.old_score, changed.c.new_score).add_cte(
+            Scoreboard.add_from(changed, scoreboard_column)
+        )
+        row = session.execute(query).one_or_none()
+        if row is not None:
+            break
+
+        inserted = (
+            insert(table)
+            .values(**key, **(defaults or {}), score=score)
+            .on_conflict_do_nothing()
+            .returning(
+                table.c[team_column].label("team_name"),
+                cast(null(), Integer).label("old_score"),
+                table.c.score.label("new_score"),
+            )
+            .cte("inserted")
+        )
+        query = select(inserted.c.old_score, inserted.c.new_score).add_cte(
+            Scoreboard.add_from(inserted, scoreboard_column)
+        )
+        row = session.execute(query).one_or_none()
+        if row is not None:
+            break
+        LOG.debug("Concurrent insert into %s. Retrying update", table.name)
+
+    versioning.mark_changed(session, table.name, model.TeamScore.__tablename__)
+    return row.old_score, row.new_score
 
 
 def set_questionnaire_score(
@@ -103,61 +261,131 @@ def set_questionnaire_score(
 ):
     """
     Set the team-score for a questionaire on a given station.
-    """
-    station_entity = (
-        session.query(model.Station).filter_by(name=station).one_or_none()
-    )
-    if not station_entity:
-        raise PowonlineException(f"Station {station} not found")
 
-    if not station_entity.questionnaires:
+    Returns the previous score (``None`` if the team had none) and the new
+    score.
+    """
+    questionnaires = Station.questionnaires(session, [station]).get(station, [])
+    if not questionnaires:
+        station_entity = Station.get(session, station)
+        if not station_entity:
+            raise PowonlineException(f"Station {station} not found")
         raise NoQuestionnaireForStation(station_entity)
 
-    if len(station_entity.questionnaires) > 1:
+    if len(questionnaires) > 1:
         raise NoQuestionnaireForStation(
-            station_entity, "Multiple questionnaires assigned"
+            Station.get(session, station), "Multiple questionnaires assigned"
+        )
+
+    return _set_questionnaire_score(session, team, questionnaires[0], score)
+
+
+def _set_questionnaire_score(
+    session, team: str, questionnaire: str, score: Optional[int]
+) -> Tuple[Optional[int], Optional[int]]:
+    output = _set_score(
+        session,
+        model.TeamQuestionnaire.__table__,
+        {"team": team, "questionnaire": questionnaire},
+        "team",
+        "questionnaire_score",
+        score,
+    )
+    _expire(session, model.TeamQuestionnaire, team, questionnaire)
+    return output
+
+
+def set_questionnaire_scores(
+    session, scores: dict[Tuple[str, str], int]
+) -> dict[Tuple[str, str], Optional[int]]:
+    """
+    Set the questionnaire-scores of teams with the statements of
+    :py:func:`set_questionnaire_score`.
+
+    *scores* maps ``(team, questionnaire)`` pairs to the new score. Returns
+    the previous score of each pair (``None`` if it had none).
+    """
+    output: dict[Tuple[str, str], Optional[int]] = {}
+    # Sorted to always lock the rows in the same order
+    for team_name, questionnaire_name in sorted(scores):
+        output[(team_name, questionnaire_name)], _ = _set_questionnaire_score(
+            session,
+            team_name,
+            questionnaire_name,
+            scores[(team_name, questionnaire_name)],
         )
+    return output
 
-    existing_questionnaire = station_entity.questionnaires[0]
-    questionnaire_name = existing_questionnaire.name
 
-    query = session.query(model.TeamQuestionnaire).filter_by(
-        team_name=team, questionnaire_name=questionnaire_name
+def add_audit_logs(
+    session,
+    username: str,
+    entries: list[Tuple[model.AuditType, str]],
+) -> None:
+    """
+    Add many ``(type, message)`` entries to the audit-trail with one
+    statement.
+    """
+    if not entries:
+        return
+    now = datetime.now(timezone.utc)
+    session.execute(
+        insert(model.AuditLog),
+        [
+            {
+                "timestamp": now,
+                "username": username,
+                "type_": type_.value,
+                "message": message,
+            }
+            for type_, message in entries
+        ],
     )
-    state = query.one_or_none()
-    if not state:
-        state = model.TeamQuestionnaire(team, questionnaire_name, score)
-        session.add(state)
-    old_score = state.score
-    state.score = score
-    return old_score, score
 
 
 def global_dashboard(session):
-    teams = session.query(model.Team).order_by(model.Team.name)
-    stations = session.query(model.Station).order_by(model.Station.name)
-    team_names = set()
-    station_names = set()
+    """
+    Build the team/station matrix of the event.
+
+    The matrix is assembled in memory from four flat queries (teams,
+    stations, route-memberships and team-states) so the number of queries
+    does not depend on the number of teams or stations.
+    """
+    teams = session.query(model.Team.name, model.Team.route_name).order_by(
+        model.Team.name
+    )
+    station_names = [
+        row.name
+        for row in session.query(model.Station.name).order_by(
+            model.Station.name
+        )
+    ]
+
+    reachable_stations: dict[str, set[str]] = {}
+    memberships = session.query(
+        model.route_station_table.c.route_name,
+        model.route_station_table.c.station_name,
+    )
+    for route_name, station_name in memberships:
+        reachable_stations.setdefault(route_name, set()).add(station_name)
+
+    states = {
+        (row.team_name, row.station_name): row
+        for row in session.query(
+            model.TeamStation.team_name,
+            model.TeamStation.station_name,
+            model.TeamStation.state,
+            model.TeamStation.score,
+        )
+    }
+
     output = []
     for team in teams:
-        team_names.add(team.name)
         team_data = {"stations": [], "team": team.name}
-        if team.route:
-            reachable_stations = {
-                station.name for station in team.route.stations
-            }
-        else:
-            reachable_stations = set()
-        for station in stations:
-            station_names.add(station.name)
-            if station.name in reachable_stations:
-                team_states = session.query(model.TeamStation).filter(
-                    and_(
-                        model.TeamStation.team == team,
-                        model.TeamStation.station == station,
-                    )
-                )
-                dbstate = team_states.one_or_none()
+        team_reachable = reachable_stations.get(team.route_name or "", set())
+        for station_name in station_names:
+            if station_name in team_reachable:
+                dbstate = states.get((team.name, station_name))
                 if dbstate:
                     cell_state = dbstate.state
                     cell_score = dbstate.score
@@ -168,12 +396,227 @@ def global_dashboard(session):
                 cell_state = TeamState.UNREACHABLE
                 cell_score = 0
             team_data["stations"].append(
-                {"name": station.name, "score": cell_score, "state": cell_state}
+                {"name": station_name, "score": cell_score, "state": cell_state}
             )
         output.append(team_data)
     return output
 
 
+class ChangeLog:
+    """
+    A feed of the team-station cells and questionnaire scores which changed
+    since a given version.
+
+    Versions are transaction IDs: The current version is the oldest
+    transaction which was still running when it was determined, so all
+    changes made by older transactions are already visible. Changes of
+    transactions which committed in the meantime may be returned again by
+    the next call. Clients must therefore apply changes idempotently (which
+    is the case when replacing cells).
+
+    Assigning teams or stations to routes and adding teams or stations is
+    logged as a change of all affected cells. Removed rows and columns can
+    not be sent as changes, so deleting or renaming teams, stations or
+    questionnaires moves the :py:meth:`horizon` past the writing
+    transaction.
+
+    Old changes are pruned (see :py:class:`ChangeLogPruner`). Versions
+    older than the :py:meth:`horizon` can no longer be answered, and
+    clients have to reload the full dashboard.
+    """
+
+    @staticmethod
+    def version(session) -> int:
+        query = select(
+            cast(
+                cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text),
+                BigInteger,
+            )
+        )
+        return session.execute(query).scalar_one()
+
+    @staticmethod
+    def horizon(session) -> int:
+        """
+        Return the oldest version for which all changes are still available
+        """
+        query = select(model.ChangeLogHorizon.txid)
+        return session.execute(query).scalar_one()
+
+    @staticmethod
+    def prune(connection, retention: timedelta) -> int:
+        """
+        Remove the changes older than *retention* and move the horizon past
+        them. Returns the number of removed changes.
+        """
+        log = model.ChangeLog.__table__
+        horizon = model.ChangeLogHorizon.__table__
+        pruned = (
+            delete(log)
+            .where(log.c.inserted < func.now() - retention)
+            .returning(log.c.txid)
+            .cte("pruned")
+        )
+        moved = (
+            update(horizon)
+            .values(
+                txid=func.greatest(
+                    horizon.c.txid,
+                    select(func.max(pruned.c.txid) + 1).scalar_subquery(),
+                )
+            )
+            .returning(horizon.c.txid)
+            .cte("moved")
+        )
+        query = select(func.count()).select_from(pruned).add_cte(moved)
+        return connection.execute(query).scalar_one()
+
+    @staticmethod
+    def _changed(session, table_name: str, since: int):
+        return (
+            session.query(
+                model.ChangeLog.team_name.label("team_name"),
+                model.ChangeLog.key_name.label("key_name"),
+            )
+            .filter(
+                model.ChangeLog.table_name == table_name,
+                model.ChangeLog.txid >= since,
+            )
+            .distinct()
+            .subquery()
+        )
+
+    @staticmethod
+    def dashboard_changes(session, since: int) -> dict[str, Any]:
+        """
+        Return the current values of all dashboard cells (and questionnaire
+        scores) written since version *since* together with the version to
+        use in the next call.
+
+        Cells of teams or stations which no longer exist are omitted. Their
+        removal moved the :py:meth:`horizon` past *since*, which callers
+        have to check first.
+        """
+        version = ChangeLog.version(session)
+
+        cells = ChangeLog._changed(
+            session, model.TeamStation.__tablename__, since
+        )
+        route_station = model.route_station_table.c
+        cell_query = (
+            session.query(
+                cells.c.team_name,
+                cells.c.key_name,
+                model.TeamStation.state,
+                model.TeamStation.score,
+                route_station.station_name.label("reachable"),
+            )
+            .join(model.Team, model.Team.name == cells.c.team_name)
+            .join(model.Station, model.Station.name == cells.c.key_name)
+            .outerjoin(
+                model.TeamStation,
+                and_(
+                    model.TeamStation.team_name == cells.c.team_name,
+                    model.TeamStation.station_name == cells.c.key_name,
+                ),
+            )
+            .outerjoin(
+                model.route_station_table,
+                and_(
+                    route_station.route_name == model.Team.route_name,
+                    route_station.station_name == cells.c.key_name,
+                ),
+            )
+            .order_by(cells.c.team_name, cells.c.key_name)
+        )
+        stations = []
+        for row in cell_query:
+            if row.reachable is None:
+                state, score = TeamState.UNREACHABLE, 0
+            elif row.state is None:
+                state, score = TeamState.UNKNOWN, 0
+            else:
+                state, score = row.state, row.score
+            stations.append(
+                {
+                    "team": row.team_name,
+                    "name": row.key_name,
+                    "score": score,
+                    "state": state,
+                }
+            )
+
+        answers = ChangeLog._changed(
+            session, model.TeamQuestionnaire.__tablename__, since
+        )
+        questionnaire_query = (
+            session.query(
+                answers.c.team_name,
+                answers.c.key_name,
+                model.TeamQuestionnaire.score,
+            )
+            .join(model.Team, model.Team.name == answers.c.team_name)
+            .join(
+                model.Questionnaire,
+                model.Questionnaire.name == answers.c.key_name,
+            )
+            .outerjoin(
+                model.TeamQuestionnaire,
+                and_(
+                    model.TeamQuestionnaire.team_name == answers.c.team_name,
+                    model.TeamQuestionnaire.questionnaire_name
+                    == answers.c.key_name,
+                ),
+            )
+            .order_by(answers.c.team_name, answers.c.key_name)
+        )
+        questionnaires = [
+            {"team": row.team_name, "name": row.key_name, "score": row.score}
+            for row in questionnaire_query
+        ]
+        return {
+            "version": version,
+            "stations": stations,
+            "questionnaires": questionnaires,
+        }
+
+
+class ChangeLogPruner:
+    """
+    Removes changes older than *retention* from the change-log.
+
+    :py:meth:`maybe_prune` is called after each request which wrote to the
+    database. It prunes at most once every *interval* seconds (per process),
+    in a transaction of its own.
+    """
+
+    def __init__(self, retention: timedelta, interval: float = 60):
+        self.retention = retention
+        self.interval = interval
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create(config) -> "ChangeLogPruner":
+        retention = config.getint(
+            "dashboard", "changes_retention", fallback=3600
+        )
+        return ChangeLogPruner(timedelta(seconds=retention))
+
+    def maybe_prune(self, engine) -> None:
+        with self._lock:
+            if monotonic() < self._next:
+                return
+            self._next = monotonic() + self.interval
+        try:
+            with engine.begin() as connection:
+                pruned = ChangeLog.prune(connection, self.retention)
+        except Exception:
+            LOG.exception("Unable to prune the change-log")
+        else:
+            LOG.debug("Pruned %d changes from the change-log", pruned)
+
+
 class Team:
     @staticmethod
     def all(session):
@@ -191,8 +634,30 @@ class Team:
 
     @staticmethod
     def assigned_to_route(session, route_name):
-        route = session.query(model.Route).filter_by(name=route_name).one()
-        return route.teams
+        return session.query(model.Team).filter(
+            model.Team.route_name == route_name
+        )
+
+    @staticmethod
+    def page(query, limit: int = 0, cursor: str = ""):
+        """
+        Restrict a query of teams to one page, ordered by name.
+
+        Without *limit* and *cursor*, the query is returned unchanged.
+
+        :param limit: The maximum number of teams (0 for no limit)
+        :param cursor: The cursor of the last team of the previous page (see
+            :py:func:`name_cursor`)
+        :raises ValueError: If the cursor is invalid
+        """
+        if not (limit or cursor):
+            return query
+        query = query.order_by(None).order_by(model.Team.name)
+        if cursor:
+            query = query.filter(model.Team.name > parse_name_cursor(cursor))
+        if limit:
+            query = query.limit(limit)
+        return query
 
     @staticmethod
     def create_new(session, data):
@@ -234,51 +699,156 @@ class Team:
 
     @staticmethod
     def advance_on_station(session, team_name, station_name):
-        state = (
-            session.query(model.TeamStation)
-            .filter_by(team_name=team_name, station_name=station_name)
-            .one_or_none()
+        """
+        Move a team to the next state on a station and return the new state.
+
+        The transition (unknown → arrived → finished → unknown) and its
+        effect on the start- and finish-time of the team are applied with
+        one statement.
+        """
+        table = model.TeamStation.__table__
+        team = model.Team.__table__
+        station = model.Station.__table__
+
+        def state(value: TeamState):
+            return literal(value, model.TeamStateType())
+
+        upsert = insert(table).values(
+            team_name=team_name,
+            station_name=station_name,
+            state=TeamState.ARRIVED,
         )
-        if not state:
-            state = model.TeamStation(
-                team_name=team_name, station_name=station_name
+        changed = upsert.on_conflict_do_update(
+            index_elements=[table.c.team_name, table.c.station_name],
+            set_={
+                "state": case(
+                    (
+                        table.c.state == state(TeamState.UNKNOWN),
+                        state(TeamState.ARRIVED),
+                    ),
+                    (
+                        table.c.state == state(TeamState.ARRIVED),
+                        state(TeamState.FINISHED),
+                    ),
+                    else_=state(TeamState.UNKNOWN),
+                ),
+                "updated": func.now(),
+            },
+        ).returning(table.c.team_name, table.c.station_name, table.c.state)
+        changed = changed.cte("changed")
+
+        # Teams which arrive at the finish station will have their
+        # finish-time set
+        arrived_at_end = and_(
+            changed.c.state == state(TeamState.ARRIVED),
+            station.c.is_end,
+            team.c.finish_time.is_(None),
+        )
+        # Teams which leave the departure station will have their
+        # start-time set
+        left_start = and_(
+            changed.c.state == state(TeamState.FINISHED),
+            station.c.is_start,
+            team.c.effective_start_time.is_(None),
+        )
+        team_update = (
+            update(team)
+            .where(
+                team.c.name == changed.c.team_name,
+                station.c.name == changed.c.station_name,
+                or_(arrived_at_end, left_start),
             )
-            state = session.merge(state)
-            session.flush()
-
-        if state.state == TeamState.UNKNOWN:
-            state.state = TeamState.ARRIVED
-            # Teams which arrive at the finish station will have their
-            # finish-time set
-            if not state.team.finish_time and state.station.is_end:
-                state.team.finish_time = func.now()
-        elif state.state == TeamState.ARRIVED:
-            # Teams which leave the departure station will have their
-            # start-time set
-            if not state.team.effective_start_time and state.station.is_start:
-                state.team.effective_start_time = func.now()
-            state.state = TeamState.FINISHED
-        else:
-            state.state = TeamState.UNKNOWN
-        return state.state
+            .values(
+                finish_time=case(
+                    (arrived_at_end, func.now()), else_=team.c.finish_time
+                ),
+                effective_start_time=case(
+                    (left_start, func.now()),
+                    else_=team.c.effective_start_time,
+                ),
+            )
+            .cte("team_update")
+        )
+        query = select(changed.c.state).add_cte(team_update)
+        new_state = session.execute(query).scalar_one()
+        versioning.mark_changed(session, table.name, team.name)
+        _expire(session, model.TeamStation, team_name, station_name)
+        _expire(session, model.Team, team_name)
+        return new_state
+
+    @staticmethod
+    def advance_many(session, pairs: list[Tuple[str, str]]) -> list[TeamState]:
+        """
+        Advance teams on stations, given as ``(team, station)`` pairs, with
+        the statement of :py:meth:`advance_on_station`.
+
+        Pairs may repeat, in which case the team is advanced once for each
+        occurrence. Returns the new state for each pair.
+        """
+        new_states: dict[int, TeamState] = {}
+        # Sorted to always lock the rows in the same order. The sort is
+        # stable, so repeated pairs are still advanced in the given order.
+        for idx, (team_name, station_name) in sorted(
+            enumerate(pairs), key=lambda item: item[1]
+        ):
+            new_states[idx] = Team.advance_on_station(
+                session, team_name, station_name
+            )
+        return [new_states[idx] for idx in range(len(pairs))]
 
     @staticmethod
     def set_station_score(
         session: scoped_session, team_name, station_name, score
     ):
-        state = (
-            session.query(model.TeamStation)
-            .filter_by(team_name=team_name, station_name=station_name)
-            .one_or_none()
+        """
+        Set the score of a team on a station.
+
+        Returns the previous score (``None`` if the team had none) and the
+        new score.
+        """
+        output = _set_score(
+            session,
+            model.TeamStation.__table__,
+            {"team_name": team_name, "station_name": station_name},
+            "team_name",
+            "station_score",
+            score,
+            {"state": TeamState.UNKNOWN},
         )
-        if not state:
-            state = model.TeamStation(
-                team_name=team_name, station_name=station_name
+        _expire(session, model.TeamStation, team_name, station_name)
+        return output
+
+    @staticmethod
+    def set_station_scores(
+        session, scores: dict[Tuple[str, str], int]
+    ) -> dict[Tuple[str, str], Optional[int]]:
+        """
+        Set the scores of teams on stations with the statements of
+        :py:meth:`set_station_score`.
+
+        *scores* maps ``(team, station)`` pairs to the new score. Returns
+        the previous score of each pair (``None`` if it had none).
+        """
+        output: dict[Tuple[str, str], Optional[int]] = {}
+        # Sorted to always lock the rows in the same order
+        for team_name, station_name in sorted(scores):
+            output[(team_name, station_name)], _ = Team.set_station_score(
+                session,
+                team_name,
+                station_name,
+                scores[(team_name, station_name)],
             )
-            state = session.merge(state)
-        old_score = state.score
-        state.score = score
-        return old_score, state.score
+        return output
+
+    @staticmethod
+    def existing(session, names) -> set[str]:
+        """
+        Return those of the given team-names which exist
+        """
+        query = session.query(model.Team.name).filter(
+            model.Team.name.in_(set(names))
+        )
+        return {row.name for row in query}
 
     @staticmethod
     def stations(session, team_name):
@@ -296,6 +866,29 @@ class Station:
     def get(session, name):
         return session.query(model.Station).filter_by(name=name).one_or_none()
 
+    @staticmethod
+    def existing(session, names) -> set[str]:
+        """
+        Return those of the given station-names which exist
+        """
+        query = session.query(model.Station.name).filter(
+            model.Station.name.in_(set(names))
+        )
+        return {row.name for row in query}
+
+    @staticmethod
+    def questionnaires(session, names) -> dict[str, list[str]]:
+        """
+        Return the names of the questionnaires assigned to each station
+        """
+        query = session.query(
+            model.Questionnaire.station_name, model.Questionnaire.name
+        ).filter(model.Questionnaire.station_name.in_(set(names)))
+        output: dict[str, list[str]] = {}
+        for station_name, questionnaire_name in query:
+            output.setdefault(station_name, []).append(questionnaire_name)
+        return output
+
     @staticmethod
     def all(session):
         return session.query(model.Station).order_by(model.Station.order)
@@ -311,6 +904,9 @@ class Station:
         old = session.query(model.Station).filter_by(name=name).first()
         if not old:
             old = Station.create_new(session, data)
+        elif data.get("name", name) != name:
+            # Renames cascade to the user-assignments
+            STATION_ACCESS.invalidate(session)
         for k, v in data.items():
             setattr(old, k, v)
         return old
@@ -318,6 +914,9 @@ class Station:
     @staticmethod
     def delete(session, name):
         session.query(model.Station).filter_by(name=name).delete()
+        # Deleting a station cascades to the team-states and user-assignments
+        Scoreboard.rebuild(session)
+        STATION_ACCESS.invalidate(session)
         return None
 
     @staticmethod
@@ -338,6 +937,7 @@ class Station:
         )
         user = session.query(model.User).filter_by(name=user_name).one()
         station.users.add(user)
+        STATION_ACCESS.invalidate(session)
         return True
 
     @staticmethod
@@ -354,6 +954,7 @@ class Station:
 
         if found_user:
             station.users.remove(found_user)
+            STATION_ACCESS.invalidate(session)
 
         return True
 
@@ -361,26 +962,37 @@ class Station:
     def team_states(
         session, station_name
     ) -> Generator[Tuple[str, TeamState, Optional[int], datetime], None, None]:
-        # TODO this could be improved by just using one query
-        station = (
-            session.query(model.Station).filter_by(name=station_name).one()
-        )
-        states = session.query(model.TeamStation).filter_by(
-            station_name=station_name
-        )
-        mapping = {state.team_name: state for state in states}
+        """
+        Yield the state of each team which passes through a station, ordered
+        by team name.
 
-        for route in station.routes:
-            for team in route.teams:
-                state = mapping.get(
-                    team.name,
-                    model.TeamStation(
-                        team_name=team.name,
-                        station_name=station_name,
-                        state=TeamState.UNKNOWN,
-                    ),
-                )
-                yield (team.name, state.state, state.score, state.updated)
+        Teams without a stored state are reported as "unknown".
+        """
+        route_station = model.route_station_table
+        query = (
+            session.query(
+                model.Team.name,
+                model.TeamStation.state,
+                model.TeamStation.score,
+                model.TeamStation.updated,
+            )
+            .select_from(route_station)
+            .join(
+                model.Team, model.Team.route_name == route_station.c.route_name
+            )
+            .outerjoin(
+                model.TeamStation,
+                and_(
+                    model.TeamStation.team_name == model.Team.name,
+                    model.TeamStation.station_name
+                    == route_station.c.station_name,
+                ),
+            )
+            .filter(route_station.c.station_name == station_name)
+            .order_by(model.Team.name)
+        )
+        for team_name, state, score, updated in query:
+            yield (team_name, state or TeamState.UNKNOWN, score, updated)
 
     @staticmethod
     def accessible_by(session, username):
@@ -559,6 +1171,7 @@ class User:
     @staticmethod
     def delete(session, name):
         session.query(model.User).filter_by(name=name).delete()
+        STATION_ACCESS.invalidate(session)
         return None
 
     @staticmethod
@@ -602,6 +1215,7 @@ class User:
         )
         user = session.query(model.User).filter_by(name=user_name).one()
         station.users.add(user)
+        STATION_ACCESS.invalidate(session)
         return True
 
     @staticmethod
@@ -618,16 +1232,20 @@ class User:
 
         if found_user:
             station.users.remove(found_user)
+            STATION_ACCESS.invalidate(session)
 
         return True
 
     @staticmethod
     def may_access_station(session, user_name, station_name):
-        user = session.query(model.User).filter_by(name=user_name).one_or_none()
-        if not user:
-            return False
-        user_stations = {_.name for _ in user.stations}
-        return station_name in user_stations
+        return station_name in STATION_ACCESS.stations(session, user_name)
+
+    @staticmethod
+    def stations(session, user_name) -> list[str]:
+        """
+        Return the sorted names of the stations assigned to a user
+        """
+        return sorted(STATION_ACCESS.stations(session, user_name))
 
 
 class Role:
@@ -665,13 +1283,81 @@ class Upload:
         return query
 
     @staticmethod
-    def make_thumbnail(session, uuid):
-        query = session.query(model.Upload).filter_by(uuid=uuid)
-        instance = query.one_or_none()
-        if not instance:
-            return
+    def page(query, limit: int = 0, cursor: str = ""):
+        """
+        Restrict a query of uploads to one page, ordered by UUID.
+
+        :param limit: The maximum number of uploads (0 for no limit)
+        :param cursor: The UUID of the last upload of the previous page
+        """
+        query = query.order_by(model.Upload.uuid)
+        if cursor:
+            query = query.filter(model.Upload.uuid > cursor)
+        if limit:
+            query = query.limit(limit)
+        return query
+
+
+class AuditLog:
+    @staticmethod
+    def query(
+        session,
+        username: str = "",
+        type_: model.AuditType | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+    ):
+        """
+        Return the entries of the audit-trail, newest first.
 
-        thumbnail_folder = join(Upload.FALLBACK_FOLDER, "__thumbnails__")
+        :param since: Only entries at or after this time
+        :param until: Only entries before this time
+        """
+        query = session.query(model.AuditLog).order_by(
+            model.AuditLog.timestamp.desc(), model.AuditLog.id.desc()
+        )
+        if username:
+            query = query.filter(model.AuditLog.username == username)
+        if type_ is not None:
+            query = query.filter(model.AuditLog.type_ == type_.value)
+        if since is not None:
+            query = query.filter(model.AuditLog.timestamp >= since)
+        if until is not None:
+            query = query.filter(model.AuditLog.timestamp < until)
+        return query
+
+    @staticmethod
+    def cursor(entry: model.AuditLog) -> str:
+        """
+        Return the value of the "cursor" argument of :py:meth:`page` for the
+        page following *entry*.
+
+        The timestamp is encoded in microseconds to keep the cursor exact
+        and URL-safe.
+        """
+        micros = (entry.timestamp - EPOCH) // timedelta(microseconds=1)
+        return f"{micros}-{entry.id}"
+
+    @staticmethod
+    def page(query, limit: int = 0, cursor: str = ""):
+        """
+        Restrict a query of :py:meth:`query` to one page.
+
+        :param limit: The maximum number of entries (0 for no limit)
+        :param cursor: The cursor of the last entry of the previous page (see
+            :py:meth:`cursor`)
+        :raises ValueError: If the cursor is invalid
+        """
+        if cursor:
+            micros, _, id_ = cursor.partition("-")
+            timestamp = EPOCH + timedelta(microseconds=int(micros))
+            query = query.filter(
+                tuple_(model.AuditLog.timestamp, model.AuditLog.id)
+                < tuple_(timestamp, int(id_))
+            )
+        if limit:
+            query = query.limit(limit)
+        return query
 
 
 class Questionnaire:
@@ -710,16 +1396,38 @@ class Questionnaire:
     @staticmethod
     def delete(session, name):
         session.query(model.Questionnaire).filter_by(name=name).delete()
+        # Deleting a questionnaire cascades to the questionnaire-scores
+        Scoreboard.rebuild(session)
         return None
 
     @staticmethod
     def assigned_to_station(session, station_name):
-        station = (
-            session.query(model.Station)
-            .filter_by(name=station_name)
-            .one_or_none()
+        return session.query(model.Questionnaire).filter(
+            model.Questionnaire.station_name == station_name
         )
-        return station.questionnaires
+
+    @staticmethod
+    def page(query, limit: int = 0, cursor: str = ""):
+        """
+        Restrict a query of questionnaires to one page, ordered by name.
+
+        Without *limit* and *cursor*, the query is returned unchanged.
+
+        :param limit: The maximum number of questionnaires (0 for no limit)
+        :param cursor: The cursor of the last questionnaire of the previous
+            page (see :py:func:`name_cursor`)
+        :raises ValueError: If the cursor is invalid
+        """
+        if not (limit or cursor):
+            return query
+        query = query.order_by(None).order_by(model.Questionnaire.name)
+        if cursor:
+            query = query.filter(
+                model.Questionnaire.name > parse_name_cursor(cursor)
+            )
+        if limit:
+            query = query.limit(limit)
+        return query
 
     @staticmethod
     def assign_station(session, station_name, questionnaire_name):
@@ -757,3 +1465,251 @@ class Questionnaire:
             return False
         questionnaire.station = None
         return True
+
+
+class Scoreboard:
+    """
+    Access to the materialized score-totals (see :py:class:`model.TeamScore`)
+    """
+
+    @staticmethod
+    def add(session, team_name, station_delta=0, questionnaire_delta=0):
+        """
+        Add the given score-deltas to the totals of a team.
+        """
+        Scoreboard.add_many(
+            session,
+            station_deltas={team_name: station_delta},
+            questionnaire_deltas={team_name: questionnaire_delta},
+        )
+
+    @staticmethod
+    def add_many(
+        session,
+        station_deltas: dict[str, int] | None = None,
+        questionnaire_deltas: dict[str, int] | None = None,
+    ):
+        """
+        Add score-deltas (mapping team-names to deltas) to the totals of
+        many teams with one statement.
+        """
+        station_deltas = station_deltas or {}
+        questionnaire_deltas = questionnaire_deltas or {}
+        rows = [
+            {
+                "team_name": team_name,
+                "station_score": station_deltas.get(team_name, 0),
+                "questionnaire_score": questionnaire_deltas.get(team_name, 0),
+            }
+            # Sorted to always lock the rows in the same order
+            for team_name in sorted(
+                set(station_deltas) | set(questionnaire_deltas)
+            )
+        ]
+        rows = [
+            row
+            for row in rows
+            if row["station_score"] or row["questionnaire_score"]
+        ]
+        if not rows:
+            return
+        query = insert(model.TeamScore).values(rows)
+        query = query.on_conflict_do_update(
+            index_elements=[model.TeamScore.team_name],
+            set_={
+                "station_score": model.TeamScore.station_score
+                + query.excluded.station_score,
+                "questionnaire_score": model.TeamScore.questionnaire_score
+                + query.excluded.questionnaire_score,
+                "updated": func.now(),
+            },
+        )
+        session.execute(query)
+
+    @staticmethod
+    def add_from(source, column: str):
+        """
+        Return a CTE adding score-differences to the totals.
+
+        *source* must provide the columns "team_name", "old_score" and
+        "new_score" (f.ex. a CTE of a data-modifying statement), *column* is
+        the total to modify.
+        """
+        delta = func.coalesce(source.c.new_score, 0) - func.coalesce(
+            source.c.old_score, 0
+        )
+        query = insert(model.TeamScore).from_select(
+            ["team_name", column],
+            select(source.c.team_name, delta).where(delta != 0),
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[model.TeamScore.team_name],
+            set_={
+                column: getattr(model.TeamScore, column)
+                + getattr(query.excluded, column),
+                "updated": func.now(),
+            },
+        )
+        return query.cte("scoreboard")
+
+    @staticmethod
+    def ranked(
+        session,
+    ) -> Generator[Tuple[int, str, int], None, None]:
+        """
+        Stream the materialized scoreboard as ``(rank, team, score)`` tuples.
+
+        The ordering and tie-handling is the same as in
+        :py:func:`ranked_scoreboard`.
+        """
+        score = func.coalesce(
+            model.TeamScore.station_score + model.TeamScore.questionnaire_score,
+            0,
+        )
+        query = (
+            session.query(
+                func.rank().over(order_by=score.desc()).label("rank"),
+                model.Team.name,
+                score.label("score"),
+            )
+            .outerjoin(
+                model.TeamScore, model.TeamScore.team_name == model.Team.name
+            )
+            .order_by(score.desc(), model.Team.name)
+        )
+        for row in query:
+            yield row.rank, row.name, row.score
+
+    @staticmethod
+    def rebuild(session):
+        """
+        Recompute all totals from the team-states and questionnaire-scores.
+        """
+        station_totals = (
+            select(func.sum(model.TeamStation.score))
+            .where(model.TeamStation.team_name == model.Team.name)
+            .scalar_subquery()
+        )
+        questionnaire_totals = (
+            select(func.sum(model.TeamQuestionnaire.score))
+            .where(model.TeamQuestionnaire.team_name == model.Team.name)
+            .scalar_subquery()
+        )
+        session.query(model.TeamScore).delete()
+        session.execute(
+            insert(model.TeamScore).from_select(
+                ["team_name", "station_score", "questionnaire_score"],
+                select(
+                    model.Team.name,
+                    func.coalesce(station_totals, 0),
+                    func.coalesce(questionnaire_totals, 0),
+                ),
+            )
+        )
+
+    @staticmethod
+    def drift(session) -> list[Tuple[str, int, int]]:
+        """
+        Compare the materialized totals with freshly computed totals.
+
+        Returns a list of ``(team, expected, materialized)`` tuples for each
+        team where the two disagree.
+        """
+        expected = {
+            team_name: score
+            for _, team_name, score in ranked_scoreboard(session)
+        }
+        materialized = {
+            team_name: score
+            for _, team_name, score in Scoreboard.ranked(session)
+        }
+        output = []
+        for team_name, expected_score in sorted(expected.items()):
+            materialized_score = materialized.get(team_name, 0)
+            if materialized_score != expected_score:
+                output.append((team_name, expected_score, materialized_score))
+        return output
+
+
+class StationAccessIndex:
+    """
+    An in-process index mapping user names to the stations they manage.
+
+    The index is loaded with a single query and kept as long as the
+    data-version of the user-station assignments (see
+    :py:mod:`powonline.versioning`) does not change, so changes made by
+    other processes are seen by the next lookup. Checking the version costs
+    one query on the (tiny) version table per lookup.
+
+    The helpers changing station assignments clear the index immediately
+    and once more when their transaction ends. Until then, lookups in that
+    transaction bypass the index, so it is never loaded from not-yet
+    committed data.
+    """
+
+    #: The key in "session.info" flagging a pending change of assignments
+    CHANGED = "powonline.station_access_changed"
+
+    #: The name of the data-version of the assignments
+    VERSION = model.user_station_table.name
+
+    def __init__(self):
+        self._index: dict[str, frozenset[str]] | None = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def _load(self, session) -> dict[str, frozenset[str]]:
+        query = session.query(
+            model.user_station_table.c.user_name,
+            model.user_station_table.c.station_name,
+        )
+        output: dict[str, set[str]] = {}
+        for user_name, station_name in query:
+            output.setdefault(user_name, set()).add(station_name)
+        return {key: frozenset(value) for key, value in output.items()}
+
+    def stations(self, session, user_name: str) -> frozenset[str]:
+        """
+        Return the names of the stations assigned to a user
+        """
+        if session.info.get(StationAccessIndex.CHANGED):
+            # The session sees its own pending changes. They must not end
+            # up in the index in case the transaction is rolled back.
+            return self._load(session).get(user_name, frozenset())
+        versions = versioning.current_versions(
+            session, [StationAccessIndex.VERSION]
+        )
+        version, _ = versions.get(StationAccessIndex.VERSION, (0, None))
+        with self._lock:
+            if self._index is None or self._version != version:
+                self._index = self._load(session)
+                self._version = version
+            return self._index.get(user_name, frozenset())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index = None
+
+    def invalidate(self, session) -> None:
+        """
+        Clear the index now and again after the transaction of *session*
+        ends
+        """
+        self.clear()
+        session.info[StationAccessIndex.CHANGED] = True
+        versioning.mark_changed(session, StationAccessIndex.VERSION)
+
+
+STATION_ACCESS = StationAccessIndex()
+
+
+@event.listens_for(Session, "after_commit")
+def _clear_station_access(session):
+    if session.info.pop(StationAccessIndex.CHANGED, False):
+        STATION_ACCESS.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_station_access(session):
+    if session.info.pop(StationAccessIndex.CHANGED, False):
+        STATION_ACCESS.clear()
@@ -1,12 +1,17 @@
 import logging
+from typing import TYPE_CHECKING, cast
 
-from flask import Blueprint
+from flask import Blueprint, Response, current_app, request
 
 from powonline import core
 
 from .core import questionnaire_scores
+from .events import format_event
 from .model import DB
 
+if TYPE_CHECKING:
+    from .web import MyFlask
+
 ROUTER = Blueprint("custom-routes", __name__)
 
 LOG = logging.getLogger(__name__)
@@ -23,3 +28,36 @@ def unassign_questionnaire_from_station(questionnaire_name: str):
         return "", 204
     else:
         return "Station is already assigned to that questionnaire", 400
+
+
+@ROUTER.get("/events")
+def events():
+    """
+    Stream live-events as Server-Sent Events (only with the "sse" backend).
+
+    The "channel" query-argument (which can be repeated) limits the stream
+    to the given channels.
+    """
+    app = cast("MyFlask", current_app)
+    broker = getattr(app.pusher, "broker", None)
+    if broker is None:
+        return "Live-events are not served by this instance", 404
+    channels = set(request.args.getlist("channel")) or None
+    subscription = broker.subscribe(
+        channels, request.headers.get("Last-Event-ID") or None
+    )
+
+    def stream():
+        # The server closes the response when the client disconnects, which
+        # must end the subscription as well
+        try:
+            for message in subscription:
+                yield format_event(message)
+        finally:
+            subscription.close()
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,284 @@
+"""
+Self-hosted live-events delivered as Server-Sent Events (SSE).
+
+Published events are fanned out to all subscribers of a broker. Each broker
+keeps the most recent events in a ring-buffer, so reconnecting clients can
+resume after the last event they have seen (see "Last-Event-ID" in the SSE
+specification).
+
+* :py:class:`LocalBroker` only reaches clients connected to the same process.
+* :py:class:`PostgresBroker` distributes the events to all processes using
+  PostgreSQL ``LISTEN``/``NOTIFY``.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import deque
+from configparser import ConfigParser
+from itertools import count
+from typing import Any, Iterator
+from uuid import uuid4
+
+import psycopg
+from sqlalchemy.engine import make_url
+
+from .model import get_dsn
+
+LOG = logging.getLogger(__name__)
+
+#: The PostgreSQL channel used to distribute the events
+NOTIFY_CHANNEL = "powonline_events"
+
+#: Interval (in seconds) of the comments keeping idle connections open
+KEEPALIVE_INTERVAL = 15
+
+#: Size limit (in bytes) of PostgreSQL notification payloads
+MAX_PAYLOAD = 7999
+
+#: Size (in characters) of the parts of larger events. Escaping them in
+#: their envelope at most doubles the size of the (ASCII) JSON document.
+CHUNK_SIZE = 3000
+
+
+class EventBroker:
+    """
+    Fan-out of events to subscribers with a ring-buffer of the *buffer_size*
+    most recent events.
+
+    Events are dictionaries with the keys "id", "channel", "event" and
+    "data". The IDs are opaque, so the position in the buffer (which is the
+    same in all processes) defines the order.
+
+    *subscribers* is the number of running subscriptions.
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        self.buffer_size = buffer_size
+        self.subscribers = 0
+        self._buffer: deque[tuple[int, dict[str, Any]]]
+        self._buffer = deque(maxlen=buffer_size)
+        self._sequence = count(1)
+        self._last = 0
+        self._condition = threading.Condition()
+
+    @staticmethod
+    def create(config: ConfigParser) -> "EventBroker":
+        backend = config.get("events", "broker", fallback="local")
+        buffer_size = config.getint("events", "buffer_size", fallback=1000)
+        if backend == "postgres":
+            return PostgresBroker(buffer_size)
+        elif backend != "local":
+            LOG.warning("Unknown event broker %r. Using 'local'", backend)
+        return LocalBroker(buffer_size)
+
+    def publish(self, channel: str, event: str, data: Any) -> None:
+        raise NotImplementedError("Not yet implemented")
+
+    def _append(self, message: dict[str, Any]) -> None:
+        with self._condition:
+            self._last = next(self._sequence)
+            self._buffer.append((self._last, message))
+            self._condition.notify_all()
+
+    def _position(self, last_event_id: str | None) -> int:
+        """
+        Return the buffer-position after which a client (which has last seen
+        *last_event_id*) resumes.
+        """
+        if last_event_id is None:
+            return self._last
+        for position, message in self._buffer:
+            if message["id"] == last_event_id:
+                return position
+        # Unknown or already removed from the buffer: replay all we have
+        return 0
+
+    def subscribe(
+        self,
+        channels: set[str] | None = None,
+        last_event_id: str | None = None,
+        timeout: float = KEEPALIVE_INTERVAL,
+    ) -> Iterator[dict[str, Any] | None]:
+        """
+        Yield new events (on *channels* if given) as they arrive, starting
+        after *last_event_id*.
+
+        ``None`` is yielded when no event arrived within *timeout* seconds,
+        so callers can keep the connection alive (or detect that it has
+        been closed). Callers must close the iterator when they are done.
+        """
+        with self._condition:
+            position = self._position(last_event_id)
+            self.subscribers += 1
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(
+                        lambda: self._last > position, timeout
+                    )
+                    pending = [
+                        entry for entry in self._buffer if entry[0] > position
+                    ]
+                if not pending:
+                    yield None
+                    continue
+                position = pending[-1][0]
+                for _, message in pending:
+                    if channels is None or message["channel"] in channels:
+                        yield message
+        finally:
+            with self._condition:
+                self.subscribers -= 1
+
+
+class LocalBroker(EventBroker):
+    """
+    Distributes events only to subscribers in the same process
+    """
+
+    def __init__(self, buffer_size: int = 1000):
+        super().__init__(buffer_size)
+        self._ids = count(1)
+
+    def publish(self, channel, event, data):
+        self._append(
+            {
+                "id": str(next(self._ids)),
+                "channel": channel,
+                "event": event,
+                "data": data,
+            }
+        )
+
+
+class PostgresBroker(EventBroker):
+    """
+    Distributes events to all processes connected to the same database.
+
+    PostgreSQL delivers notifications to all listeners in the same order,
+    which keeps the buffers of all processes in the same order. Payloads are
+    limited to 8000 bytes, so larger events are sent in parts (in one
+    transaction) which the listeners join again.
+
+    The listening connection is opened on first use (after forking).
+    """
+
+    def __init__(self, buffer_size: int = 1000, dsn: str = ""):
+        super().__init__(buffer_size)
+        url = make_url(dsn or get_dsn()).set(drivername="postgresql")
+        self.dsn = url.render_as_string(hide_password=False)
+        self._connection: psycopg.Connection | None = None
+        self._listener: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._listener = threading.Thread(
+                target=self._listen, name="event-listener", daemon=True
+            )
+            self._listener.start()
+        self._ready.wait(10)
+
+    def _listen(self) -> None:
+        delay = 1
+        while True:
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    self._ready.set()
+                    delay = 1
+                    parts: dict[str, list[str]] = {}
+                    for notify in conn.notifies():
+                        try:
+                            self._receive(json.loads(notify.payload), parts)
+                        except (ValueError, KeyError):
+                            LOG.error("Invalid event: %r", notify.payload)
+            except psycopg.Error:
+                LOG.exception("Lost connection to the event channel")
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def _receive(
+        self, message: dict[str, Any], parts: dict[str, list[str]]
+    ) -> None:
+        """
+        Append a received event to the buffer, once all of its parts (see
+        :py:func:`split_payload`) were received.
+        """
+        if "chunk" not in message:
+            self._append(message)
+            return
+        received = parts.setdefault(message["id"], [])
+        received.append(message["chunk"])
+        if len(received) == message["parts"]:
+            del parts[message["id"]]
+            self._append(json.loads("".join(received)))
+
+    def publish(self, channel, event, data):
+        self._start()
+        event_id = uuid4().hex
+        payload = json.dumps(
+            {
+                "id": event_id,
+                "channel": channel,
+                "event": event,
+                "data": data,
+            }
+        )
+        with self._lock:
+            try:
+                if self._connection is None or self._connection.closed:
+                    self._connection = psycopg.connect(
+                        self.dsn, autocommit=True
+                    )
+                with self._connection.transaction():
+                    for part in split_payload(event_id, payload):
+                        self._connection.execute(
+                            "SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, part)
+                        )
+            except psycopg.Error:
+                LOG.exception("Unable to publish event %r", event)
+                if self._connection is not None:
+                    self._connection.close()
+
+    def subscribe(
+        self, channels=None, last_event_id=None, timeout=KEEPALIVE_INTERVAL
+    ):
+        self._start()
+        return super().subscribe(channels, last_event_id, timeout)
+
+
+def split_payload(event_id: str, payload: str) -> list[str]:
+    """
+    Split the (ASCII) JSON document of an event into notification payloads
+    below :py:data:`MAX_PAYLOAD`.
+
+    Small events are sent unchanged. Larger ones are sent as parts with the
+    keys "id", "parts" and "chunk" (a slice of the document).
+    """
+    if len(payload) <= MAX_PAYLOAD:
+        return [payload]
+    chunks = [
+        payload[start : start + CHUNK_SIZE]
+        for start in range(0, len(payload), CHUNK_SIZE)
+    ]
+    return [
+        json.dumps({"id": event_id, "parts": len(chunks), "chunk": chunk})
+        for chunk in chunks
+    ]
+
+
+def format_event(message: dict[str, Any] | None) -> str:
+    """
+    Render an event (or a keep-alive comment for ``None``) in the SSE
+    wire-format.
+    """
+    if message is None:
+        return ": keep-alive\n\n"
+    data = json.dumps(message["data"])
+    return f"id: {message['id']}\nevent: {message['event']}\ndata: {data}\n\n"
@@ -1,8 +1,13 @@
 import logging
+from functools import wraps
 from typing import TYPE_CHECKING, cast
 
 from flask import current_app, request
 from flask.wrappers import Response
+from sqlalchemy.orm import Session
+
+from . import versioning
+from .model import DB, REPLICA
 
 LOG = logging.getLogger(__name__)
 
@@ -39,3 +44,92 @@ def add_cors_headers(response: Response) -> None:
         "Access-Control-Allow-Headers", "Content-Type,Authorization"
     )
     response.headers.add("Access-Control-Allow-Methods", "GET,PUT,POST,DELETE")
+    response.headers.add(
+        "Access-Control-Expose-Headers", "X-Next-Cursor,X-Change-Version"
+    )
+
+
+def begin_read(session: Session) -> None:
+    """
+    Prepare the session of a read-only request.
+
+    The request is sent to a read-replica (if available, see
+    :py:class:`powonline.pool.ReplicaSet`) and, if enabled in the config
+    ("db.autocommit_reads"), runs without a transaction. This saves the
+    round-trips for "BEGIN" and "COMMIT". Each statement already sees its
+    own snapshot of the data in the default isolation level ("read
+    committed"), so this does not change what the request can see.
+
+    Both are only possible before the session has started a transaction.
+    """
+    if session.in_transaction():
+        return
+    app = cast("MyFlask", current_app)
+    replica = app.replicas.choose()
+    if replica is not None:
+        session.info[REPLICA] = replica
+    if app.localconfig.getboolean("db", "autocommit_reads", fallback=False):
+        session.connection(execution_options={"isolation_level": "AUTOCOMMIT"})
+
+
+class conditional:
+    """
+    Decorator for read-only routes.
+
+    The route may run on a replica or without a transaction (see
+    :py:func:`begin_read`).
+
+    The entity-tag and modification time of the response are derived from
+    the data-versions of the given tables (see
+    :py:mod:`powonline.versioning`). If the client already holds the
+    current representation, "304 Not Modified" is returned without calling
+    the decorated function.
+
+    Successful responses are stored in the application's response-cache
+    under their entity-tag and served from there until the data changes.
+    """
+
+    def __init__(self, *tables):
+        self.tables = tables
+
+    def __call__(self, f):
+        @wraps(f)
+        def fun(*args, **kwargs):
+            begin_read(DB.session())
+            versions = versioning.current_versions(DB.session, self.tables)
+            etag = versioning.make_etag(request.full_path, versions)
+            last_modified = max(
+                (updated for _, updated in versions.values()), default=None
+            )
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified:
+                not_modified = (
+                    last_modified.replace(microsecond=0)
+                    <= request.if_modified_since
+                )
+            else:
+                not_modified = False
+
+            app = cast("MyFlask", current_app)
+            cached = None if not_modified else app.response_cache.lookup(etag)
+            if not_modified:
+                response = Response(status=304)
+            elif cached:
+                mimetype, data = cached
+                response = Response(data, mimetype=mimetype)
+            else:
+                response = f(*args, **kwargs)
+                if not isinstance(response, Response):
+                    return response
+                if response.status_code == 200:
+                    app.response_cache.set(
+                        etag, response.mimetype or "", response.get_data()
+                    )
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            return response
+
+        return fun
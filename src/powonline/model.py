@@ -2,30 +2,80 @@ import logging
 from codecs import encode
 from datetime import datetime, timezone
 from enum import Enum
-from os import environ, urandom
+from os import environ, stat, urandom
 from typing import Any
 from urllib.parse import urlparse, urlunparse
 
 import sqlalchemy.types as types
 from bcrypt import checkpw, gensalt, hashpw
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
     FetchedValue,
     ForeignKey,
+    Identity,
+    Index,
     Integer,
     Table,
     Unicode,
     UniqueConstraint,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import BYTEA, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship, scoped_session
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import CTE
 
 LOG = logging.getLogger(__name__)
-DB = SQLAlchemy()
+
+#: The key in "session.info" holding the replica used for reading
+REPLICA = "powonline.replica"
+
+
+def modifies_data(clause: Any) -> bool:
+    """
+    Whether a statement writes data, either itself (INSERT, UPDATE or
+    DELETE) or in a data-modifying CTE (f.ex. a SELECT with
+    ``add_cte(update(...))``).
+
+    Plain textual SQL is not inspected.
+    """
+    if isinstance(clause, UpdateBase):
+        return True
+    if clause is None:
+        return False
+    return any(
+        isinstance(element, CTE) and isinstance(element.element, UpdateBase)
+        for element in visitors.iterate(clause)
+    )
+
+
+class RoutingSession(Session):
+    """
+    A session which sends reads to the engine in ``info[REPLICA]`` (if
+    set). Flushes and data-modifying statements (see
+    :py:func:`modifies_data`) always use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get(REPLICA)
+        if (
+            replica is not None
+            and bind is None
+            and not self._flushing
+            and not modifies_data(clause)
+        ):
+            return replica
+        return super().get_bind(mapper, clause, bind, **kwargs)
+
+
+DB = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 def get_dsn():
@@ -62,11 +112,16 @@ class TimestampMixin:
 
 class TeamStateType(types.TypeDecorator):
     impl = types.Unicode
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
         return value.value
 
     def process_result_value(self, value, dialect):
+        if value is None:
+            return None
         return TeamState(value)
 
 
@@ -106,6 +161,7 @@ class Team(DB.Model, TimestampMixin):  # type: ignore
     __tablename__ = "team"
     __table_args__ = (
         UniqueConstraint("confirmation_key", name="team_confirmation_key"),
+        Index("team_route_idx", "route_name", "name"),
     )
 
     name: Mapped[str] = mapped_column(primary_key=True)
@@ -379,6 +435,13 @@ class Role(DB.Model, TimestampMixin):  # type: ignore
 
 class TeamStation(DB.Model, TimestampMixin):  # type: ignore
     __tablename__ = "team_station_state"
+    __table_args__ = (
+        Index(
+            "team_station_state_station_idx",
+            "station_name",
+            postgresql_include=["state", "score"],
+        ),
+    )
 
     team_name: Mapped[str] = mapped_column(
         ForeignKey("team.name", onupdate="CASCADE", ondelete="CASCADE"),
@@ -417,6 +480,13 @@ class TeamStation(DB.Model, TimestampMixin):  # type: ignore
 
 class Questionnaire(DB.Model, TimestampMixin):  # type: ignore
     __tablename__ = "questionnaire"
+    __table_args__ = (
+        Index(
+            "questionnaire_station_idx",
+            "station_name",
+            postgresql_include=["name"],
+        ),
+    )
 
     name: Mapped[str] = mapped_column(nullable=False, primary_key=True)
     max_score: Mapped[int | None] = mapped_column()
@@ -464,6 +534,13 @@ class Questionnaire(DB.Model, TimestampMixin):  # type: ignore
 
 class TeamQuestionnaire(DB.Model, TimestampMixin):  # type: ignore
     __tablename__ = "questionnaire_score"
+    __table_args__ = (
+        Index(
+            "questionnaire_score_questionnaire_idx",
+            "questionnaire",
+            postgresql_include=["score"],
+        ),
+    )
 
     team_name: Mapped[str] = mapped_column(
         ForeignKey("team.name", onupdate="CASCADE", ondelete="CASCADE"),
@@ -498,8 +575,100 @@ class TeamQuestionnaire(DB.Model, TimestampMixin):  # type: ignore
         self.score = score
 
 
+class TeamScore(DB.Model):  # type: ignore
+    """
+    Materialized score-totals of a team.
+
+    This is kept up-to-date by the score-changing functions in
+    :py:mod:`powonline.core` and can be rebuilt from the team-station states
+    and questionnaire scores at any time.
+    """
+
+    __tablename__ = "team_score"
+
+    team_name: Mapped[str] = mapped_column(
+        ForeignKey("team.name", onupdate="CASCADE", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    station_score: Mapped[int] = mapped_column(
+        nullable=False, server_default="0"
+    )
+    questionnaire_score: Mapped[int] = mapped_column(
+        nullable=False, server_default="0"
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+
+class EntityVersion(DB.Model):  # type: ignore
+    """
+    A counter per table which is incremented by each transaction writing to
+    that table (see :py:mod:`powonline.versioning`).
+    """
+
+    __tablename__ = "entity_version"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(
+        BigInteger, nullable=False, server_default="0"
+    )
+    updated: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
+
+
+class ChangeLog(DB.Model):  # type: ignore
+    """
+    Keys of the team-station states and questionnaire scores written by
+    each transaction. Rows are added by database triggers, also for the
+    cells affected by changes of teams, stations and routes.
+
+    *txid* is the ID of the writing transaction. It is used as the version
+    of the changes-feed (see :py:class:`powonline.core.ChangeLog`).
+    """
+
+    __tablename__ = "change_log"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    txid: Mapped[int] = mapped_column(
+        BigInteger,
+        nullable=False,
+        index=True,
+        server_default=text("pg_current_xact_id()::text::bigint"),
+    )
+    table_name: Mapped[str] = mapped_column(Unicode, nullable=False)
+    team_name: Mapped[str] = mapped_column(Unicode, nullable=False)
+    key_name: Mapped[str] = mapped_column(Unicode, nullable=False)
+    inserted: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        index=True,
+        server_default=func.now(),
+    )
+
+
+class ChangeLogHorizon(DB.Model):  # type: ignore
+    """
+    A single row holding the oldest version of the changes-feed for which
+    all changes are still in the change-log. It is advanced when old changes
+    are pruned (see :py:meth:`powonline.core.ChangeLog.prune`), and by a
+    database trigger past each transaction which deletes or renames teams,
+    stations or questionnaires.
+    """
+
+    __tablename__ = "change_log_horizon"
+
+    txid: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+
+
 class Upload(DB.Model):  # type: ignore
     __tablename__ = "uploads"
+    __table_args__ = (Index("uploads_username_id_idx", "username", "id"),)
     filename: Mapped[str] = mapped_column(Unicode, primary_key=True)
     username: Mapped[str] = mapped_column(
         Unicode(50),
@@ -513,6 +682,13 @@ class Upload(DB.Model):  # type: ignore
         name="id",
         server_default=func.uuid_generate_v4(),
     )
+    #: Size and modification time of the file on disk, recorded whenever the
+    #: file is written. Both are NULL for files stored before these columns
+    #: existed.
+    size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    mtime: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
 
     user: Mapped["User"] = relationship("User", back_populates="files")
 
@@ -520,6 +696,14 @@ class Upload(DB.Model):  # type: ignore
         self.filename = relname
         self.username = username
 
+    def record_file_info(self, fullname: str) -> None:
+        """
+        Store the size and modification time of the file *fullname*
+        """
+        info = stat(fullname)
+        self.size = info.st_size
+        self.mtime = datetime.fromtimestamp(info.st_mtime, timezone.utc)
+
     @staticmethod
     def get_or_create(
         session: scoped_session, relname: str, username: str
@@ -542,16 +726,19 @@ class Upload(DB.Model):  # type: ignore
 
 class AuditLog(DB.Model):  # type: ignore
     __tablename__ = "auditlog"
+    __table_args__ = (
+        Index("auditlog_timestamp_idx", "timestamp", "id"),
+        Index("auditlog_user_timestamp_idx", "user", "timestamp", "id"),
+    )
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
         default=datetime.now(timezone.utc),
-        primary_key=True,
     )
     username: Mapped[str] = mapped_column(
         ForeignKey("user.name", onupdate="CASCADE", ondelete="SET NULL"),
         name="user",
-        primary_key=True,
         nullable=True,
     )
     type_: Mapped[str] = mapped_column(name="type", nullable=False)
@@ -568,6 +755,25 @@ class AuditLog(DB.Model):  # type: ignore
         self.message = message
 
 
+class AuditOutbox(DB.Model):  # type: ignore
+    """
+    Audit-log entries which are not yet moved into the audit-log (see
+    :py:class:`powonline.audit.OutboxSink`).
+
+    The table has neither indexes nor foreign-keys, which keeps writing to
+    it cheap.
+    """
+
+    __tablename__ = "auditlog_outbox"
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    timestamp: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False
+    )
+    username: Mapped[str | None] = mapped_column(Unicode, name="user")
+    type_: Mapped[str] = mapped_column(name="type", nullable=False)
+    message: Mapped[str] = mapped_column(name="message", nullable=False)
+
+
 route_station_table = Table(
     "route_station",
     DB.metadata,
@@ -591,6 +797,7 @@ route_station_table = Table(
         server_default=func.now(),
     ),
     Column("updated", DateTime(timezone=True), server_default="null"),
+    Index("route_station_station_idx", "station_name"),
 )
 
 user_station_table = Table(
@@ -0,0 +1,237 @@
+"""
+Configuration and instrumentation of the database connection-pool, and the
+read-replicas used by read-only requests.
+"""
+
+import logging
+import threading
+from configparser import ConfigParser
+from time import monotonic
+from typing import Any
+
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+LOG = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A :py:class:`~sqlalchemy.pool.QueuePool` keeping track of how long
+    requests wait for a connection.
+
+    The checkout-time includes opening new connections (up to the overflow
+    limit) and waiting for a connection to be returned to the pool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.checkout_time = 0.0
+        self.max_checkout_time = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = monotonic()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            elapsed = monotonic() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.checkout_time += elapsed
+                self.max_checkout_time = max(self.max_checkout_time, elapsed)
+
+    def stats(self) -> dict[str, int | float]:
+        with self._stats_lock:
+            average = (
+                self.checkout_time / self.checkouts if self.checkouts else 0
+            )
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "overflow": max(self.overflow(), 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_checkout_ms": round(average * 1000, 3),
+                "max_checkout_ms": round(self.max_checkout_time * 1000, 3),
+            }
+
+
+def engine_options(config: ConfigParser) -> dict[str, Any]:
+    """
+    Build the "SQLALCHEMY_ENGINE_OPTIONS" from the [db] section of the
+    application config.
+    """
+    connect_args: dict[str, Any] = {}
+    statement_timeout = config.getint("db", "statement_timeout", fallback=0)
+    if statement_timeout > 0:
+        connect_args["options"] = f"-c statement_timeout={statement_timeout}"
+    prepare_threshold = config.get("db", "prepare_threshold", fallback="5")
+    if prepare_threshold.strip().lower() in ("", "none"):
+        # Required behind transaction-pooling proxies like PgBouncer
+        connect_args["prepare_threshold"] = None
+    else:
+        connect_args["prepare_threshold"] = int(prepare_threshold)
+
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": config.getint("db", "pool_size", fallback=5),
+        "max_overflow": config.getint("db", "max_overflow", fallback=10),
+        "pool_timeout": config.getfloat("db", "pool_timeout", fallback=30),
+        "pool_recycle": config.getint("db", "pool_recycle", fallback=1800),
+        "pool_pre_ping": config.getboolean(
+            "db", "pool_pre_ping", fallback=True
+        ),
+        "connect_args": connect_args,
+    }
+
+
+#: Replication lag (in seconds) of a PostgreSQL standby. It is 0 when all
+#: received changes have been applied, as the replay timestamp does not
+#: advance while the primary is idle. It is NULL if the standby has not
+#: replayed any transaction yet.
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """)
+
+
+class ReplicaSet:
+    """
+    Read-replicas of the primary database.
+
+    :py:meth:`choose` returns the replicas in turn, skipping those which are
+    unreachable or lag behind the primary by more than *max_lag* seconds.
+    The state of each replica is checked at most every *check_interval*
+    seconds. Checks run outside of the lock shared by all requests. While a
+    replica is checked, other requests use its previous state.
+    """
+
+    def __init__(
+        self,
+        engines: list[Engine],
+        max_lag: float = 5,
+        check_interval: float = 5,
+    ):
+        self.engines = engines
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.fallbacks = 0
+        self._states: dict[Engine, tuple[float, float | None]] = {}
+        self._uses = {engine: 0 for engine in engines}
+        self._next = 0
+        self._checking: set[Engine] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create(config: ConfigParser) -> "ReplicaSet":
+        cfg_data = config.get("db", "replicas", fallback="")
+        dsns = [line.strip() for line in cfg_data.splitlines() if line.strip()]
+        options = engine_options(config)
+        # An unreachable replica must not hold up requests for long
+        options["connect_args"] = {
+            **options["connect_args"],
+            "connect_timeout": config.getint(
+                "db", "replica_connect_timeout", fallback=2
+            ),
+        }
+        engines = []
+        for dsn in dsns:
+            if dsn.startswith("postgresql"):
+                engines.append(create_engine(dsn, **options))
+            else:
+                engines.append(create_engine(dsn))
+        return ReplicaSet(
+            engines,
+            config.getfloat("db", "replica_max_lag", fallback=5),
+            config.getfloat("db", "replica_check_interval", fallback=5),
+        )
+
+    def lag(self, engine: Engine) -> float | None:
+        """
+        Return the replication lag of a replica (``None`` if unreachable or
+        unknown)
+        """
+        try:
+            with engine.connect() as connection:
+                if engine.dialect.name != "postgresql":
+                    connection.execute(text("SELECT 1"))
+                    return 0
+                lag = connection.execute(LAG_QUERY).scalar_one()
+        except exc.SQLAlchemyError:
+            LOG.exception("Replica %r is unavailable", engine.url)
+            return None
+        if lag is None:
+            LOG.warning("Replica %r has not replayed anything yet", engine.url)
+            return None
+        return float(lag)
+
+    def _current_lag(self, engine: Engine) -> float | None:
+        """
+        Return the lag of a replica, checking it first if the last check is
+        older than *check_interval*.
+        """
+        with self._lock:
+            checked, lag = self._states.get(engine, (0, None))
+            outdated = (
+                engine not in self._states
+                or monotonic() - checked > self.check_interval
+            )
+            if not outdated or engine in self._checking:
+                return lag
+            self._checking.add(engine)
+        try:
+            lag = self.lag(engine)
+        finally:
+            with self._lock:
+                self._checking.discard(engine)
+                self._states[engine] = (monotonic(), lag)
+        if lag is not None and lag > self.max_lag:
+            LOG.warning(
+                "Replica %r lags %.1fs behind. Not using it.", engine.url, lag
+            )
+        return lag
+
+    def choose(self) -> Engine | None:
+        """
+        Return the next usable replica or ``None`` if the primary must be
+        used.
+        """
+        if not self.engines:
+            return None
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.engines)
+        for offset in range(len(self.engines)):
+            engine = self.engines[(start + offset) % len(self.engines)]
+            lag = self._current_lag(engine)
+            if lag is not None and lag <= self.max_lag:
+                with self._lock:
+                    self._uses[engine] += 1
+                return engine
+        with self._lock:
+            self.fallbacks += 1
+        return None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "fallbacks": self.fallbacks,
+            "replicas": [
+                {
+                    "url": engine.url.render_as_string(hide_password=True),
+                    "lag": self._states.get(engine, (0, None))[1],
+                    "uses": self._uses[engine],
+                }
+                for engine in self.engines
+            ],
+        }
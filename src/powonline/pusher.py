@@ -1,13 +1,173 @@
 """
 Utility functions to work with pusher.com for distributed live-events.
 """
+import atexit
 import logging
+import threading
+import time
 from abc import ABCMeta, abstractmethod
+from collections import deque
+from typing import Any, Callable
 
 import pusher  # type: ignore
 
+from .events import EventBroker
+
 LOG = logging.getLogger(__name__)
 
+#: The maximum number of events pusher.com accepts in one batch-trigger
+MAX_BATCH_SIZE = 10
+
+#: Policies for events which arrive while the queue is full
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+
+
+class Dispatcher:
+    """
+    Sends events from a bounded queue in a background thread.
+
+    Events which queued up while a request was in flight are sent together
+    (up to *batch_size* per call to *send_batch*). Failed calls are retried
+    *max_retries* times with an exponential backoff before the events are
+    given up on.
+
+    The thread is started on the first event (so it is created in each
+    worker process after forking) and the remaining events are flushed when
+    the interpreter exits.
+    """
+
+    def __init__(
+        self,
+        send_batch: Callable[[list[dict[str, Any]]], None],
+        max_queue: int = 1000,
+        overflow: str = DROP_OLDEST,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        batch_size: int = MAX_BATCH_SIZE,
+    ):
+        if overflow not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy: {overflow!r}")
+        self.send_batch = send_batch
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self._queue: deque[dict[str, Any]] = deque()
+        self._in_flight = 0
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self._condition = threading.Condition()
+
+    def put(self, event: dict[str, Any]) -> bool:
+        """
+        Queue an event for sending. Returns ``False`` if the event (or an
+        older one, depending on the overflow policy) had to be dropped.
+        """
+        with self._condition:
+            if self._closed:
+                LOG.warning("Dispatcher is closed. Dropping %r", event)
+                self.dropped += 1
+                return False
+            accepted = True
+            if len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                accepted = False
+                if self.overflow == DROP_NEWEST:
+                    LOG.warning("Event queue full. Dropping %r", event)
+                    return False
+                LOG.warning(
+                    "Event queue full. Dropping %r", self._queue.popleft()
+                )
+            self._queue.append(event)
+            self._start()
+            self._condition.notify_all()
+            return accepted
+
+    def _start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="pusher-dispatcher", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                count = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(count)]
+                self._in_flight = count
+            try:
+                self._send(batch)
+            finally:
+                with self._condition:
+                    self._in_flight = 0
+                    self._condition.notify_all()
+
+    def _send(self, batch: list[dict[str, Any]]) -> None:
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                self.send_batch(batch)
+            except Exception:
+                LOG.exception(
+                    "Unable to send %d events (attempt %d of %d)",
+                    len(batch),
+                    attempt + 1,
+                    self.max_retries + 1,
+                )
+            else:
+                self.sent += len(batch)
+                return
+        self.failed += len(batch)
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """
+        Wait until all queued events are processed. Returns ``False`` if
+        that did not happen within *timeout* seconds.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._queue and not self._in_flight, timeout
+            )
+
+    def close(self, timeout: float | None = 5) -> None:
+        """
+        Send the remaining events and stop the background thread
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                LOG.warning(
+                    "%d events not sent on shutdown", len(self._queue)
+                )
+        atexit.unregister(self.close)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
 
 class PusherWrapper(metaclass=ABCMeta):
     def __init__(self, channels):
@@ -27,6 +187,10 @@ class PusherWrapper(metaclass=ABCMeta):
             ),
         }
 
+        backend = config.get("pusher", "backend", fallback="pusher")
+        if backend == "sse":
+            return SsePusher(channels, EventBroker.create(config))
+
         if not all([app_id, key, secret]):
             LOG.warning(
                 "Instantiating NullPusher "
@@ -34,7 +198,23 @@ class PusherWrapper(metaclass=ABCMeta):
             )
             return NullPusher(channels)
         else:
-            return DefaultPusher(app_id, key, secret, channels)
+            return DefaultPusher(
+                app_id,
+                key,
+                secret,
+                channels,
+                host=config.get("pusher", "host", fallback=None),
+                port=config.getint("pusher", "port", fallback=None),
+                ssl=config.getboolean("pusher", "ssl", fallback=True),
+                background=config.getboolean(
+                    "pusher", "background", fallback=True
+                ),
+                max_queue=config.getint("pusher", "queue_size", fallback=1000),
+                overflow=config.get("pusher", "overflow", fallback=DROP_OLDEST),
+                max_retries=config.getint(
+                    "pusher", "max_retries", fallback=3
+                ),
+            )
 
     @abstractmethod
     def trigger(self, channel, event, payload):
@@ -48,6 +228,9 @@ class PusherWrapper(metaclass=ABCMeta):
         channel = self.channels["file-event-channel"]
         self.trigger(channel, event, payload)
 
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.__class__.__name__}
+
 
 class NullPusher(PusherWrapper):
     """
@@ -60,17 +243,83 @@ class NullPusher(PusherWrapper):
         )
 
 
+class SsePusher(PusherWrapper):
+    """
+    Publishes events to a self-hosted broker. Clients receive them from the
+    "/events" endpoint as Server-Sent Events.
+    """
+
+    def __init__(self, channels, broker):
+        super().__init__(channels)
+        self.broker = broker
+
+    def trigger(self, channel, event, payload):
+        LOG.debug("Publishing event %r to channel %r", event, channel)
+        self.broker.publish(channel, event, payload)
+
+    def stats(self):
+        output = super().stats()
+        output["broker"] = self.broker.__class__.__name__
+        return output
+
+
 class DefaultPusher(PusherWrapper):
-    def __init__(self, app_id, key, secret, channels):
+    """
+    Sends events to pusher.com.
+
+    With *background* enabled, events are handed to a :py:class:`Dispatcher`
+    instead of being sent while the request is processed.
+
+    *host* and *port* allow to use a different (f.ex. a local fake) server.
+    """
+
+    def __init__(
+        self,
+        app_id,
+        key,
+        secret,
+        channels,
+        host=None,
+        port=None,
+        ssl=True,
+        background=True,
+        **dispatcher_args,
+    ):
         super().__init__(channels)
-        self._pusher = pusher.Pusher(
-            app_id=app_id, key=key, secret=secret, cluster="eu", ssl=True
-        )
+        if host:
+            self._pusher = pusher.Pusher(
+                app_id=app_id,
+                key=key,
+                secret=secret,
+                host=host,
+                port=port,
+                ssl=ssl,
+            )
+        else:
+            self._pusher = pusher.Pusher(
+                app_id=app_id, key=key, secret=secret, cluster="eu", ssl=ssl
+            )
+        self.dispatcher = None
+        if background:
+            self.dispatcher = Dispatcher(
+                self._pusher.trigger_batch, **dispatcher_args
+            )
         LOG.debug("Successfully created pusher client for app-id %r", app_id)
 
     def trigger(self, channel, event, payload):
         LOG.debug("Sending event %r to channel %r", event, channel)
+        if self.dispatcher is not None:
+            self.dispatcher.put(
+                {"channel": channel, "name": event, "data": payload}
+            )
+            return
         try:
             self._pusher.trigger(channel, event, payload)
         except:
             LOG.exception("Unable to contact pusher!")
+
+    def stats(self):
+        output = super().stats()
+        if self.dispatcher is not None:
+            output.update(self.dispatcher.stats())
+        return output
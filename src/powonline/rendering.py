@@ -0,0 +1,107 @@
+"""
+Rendering of JSON response documents.
+
+Documents are serialized by pydantic-core in one pass, straight to bytes.
+Lists of ORM-instances are validated against their schema with a cached
+:py:class:`~pydantic.TypeAdapter` reading the attributes of the instances,
+so each item is only converted once.
+"""
+
+from functools import cache
+from typing import Any, Callable, Iterable
+
+from flask import Response, make_response
+from pydantic import BaseModel, TypeAdapter
+from pydantic_core import to_json
+
+
+@cache
+def adapter(type_: Any) -> TypeAdapter:
+    """
+    Return the (cached) adapter for *type_*
+    """
+    return TypeAdapter(type_)
+
+
+def list_adapter(schema: type[BaseModel]) -> TypeAdapter:
+    """
+    Return the (cached) adapter for lists of *schema*
+    """
+    return adapter(list[schema])  # type: ignore
+
+
+def validate_list(
+    schema: type[BaseModel], objects: Iterable[Any]
+) -> list[BaseModel]:
+    """
+    Convert *objects* (ORM-instances or dicts) into instances of *schema*
+    """
+    return list_adapter(schema).validate_python(
+        list(objects), from_attributes=True
+    )
+
+
+def json_response(document: bytes, status_code: int = 200) -> Response:
+    response = make_response(document, status_code)
+    response.content_type = "application/json"
+    return response
+
+
+def render(document: Any, status_code: int = 200) -> Response:
+    """
+    Create a JSON response of *document*.
+
+    Next to the JSON types this supports pydantic models, enums (as their
+    value), sets (as lists) and datetimes (as ISO-8601 strings). Documents
+    with a fixed structure are better rendered with :py:func:`render_as`.
+    """
+    return json_response(to_json(document), status_code)
+
+
+def render_as(type_: Any, document: Any, status_code: int = 200) -> Response:
+    """
+    Create a JSON response of *document* (which may contain ORM-instances)
+    validated and serialized as *type_*.
+    """
+    adapter_ = adapter(type_)
+    validated = adapter_.validate_python(document, from_attributes=True)
+    return json_response(adapter_.dump_json(validated), status_code)
+
+
+def render_list(
+    schema: type[BaseModel], objects: Iterable[Any], status_code: int = 200
+) -> Response:
+    """
+    Create a "ListResponse" document of *objects* rendered with *schema*
+    """
+    items = list_adapter(schema).dump_json(validate_list(schema, objects))
+    return json_response(b'{"items":' + items + b"}", status_code)
+
+
+def list_response(
+    query,
+    entity,
+    field_names: list[str],
+    limit: int,
+    cursor: Callable[[Any], str],
+) -> Response:
+    """
+    Create a "ListResponse" document of the fields *field_names* of the
+    entities in *query*.
+
+    Only the columns of these fields are queried. The rows are serialized to
+    JSON in one pass, without creating ORM-instances or pydantic models.
+
+    If the page is full, the "X-Next-Cursor" header contains the value for
+    the "cursor" argument of the next request, as returned by *cursor* for
+    the last row.
+    """
+    columns = [getattr(entity, name) for name in field_names]
+    rows = query.with_entities(*columns).all()
+    # Formatted like the pydantic models in the other list responses
+    response = json_response(
+        to_json({"items": [row._asdict() for row in rows]})
+    )
+    if limit and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = cursor(rows[-1])
+    return response
@@ -1,29 +1,38 @@
+import csv
 import logging
 from datetime import datetime, timezone
 from enum import Enum
 from functools import wraps
-from json import JSONEncoder, dumps
+from io import StringIO
+from itertools import islice
+from json import dumps
 from os import makedirs, stat, unlink
 from os.path import basename, dirname, join
 from typing import TYPE_CHECKING, Any, cast
+from uuid import UUID
 
 import jwt
 from flask import (
+    Response,
     current_app,
     g,
     jsonify,
     make_response,
     request,
+    send_file,
     send_from_directory,
+    stream_with_context,
     url_for,
 )
 from flask_restful import Resource, fields, marshal_with  # type: ignore
-from PIL import ExifTags, Image
+from pydantic import BaseModel
 from werkzeug.utils import secure_filename
 
 from powonline.schema import (
+    AssignmentsSchema,
+    BatchJobSchema,
+    DashboardRowSchema,
     JobSchema,
-    ListResponse,
     QuestionnaireSchema,
     RoleSchema,
     RouteSchema,
@@ -32,7 +41,7 @@ from powonline.schema import (
     UserSchema,
 )
 
-from . import core
+from . import core, thumbnails
 from .core import StationRelation
 from .exc import (
     AccessDenied,
@@ -40,15 +49,23 @@ from .exc import (
     UserInputError,
     ValidationError,
 )
+from .httputil import begin_read, conditional
 from .model import DB
 from .model import AuditLog as DBAuditLog
-from .model import AuditType, TeamState
+from .model import AuditType
+from .model import Questionnaire as DBQuestionnaire
+from .model import Team as DBTeam
+from .model import TeamState
 from .model import Upload as DBUpload
+from .pool import TimedQueuePool
+from .rendering import list_response, render, render_as, render_list
 from .util import allowed_file, get_user_identity, get_user_permissions
 
-EXIF_TAGS = ExifTags.TAGS
 LOG = logging.getLogger(__name__)
 
+#: Cache lifetime (in seconds) of served uploads and their thumbnails
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+
 if TYPE_CHECKING:
     from powonline.web import MyFlask
 
@@ -57,56 +74,119 @@ class ErrorType(Enum):
     INVALID_SCHEMA = "invalid-schema"
 
 
-def upload_to_json(db_instance: DBUpload) -> dict[str, Any]:
+#: Used to derive the common URL-prefix of uploaded files
+UUID_PLACEHOLDER = "00000000-0000-0000-0000-000000000000"
+
+
+def file_url_prefix() -> str:
     """
-    Convert a DB-instance of an upload to a JSONifiable dictionary
+    Return the URL of uploaded files without the trailing UUID.
+
+    Computing this once allows listings to build the URLs of many files
+    without calling "url_for" for each of them.
     """
-    file_url = url_for(
-        "api.get_file", uuid=db_instance.uuid, _external=True, _scheme="https"
-    )
-    tn_url = url_for(
-        "api.get_file",
-        uuid=db_instance.uuid,
-        size=256,
-        _external=True,
-        _scheme="https",
-    )
-    tiny_url = url_for(
-        "api.get_file",
-        uuid=db_instance.uuid,
-        size=64,
-        _external=True,
-        _scheme="https",
+    url = url_for(
+        "api.get_file", uuid=UUID_PLACEHOLDER, _external=True, _scheme="https"
     )
+    return url[: -len(UUID_PLACEHOLDER)]
 
-    app = cast("MyFlask", current_app)
-    data_folder = app.localconfig.get(  # type: ignore
-        "app", "upload_folder", fallback=core.Upload.FALLBACK_FOLDER
-    )
-    fullname = join(data_folder, db_instance.filename or "")
 
-    try:
-        mtime_unix = stat(fullname).st_mtime
-    except FileNotFoundError:
-        LOG.warning("Missing file %r (was in DB but not on disk)!", fullname)
-        return {}
-    mtime = datetime.fromtimestamp(mtime_unix, timezone.utc)
+def upload_to_json(
+    db_instance: DBUpload, url_prefix: str = ""
+) -> dict[str, Any]:
+    """
+    Convert a DB-instance of an upload to a JSONifiable dictionary
+
+    :param url_prefix: The value returned by :py:func:`file_url_prefix`.
+        Computed if not given.
+    """
+    if db_instance.mtime is None:
+        # The file was stored before file-infos were recorded in the DB
+        app = cast("MyFlask", current_app)
+        data_folder = app.localconfig.get(  # type: ignore
+            "app", "upload_folder", fallback=core.Upload.FALLBACK_FOLDER
+        )
+        fullname = join(data_folder, db_instance.filename or "")
+        try:
+            mtime_unix = stat(fullname).st_mtime
+        except FileNotFoundError:
+            LOG.warning(
+                "Missing file %r (was in DB but not on disk)!", fullname
+            )
+            return {}
+        mtime = datetime.fromtimestamp(mtime_unix, timezone.utc)
+    else:
+        mtime = db_instance.mtime.astimezone(timezone.utc)
+
+    # The "v" parameter changes whenever the file is replaced, which allows
+    # clients to cache the URLs indefinitely.
+    file_url = "%s%s?v=%d" % (
+        url_prefix or file_url_prefix(),
+        db_instance.uuid,
+        mtime.timestamp(),
+    )
 
     return {
         "uuid": db_instance.uuid,
         "href": file_url,
-        "thumbnail": tn_url,
-        "tiny": tiny_url,
+        "thumbnail": file_url + "&size=256",
+        "tiny": file_url + "&size=64",
         "name": basename(db_instance.filename or ""),
         "when": mtime.isoformat(),
     }
 
 
+def requested_fields(schema: type[BaseModel]) -> list[str]:
+    """
+    Return the fields of *schema* selected with the "fields" argument (a
+    comma-separated list), or all fields if it is missing.
+
+    "name" (used as pagination-cursor) is always included.
+
+    :raises ValueError: If an unknown field is requested
+    """
+    value = request.args.get("fields", "")
+    if not value:
+        return list(schema.model_fields)
+    selected = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = selected - set(schema.model_fields)
+    if unknown:
+        raise ValueError("Unknown fields: %s" % ", ".join(sorted(unknown)))
+    selected.add("name")
+    return [name for name in schema.model_fields if name in selected]
+
+
+def may_access_station(auth_payload: dict[str, Any], station_name: str) -> bool:
+    """
+    Check if the user identified by a JWT payload manages a station.
+
+    If enabled with "security.jwt_stations", the stations embedded in the
+    token at login are used instead of the stations stored in the DB.
+    """
+    app = cast("MyFlask", current_app)
+    stations = auth_payload.get("stations")
+    if stations is not None and app.localconfig.getboolean(
+        "security", "jwt_stations", fallback=False
+    ):
+        return station_name in stations
+    return core.User.may_access_station(
+        DB.session, auth_payload["username"], station_name
+    )
+
+
 def validate_score(value):
+    """
+    Convert a score sent by a client to an integer. Missing or empty values
+    count as 0.
+
+    :raises ValueError: If the value is not an integer
+    """
     if isinstance(value, str):
         score = int(value, 10) if value.strip() else 0
     else:
-        score = value if value else 0
+        score = value if value is not None else 0
+    if isinstance(score, bool) or not isinstance(score, int):
+        raise ValueError("Invalid score: %r" % (value,))
     return score
 
 
@@ -149,29 +229,10 @@ class require_permissions:
         return fun
 
 
-class MyJsonEncoder(JSONEncoder):
-    def default(self, o):
-        if isinstance(o, set):
-            return list(o)
-        elif isinstance(o, Enum):
-            return o.value
-        elif isinstance(o, datetime):
-            return o.isoformat()
-        super().default(o)
-
-
 class UserList(Resource):
     @require_permissions("manage_permissions")
     def get(self):
-        users = core.User.all(DB.session)
-        users = [
-            UserSchema.model_dump(UserSchema.model_validate(user))
-            for user in users
-        ]
-        document = ListResponse(items=users).model_dump_json()
-        output = make_response(document, 200)
-        output.content_type = "application/json"
-        return output
+        return render_list(UserSchema, core.User.all(DB.session))
 
     @require_permissions("manage_permissions")
     def post(self):
@@ -212,6 +273,7 @@ class User(Resource):
 
 
 class TeamList(Resource):
+    @conditional("team", "route")
     def get(self):
         quickfilter = request.args.get("quickfilter", "")
         assigned_to_route = request.args.get("assigned_route", "")
@@ -226,16 +288,20 @@ class TeamList(Resource):
         else:
             teams = core.Team.all(DB.session)
 
-        teams = [
-            TeamSchema.model_dump(TeamSchema.model_validate(team))
-            for team in teams
-        ]
-        output = ListResponse(items=teams)
-        parsed_output = output.model_dump_json()
-
-        output = make_response(parsed_output, 200)
-        output.content_type = "application/json"
-        return output
+        limit = request.args.get("limit", 0, type=int)
+        if limit < 0:
+            return "The limit must not be negative", 400
+        try:
+            field_names = requested_fields(TeamSchema)
+        except ValueError as exc:
+            return str(exc), 400
+        try:
+            teams = core.Team.page(teams, limit, request.args.get("cursor", ""))
+        except ValueError:
+            return "Invalid cursor", 400
+        return list_response(
+            teams, DBTeam, field_names, limit, core.name_cursor
+        )
 
     @require_permissions("admin_teams")
     def post(self):
@@ -293,16 +359,9 @@ class Team(Resource):
 
 
 class StationList(Resource):
+    @conditional("station")
     def get(self):
-        items = core.Station.all(DB.session)
-        items = [
-            StationSchema.model_dump(StationSchema.model_validate(item))
-            for item in items
-        ]
-        parsed_output = ListResponse(items=items).model_dump_json()
-        output = make_response(parsed_output, 200)
-        output.content_type = "application/json"
-        return output
+        return render_list(StationSchema, core.Station.all(DB.session))
 
     @require_permissions("admin_stations")
     def post(self):
@@ -346,9 +405,7 @@ class Station(Resource):
     def put(self, name):
         auth, permissions = get_user_permissions(request)
 
-        if "admin" not in auth["roles"] and not core.User.may_access_station(
-            DB.session, auth["username"], name
-        ):
+        if "admin" not in auth["roles"] and not may_access_station(auth, name):
             return "Access denied to this station!", 401
 
         data = request.get_json()
@@ -366,15 +423,7 @@ class Station(Resource):
 
 class RouteList(Resource):
     def get(self):
-        items = list(core.Route.all(DB.session))
-        items = [
-            RouteSchema.model_dump(RouteSchema.model_validate(item))
-            for item in items
-        ]
-        parsed_output = ListResponse(items=items).model_dump_json()
-        output = make_response(parsed_output, 200)
-        output.content_type = "application/json"
-        return output
+        return render_list(RouteSchema, core.Route.all(DB.session))
 
     @require_permissions("admin_routes")
     def post(self):
@@ -434,7 +483,7 @@ class StationUserList(Resource):
         output = []
         for station in all_stations:
             output.append((station.name, station.name in user_stations))
-        return jsonify(output)
+        return render(output)
 
     @require_permissions("manage_permissions")
     def get(self, station_name=None, user_name=None):
@@ -521,7 +570,7 @@ class UserRoleList(Resource):
         output = []
         for role in all_roles:
             output.append((role.name, role.name in user_roles))
-        return jsonify(output)
+        return render(output)
 
     @require_permissions("manage_permissions")
     def post(self, user_name):
@@ -595,12 +644,9 @@ class TeamStation(Resource):
     def get(self, team_name, station_name=None):
         if station_name is None:
             items = core.Team.stations(DB.session, team_name)
-            parsed_output = ListResponse(
-                items=sorted(items, key=lambda x: x.name)
-            ).model_dump_json()
-            output = make_response(parsed_output, 200)
-            output.content_type = "application/json"
-            return output
+            return render_list(
+                StationSchema, sorted(items, key=lambda x: x.name)
+            )
         else:
             state = core.Team.get_station_data(
                 DB.session, team_name, station_name
@@ -612,28 +658,10 @@ class TeamStation(Resource):
 
 
 class Assignments(Resource):
+    @conditional("route", "station", "team")
     def get(self):
         data = core.get_assignments(DB.session)
-
-        out_stations = {}
-        for route_name, stations in data["stations"].items():
-            out_stations[route_name] = [
-                StationSchema.model_dump(StationSchema.model_validate(station))
-                for station in stations
-            ]
-
-        out_teams = {}
-        for route_name, teams in data["teams"].items():
-            out_teams[route_name] = [
-                TeamSchema.model_dump(TeamSchema.model_validate(team))
-                for team in teams
-            ]
-
-        output = {"stations": out_stations, "teams": out_teams}
-
-        output = make_response(dumps(output, cls=MyJsonEncoder), 200)
-        output.content_type = "application/json"
-        return output
+        return render_as(AssignmentsSchema, data)
 
 
 class Scoreboard(Resource):
@@ -641,11 +669,17 @@ class Scoreboard(Resource):
     Helper resource for the frontend
     """
 
+    @conditional("team", "team_score")
     def get(self):
-        output = list(core.scoreboard(DB.session))
-        output = make_response(dumps(output, cls=MyJsonEncoder), 200)
-        output.content_type = "application/json"
-        return output
+        rows = core.Scoreboard.ranked(DB.session)
+        if "ranked" in request.args:
+            output = [
+                {"rank": rank, "team": team_name, "score": score}
+                for rank, team_name, score in rows
+            ]
+        else:
+            output = [[team_name, score] for _, team_name, score in rows]
+        return render(output)
 
 
 class Dashboard(Resource):
@@ -653,6 +687,7 @@ class Dashboard(Resource):
     Helper resource for the frontend
     """
 
+    @conditional("route", "station", "team", "team_station_state")
     def get(self, station_name, relation=""):
         if relation.strip():
             try:
@@ -666,9 +701,7 @@ class Dashboard(Resource):
                 DB.session, station_name, parsed_relation
             )
             if not station_name:
-                output = make_response("[]")
-                output.content_type = "application/json"
-                return output
+                return render([])
 
         output = []
         for team_name, state, score, updated in core.Station.team_states(
@@ -683,22 +716,55 @@ class Dashboard(Resource):
                 }
             )
 
-        output = make_response(dumps(output, cls=MyJsonEncoder), 200)
-        output.content_type = "application/json"
-        return output
+        return render_as(list[DashboardRowSchema], output)
 
 
 class GlobalDashboard(Resource):
     """
     The global state of each team on each station of the event.
+
+    With "?since=<version>" only the cells (and questionnaire scores) which
+    changed since that version are returned, together with the version for
+    the next request. The version of the full dashboard is sent in the
+    "X-Change-Version" header. Versions older than the retention of the
+    change-log, or older than the removal of a team, station or
+    questionnaire, are answered with "410 Gone", in which case the full
+    dashboard has to be reloaded.
     """
 
     def get(self):
-        output = core.global_dashboard(DB.session)
-        output = make_response(dumps(output, cls=MyJsonEncoder), 200)
-        output.content_type = "application/json"
+        begin_read(DB.session())
+        if "since" in request.args:
+            try:
+                since = int(request.args["since"])
+            except ValueError:
+                return "Invalid version: %r" % request.args["since"], 400
+            if since < core.ChangeLog.horizon(DB.session):
+                return "Version %d is no longer available" % since, 410
+            return self._changes(since)
+        # Determined first, so the following changes are not missed
+        version = core.ChangeLog.version(DB.session)
+        output = self._dashboard()
+        output.headers["X-Change-Version"] = str(version)
         return output
 
+    @conditional("route", "station", "team", "team_station_state")
+    def _dashboard(self):
+        output = core.global_dashboard(DB.session)
+        return render(output)
+
+    @conditional(
+        "route",
+        "station",
+        "team",
+        "team_station_state",
+        "questionnaire",
+        "questionnaire_score",
+    )
+    def _changes(self, since):
+        output = core.ChangeLog.dashboard_changes(DB.session, since)
+        return render(output)
+
 
 class RouteColor(Resource):
     """
@@ -757,7 +823,10 @@ class UploadList(Resource):
             if not db_instance:
                 db_instance = DBUpload(relative_target, identity["username"])
                 DB.session.add(db_instance)
-                DB.session.flush()
+            db_instance.record_file_info(target)
+            DB.session.flush()
+
+            app.thumbnails.submit(db_instance.uuid, target)
 
             response = make_response("OK")
             event_object = upload_to_json(db_instance)
@@ -767,50 +836,80 @@ class UploadList(Resource):
             return response
         return "The given file is not allowed", 400
 
-    def _get_public(self):
+    def _paged_response(self, output, rows, limit):
+        """
+        Create the response for a page of uploads.
+
+        If the page is full, the "X-Next-Cursor" header contains the value
+        for the "cursor" argument of the next request.
+        """
+        response = render(output)
+        if limit and len(rows) == limit:
+            response.headers["X-Next-Cursor"] = str(rows[-1].uuid)
+        return response
+
+    def _get_public(self, limit, cursor):
         """
         Return files for a public request (f.ex. image gallery)
         """
+        begin_read(DB.session())
+        url_prefix = file_url_prefix()
+        query = core.Upload.all(DB.session)
+        rows = core.Upload.page(query, limit, cursor).all()
         output = []
-        files = core.Upload.all(DB.session)
-        for item in files:
-            json_data = upload_to_json(item)
+        for item in rows:
+            json_data = upload_to_json(item, url_prefix)
             if json_data:
                 output.append(json_data)
-        return jsonify(output)
+        return self._paged_response(output, rows, limit)
 
-    def _get_private(self):
+    def _get_private(self, limit, cursor):
         """
         Return files for a private request (f.ex. manageing uploads)
         """
         identity, all_permissions = get_user_permissions(request)
+        url_prefix = file_url_prefix()
         output = {}
         if "admin_files" in all_permissions:
-            files = core.Upload.all(DB.session)
-            for item in files:
+            query = core.Upload.all(DB.session)
+            rows = core.Upload.page(query, limit, cursor).all()
+            for item in rows:
                 output_files = output.setdefault(item.username, [])
-                json_data = upload_to_json(item)
+                json_data = upload_to_json(item, url_prefix)
                 if json_data:
                     output_files.append(json_data)
         else:
             username = identity["username"]
-            files = core.Upload.list(DB.session, username)
+            query = core.Upload.list(DB.session, username)
+            rows = core.Upload.page(query, limit, cursor).all()
             output_files = []
-            for item in files:
-                json_data = upload_to_json(item)
+            for item in rows:
+                json_data = upload_to_json(item, url_prefix)
                 if json_data:
                     output_files.append(json_data)
             output["self"] = output_files
-        return jsonify(output)
+        return self._paged_response(output, rows, limit)
 
     def get(self):
         """
         Retrieve a list of uploads
+
+        The list can be paginated with the "limit" and "cursor" arguments
+        (see "_paged_response").
         """
+        limit = request.args.get("limit", 0, type=int)
+        if limit < 0:
+            return "The limit must not be negative", 400
+        cursor = request.args.get("cursor", "")
+        if cursor:
+            try:
+                cursor = str(UUID(cursor))
+            except ValueError:
+                return "Invalid cursor", 400
         if "public" in request.args:
-            return self._get_public()
+            return self._get_public(limit, cursor)
         else:
-            return self._get_private()
+            return self._get_private(limit, cursor)
 
 
 class Upload(Resource):
@@ -818,43 +917,6 @@ class Upload(Resource):
     A list of the current user's uploaded files
     """
 
-    FILE_MAPPINGS = {
-        "gif": ("gif", "image/gif"),
-        "jpg": ("jpeg", "image/jpeg"),
-        "jpeg": ("jpeg", "image/jpeg"),
-        "png": ("png", "image/png"),
-    }
-
-    def _rotated(self, fullname):
-        im = Image.open(fullname)
-        o_id = {v: k for k, v in EXIF_TAGS.items()}["Orientation"]
-        orientation = im.getexif().get(o_id)
-        if not orientation:
-            return im
-        if orientation == 3:
-            im = im.rotate(180, expand=True)
-        elif orientation == 6:
-            im = im.rotate(270, expand=True)
-        elif orientation == 8:
-            im = im.rotate(90, expand=True)
-        return im
-
-    def _thumbnail(self, fullname, size):
-        from io import BytesIO
-
-        im = self._rotated(fullname)
-
-        # Limit the size to an upper-bound. This prevents users from enlarging
-        # files to inhumane sizes triggering a DoS
-        if size and size < 4000:
-            im.thumbnail((size, size))
-
-        _, extension = fullname.rsplit(".", 1)
-        pillow_type, mediatype = Upload.FILE_MAPPINGS[extension.lower()]
-        output = BytesIO()
-        im.save(output, format=pillow_type)
-        return output, mediatype
-
     def get(self, uuid):
         """
         Retrieve a single file
@@ -871,15 +933,32 @@ class Upload(Resource):
 
         size = request.args.get("size", 0, type=int)
         fullname = join(data_folder, db_instance.filename)
-        thumbnail, mediatype = self._thumbnail(fullname, size)
-        output = make_response(thumbnail.getvalue())
-        output.headers["Content-Type"] = mediatype
-        output.headers.set(
-            "Content-Disposition",
-            "inline",
-            filename="thn_%s" % (basename(db_instance.filename)),
+        try:
+            derivative = app.thumbnails.get(uuid, fullname, size)
+        except FileNotFoundError:
+            LOG.warning(
+                "Missing file %r (was in DB but not on disk)!", fullname
+            )
+            return "File not found", 404
+        _, mediatype = thumbnails.file_type(fullname)
+        # Derivative URLs are versioned with the mtime of the original (see
+        # "upload_to_json"). Replaced files keep their UUID, so only URLs of
+        # the current version can be cached for a long time. Others are
+        # revalidated with conditional requests.
+        if db_instance.mtime is None:
+            mtime = stat(fullname).st_mtime
+        else:
+            mtime = db_instance.mtime.timestamp()
+        max_age = None
+        if request.args.get("v", type=int) == int(mtime):
+            max_age = THUMBNAIL_MAX_AGE
+        return send_file(
+            derivative,
+            mimetype=mediatype,
+            download_name="thn_%s" % (basename(db_instance.filename)),
+            conditional=True,
+            max_age=max_age,
         )
-        return output
 
     def delete(self, uuid):
         """
@@ -902,6 +981,7 @@ class Upload(Resource):
         )
         fullname = join(data_folder, db_instance.filename)
         unlink(fullname)
+        app.thumbnails.discard(uuid)
         DB.session.delete(db_instance)
         DB.session.commit()
         app = cast("MyFlask", current_app)
@@ -911,24 +991,148 @@ class Upload(Resource):
 
 class AuditLog(Resource):
     """
-    A list of audit-messages
+    A list of audit-messages, newest first
     """
 
+    #: The columns of exported entries
+    FIELDS = ("timestamp", "username", "type", "message")
+
+    #: The number of entries fetched (and sent) at once by exports
+    EXPORT_BATCH_SIZE = 500
+
+    @staticmethod
+    def _to_json(row: DBAuditLog) -> dict[str, Any]:
+        return {
+            "timestamp": row.timestamp.isoformat(),
+            "username": row.username,
+            "type": row.type_,
+            "message": row.message,
+        }
+
+    @staticmethod
+    def _parse_time(value: str) -> datetime:
+        output = datetime.fromisoformat(value)
+        if output.tzinfo is None:
+            output = output.replace(tzinfo=timezone.utc)
+        return output
+
+    def _ndjson_lines(self, rows):
+        for row in rows:
+            yield dumps(self._to_json(row)) + "\n"
+
+    def _csv_lines(self, rows):
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.FIELDS)
+        for row in rows:
+            data = self._to_json(row)
+            writer.writerow([data[field] for field in self.FIELDS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    def _export(self, query, format_: str) -> Response:
+        """
+        Stream all entries of *query* as CSV or newline-delimited JSON.
+
+        The entries are read from a server-side cursor in batches, so the
+        size of the audit-log does not affect the memory of the worker.
+        """
+        rows = query.yield_per(self.EXPORT_BATCH_SIZE)
+        if format_ == "csv":
+            lines = self._csv_lines(rows)
+            mimetype = "text/csv"
+        else:
+            lines = self._ndjson_lines(rows)
+            mimetype = "application/x-ndjson"
+
+        def generate():
+            while chunk := "".join(islice(lines, self.EXPORT_BATCH_SIZE)):
+                yield chunk
+
+        disposition = f"attachment; filename=auditlog.{format_}"
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={"Content-Disposition": disposition},
+        )
+
     @require_permissions("view_audit_log")
     def get(self):
-        query = DB.session.query(DBAuditLog).order_by(
-            DBAuditLog.timestamp.desc()  # type: ignore
+        """
+        Retrieve the audit-log
+
+        The entries can be filtered with the "username", "type", "since"
+        and "until" arguments (the latter two are ISO-8601 timestamps,
+        "until" is exclusive).
+
+        With "format=csv" or "format=ndjson" all matching entries are
+        exported. Otherwise the list can be paginated with the "limit" and
+        "cursor" arguments. If a page is full, the "X-Next-Cursor" header
+        contains the value for the "cursor" argument of the next request.
+        """
+        format_ = request.args.get("format", "json")
+        if format_ not in ("json", "ndjson", "csv"):
+            return "Unsupported format", 400
+        limit = request.args.get("limit", 0, type=int)
+        if limit < 0:
+            return "The limit must not be negative", 400
+        try:
+            type_ = AuditType(request.args["type"])
+        except KeyError:
+            type_ = None
+        except ValueError:
+            return "Invalid type", 400
+        times = {}
+        for name in ("since", "until"):
+            if name not in request.args:
+                continue
+            try:
+                times[name] = self._parse_time(request.args[name])
+            except ValueError:
+                return f"Invalid time in {name!r}", 400
+
+        app = cast("MyFlask", current_app)
+        app.audit.flush()
+        query = core.AuditLog.query(
+            DB.session,
+            request.args.get("username", ""),
+            type_,
+            times.get("since"),
+            times.get("until"),
         )
-        output = []
-        for row in query:
-            output.append(
-                {
-                    "timestamp": row.timestamp.isoformat(),
-                    "username": row.username,
-                    "type": row.type_,
-                    "message": row.message,
-                }
-            )
+        if format_ != "json":
+            return self._export(query, format_)
+        try:
+            rows = core.AuditLog.page(
+                query, limit, request.args.get("cursor", "")
+            ).all()
+        except ValueError:
+            return "Invalid cursor", 400
+        response = render([self._to_json(row) for row in rows])
+        if limit and len(rows) == limit:
+            response.headers["X-Next-Cursor"] = core.AuditLog.cursor(rows[-1])
+        return response
+
+
+class Metrics(Resource):
+    """
+    Runtime metrics of the current worker process
+    """
+
+    @require_permissions("view_metrics")
+    def get(self):
+        app = cast("MyFlask", current_app)
+        output = {
+            "response_cache": app.response_cache.stats(),
+            "pusher": app.pusher.stats(),
+            "audit": app.audit.stats(),
+        }
+        pool = DB.engine.pool
+        if isinstance(pool, TimedQueuePool):
+            output["db_pool"] = pool.stats()
+        if app.replicas.engines:
+            output["db_replicas"] = app.replicas.stats()
         return output
 
 
@@ -945,9 +1149,7 @@ class Job(Resource):
 
         if "admin_stations" in permissions or (
             "manage_station" in permissions
-            and core.User.may_access_station(
-                DB.session, auth["username"], station_name
-            )
+            and may_access_station(auth, station_name)
         ):
             new_state = core.Team.advance_on_station(
                 DB.session, team_name, station_name
@@ -978,9 +1180,7 @@ class Job(Resource):
 
         if "admin_stations" in permissions or (
             "manage_station" in permissions
-            and core.User.may_access_station(
-                DB.session, auth["username"], station_name
-            )
+            and may_access_station(auth, station_name)
         ):
             LOG.info(
                 "Setting score of %s on %s to %s (by user: %s)",
@@ -993,12 +1193,17 @@ class Job(Resource):
                 DB.session, team_name, station_name, score
             )
             if old_score != new_score:
-                core.add_audit_log(
+                app.audit.add(
                     DB.session,
                     auth["username"],
-                    AuditType.STATION_SCORE,
-                    "Change score of team %r from %s to %s on station %s"
-                    % (team_name, old_score, score, station_name),
+                    [
+                        (
+                            AuditType.STATION_SCORE,
+                            "Change score of team %r from %s to %s on "
+                            "station %s"
+                            % (team_name, old_score, score, station_name),
+                        )
+                    ],
                 )
             output = {
                 "new_score": new_score,
@@ -1028,9 +1233,7 @@ class Job(Resource):
 
         if "admin_stations" in permissions or (
             "manage_station" in permissions
-            and core.User.may_access_station(
-                DB.session, auth["username"], station_name
-            )
+            and may_access_station(auth, station_name)
         ):
             LOG.info(
                 "Setting questionnaire score of %s on %s to %s ("
@@ -1058,12 +1261,17 @@ class Job(Resource):
                     500,
                 )
             if old_score != new_score:
-                core.add_audit_log(
+                app.audit.add(
                     DB.session,
                     auth["username"],
-                    AuditType.QUESTIONNAIRE_SCORE,
-                    "Change questionnaire score of team %r from %s to %s on station %s"
-                    % (team_name, old_score, score, station_name),
+                    [
+                        (
+                            AuditType.QUESTIONNAIRE_SCORE,
+                            "Change questionnaire score of team %r from %s "
+                            "to %s on station %s"
+                            % (team_name, old_score, score, station_name),
+                        )
+                    ],
                 )
             output = {
                 "new_score": new_score,
@@ -1092,6 +1300,221 @@ class Job(Resource):
         return func(**parsed_data.args)
 
 
+class BatchJob(Resource):
+    """
+    Apply many job-actions (see :py:class:`Job`) in one transaction.
+
+    This is used by stations replaying updates collected while they were
+    offline. Each action is checked individually and the response contains
+    one ``{"status": ..., "result": ...}`` entry per action, where "result"
+    is what the single job-endpoint would have returned. Rejected actions do
+    not prevent the others from being applied.
+
+    Instead of one Pusher event per action, a single "batch" event is sent,
+    containing the last event for each team, station and event-type.
+    """
+
+    #: Upper limit of actions in one request
+    MAX_JOBS = 500
+
+    def _may_access(self, auth, permissions, station_name, cache):
+        if station_name not in cache:
+            cache[station_name] = "admin_stations" in permissions or (
+                "manage_station" in permissions
+                and may_access_station(auth, station_name)
+            )
+        return cache[station_name]
+
+    @require_permissions("manage_station")
+    def post(self):
+        data = request.get_json()
+        parsed_data = BatchJobSchema.model_validate(data)
+        jobs = parsed_data.jobs
+        if len(jobs) > BatchJob.MAX_JOBS:
+            return "At most %d jobs are allowed" % BatchJob.MAX_JOBS, 400
+        auth, permissions = get_user_permissions(request)
+
+        results: list[tuple[int, Any] | None] = [None] * len(jobs)
+        accepted = []
+        known_teams = core.Team.existing(
+            DB.session, {job.args.get("team_name") for job in jobs}
+        )
+        known_stations = core.Station.existing(
+            DB.session, {job.args.get("station_name") for job in jobs}
+        )
+        questionnaires = core.Station.questionnaires(
+            DB.session,
+            {
+                job.args.get("station_name")
+                for job in jobs
+                if job.action == "set_questionnaire_score"
+            },
+        )
+        access_cache: dict[str, bool] = {}
+        for idx, job in enumerate(jobs):
+            if job.action not in (
+                "advance",
+                "set_score",
+                "set_questionnaire_score",
+            ):
+                LOG.debug("Unknown job %r requested!", job.action)
+                results[idx] = (400, "%r is an unknown job action" % job.action)
+                continue
+            team_name = job.args.get("team_name")
+            station_name = job.args.get("station_name")
+            # Scores are validated before anything is written, so an invalid
+            # score only rejects its own action.
+            score = None
+            if job.action != "advance":
+                try:
+                    score = validate_score(job.args.get("score"))
+                except ValueError:
+                    pass
+            if not self._may_access(
+                auth, permissions, station_name, access_cache
+            ):
+                results[idx] = (401, "Access denied to this station!")
+            elif station_name not in known_stations:
+                results[idx] = (404, "No such station: %r" % station_name)
+            elif team_name not in known_teams:
+                results[idx] = (404, "No such team: %r" % team_name)
+            elif job.action == "set_questionnaire_score" and (
+                len(questionnaires.get(station_name, [])) != 1
+            ):
+                LOG.error(
+                    "No questionnaire assigned to station %r!", station_name
+                )
+                results[idx] = (
+                    500,
+                    "No questionnaire assigned to station %r!" % station_name,
+                )
+            elif job.action != "advance" and score is None:
+                results[idx] = (
+                    400,
+                    "Invalid score: %r" % (job.args.get("score"),),
+                )
+            else:
+                accepted.append((idx, job, score))
+
+        events: dict[tuple[str, str, str], dict[str, Any]] = {}
+        audit_entries = []
+
+        advances = [
+            (idx, job.args["team_name"], job.args["station_name"])
+            for idx, job, _ in accepted
+            if job.action == "advance"
+        ]
+        new_states = core.Team.advance_many(
+            DB.session, [(team, station) for _, team, station in advances]
+        )
+        for (idx, team_name, station_name), new_state in zip(
+            advances, new_states
+        ):
+            results[idx] = (200, {"result": {"state": new_state.value}})
+            events[("state-change", team_name, station_name)] = {
+                "station": station_name,
+                "team": team_name,
+                "new_state": new_state.value,
+            }
+
+        station_scores = [
+            (
+                idx,
+                job.args["team_name"],
+                job.args["station_name"],
+                score,
+            )
+            for idx, job, score in accepted
+            if job.action == "set_score"
+        ]
+        current = core.Team.set_station_scores(
+            DB.session,
+            {
+                (team, station): score
+                for _, team, station, score in station_scores
+            },
+        )
+        for idx, team_name, station_name, score in station_scores:
+            old_score = current[(team_name, station_name)]
+            current[(team_name, station_name)] = score
+            if old_score != score:
+                audit_entries.append(
+                    (
+                        AuditType.STATION_SCORE,
+                        "Change score of team %r from %s to %s on station %s"
+                        % (team_name, old_score, score, station_name),
+                    )
+                )
+            results[idx] = (200, {"new_score": score})
+            events[("score-change", team_name, station_name)] = {
+                "station": station_name,
+                "team": team_name,
+                "new_score": score,
+            }
+
+        questionnaire_scores = [
+            (
+                idx,
+                job.args["team_name"],
+                job.args["station_name"],
+                questionnaires[job.args["station_name"]][0],
+                score,
+            )
+            for idx, job, score in accepted
+            if job.action == "set_questionnaire_score"
+        ]
+        current = core.set_questionnaire_scores(
+            DB.session,
+            {
+                (team, questionnaire): score
+                for _, team, _, questionnaire, score in questionnaire_scores
+            },
+        )
+        for (
+            idx,
+            team_name,
+            station_name,
+            questionnaire_name,
+            score,
+        ) in questionnaire_scores:
+            old_score = current[(team_name, questionnaire_name)]
+            current[(team_name, questionnaire_name)] = score
+            if old_score != score:
+                audit_entries.append(
+                    (
+                        AuditType.QUESTIONNAIRE_SCORE,
+                        "Change questionnaire score of team %r from %s to %s "
+                        "on station %s"
+                        % (team_name, old_score, score, station_name),
+                    )
+                )
+            results[idx] = (200, {"new_score": score})
+            events[("questionnaire-score-change", team_name, station_name)] = {
+                "stationName": station_name,
+                "teamName": team_name,
+                "score": score,
+            }
+
+        app = cast("MyFlask", current_app)
+        app.audit.add(DB.session, auth["username"], audit_entries)
+        if events:
+            app.pusher.send_team_event(
+                "batch",
+                {
+                    "events": [
+                        {"event": event, "payload": payload}
+                        for (event, _, _), payload in events.items()
+                    ]
+                },
+            )
+        return {
+            "results": [
+                {"status": status, "result": result}
+                for status, result in results  # type: ignore
+            ]
+        }, 200
+
+
 class Questionnaire(Resource):
     @staticmethod
     def _single_response(output, status_code=200):
@@ -1138,18 +1561,26 @@ class QuestionnaireList(Resource):
         else:
             questionnaires = core.Questionnaire.all(DB.session)
 
-        questionnaires = [
-            QuestionnaireSchema.model_dump(
-                QuestionnaireSchema.model_validate(team)
+        limit = request.args.get("limit", 0, type=int)
+        if limit < 0:
+            return "The limit must not be negative", 400
+        try:
+            field_names = requested_fields(QuestionnaireSchema)
+        except ValueError as exc:
+            return str(exc), 400
+        try:
+            questionnaires = core.Questionnaire.page(
+                questionnaires, limit, request.args.get("cursor", "")
             )
-            for team in questionnaires
-        ]
-        output = ListResponse(items=questionnaires)
-        parsed_output = output.model_dump_json()
-
-        output = make_response(parsed_output, 200)
-        output.content_type = "application/json"
-        return output
+        except ValueError:
+            return "Invalid cursor", 400
+        return list_response(
+            questionnaires,
+            DBQuestionnaire,
+            field_names,
+            limit,
+            core.name_cursor,
+        )
 
     @require_permissions("admin_questionnaires")
     def post(self):
@@ -1199,7 +1630,7 @@ class StationQuestionnaireList(Resource):
             output.append(
                 (station.name, station.name in questionnaire_stations)
             )
-        return jsonify(output)
+        return render(output)
 
     def _list_questionnaire_by_station(self, station_name):
         station = core.Station.get(DB.session, station_name)
@@ -1217,7 +1648,7 @@ class StationQuestionnaireList(Resource):
                     questionnaire.name in station_questionnaires,
                 )
             )
-        return jsonify(output)
+        return render(output)
 
     @require_permissions("manage_permissions")
     def get(self, station_name=None, questionnaire_name=None):
@@ -20,9 +20,10 @@ from werkzeug.exceptions import NotFound
 from .core import User, questionnaire_scores
 from .exc import AccessDenied, PowonlineException, UserInputError
 from .httputil import add_cors_headers
-from .model import DB, Route, Station
+from .model import DB, REPLICA, Route, Station
 from .social import Social
 from .util import allowed_file, get_user_identity
+from .versioning import has_pending_writes
 
 if TYPE_CHECKING:
     from powonline.web import MyFlask
@@ -63,7 +64,16 @@ def handle_app_error(error):
 @rootbp.after_app_request
 def after_app_request(response):
     try:
-        DB.session.commit()
+        # A read-only transaction is ended by removing the session at the
+        # end of the request.
+        if has_pending_writes(DB.session):
+            DB.session.commit()
+            app = cast("MyFlask", current_app)
+            app.change_log.maybe_prune(DB.engine)
+        if DB.session.info.pop(REPLICA, None) is not None:
+            # Later requests in the same app-context (f.ex. in tests) must
+            # not continue on the replica connection.
+            DB.session.close()
     except:
         LOG.exception("Unable to store data in the DB")
         response = make_response("Internal Server Error!", 500)
@@ -159,6 +169,8 @@ def login():
         "iat": now,
         "exp": now + jwt_lifetime,
     }
+    if app.localconfig.getboolean("security", "jwt_stations", fallback=False):
+        payload["stations"] = User.stations(DB.session, user.name)
     app = cast("MyFlask", current_app)
     jwt_secret = app.localconfig.get("security", "jwt_secret")
     result = {
@@ -220,5 +232,9 @@ def renew_token():
         "iat": now,
         "exp": now + jwt_lifetime,
     }
+    if app.localconfig.getboolean("security", "jwt_stations", fallback=False):
+        new_payload["stations"] = User.stations(
+            DB.session, token_info["username"]
+        )
     new_token = jwt.encode(new_payload, jwt_secret)
     return jsonify({"token": new_token})
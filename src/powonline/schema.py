@@ -1,7 +1,14 @@
 from datetime import datetime, timezone
-from typing import Any
+from typing import Annotated, Any
 
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, PlainSerializer
+
+#: A datetime which is written with :py:meth:`~datetime.datetime.isoformat`
+#: in JSON, keeping the UTC offset as "+00:00" (instead of "Z")
+IsoDatetime = Annotated[
+    datetime,
+    PlainSerializer(datetime.isoformat, return_type=str, when_used="json"),
+]
 
 
 class ListResponse[T](BaseModel):
@@ -31,6 +38,19 @@ class TeamSchema(BaseModel):
     route_name: str | None = None
 
 
+class AssignedTeamSchema(TeamSchema):
+    """
+    A team in the "assignments" document, which has always written
+    datetimes with :py:meth:`~datetime.datetime.isoformat`.
+    """
+
+    planned_start_time: IsoDatetime | None
+    effective_start_time: IsoDatetime | None
+    inserted: IsoDatetime | None = None
+    updated: IsoDatetime | None = None
+    finish_time: IsoDatetime | None = None
+
+
 class StationSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     name: str
@@ -41,6 +61,26 @@ class StationSchema(BaseModel):
     order: int = 500
 
 
+class AssignmentsSchema(BaseModel):
+    """
+    The teams and stations of each route
+    """
+
+    stations: dict[str, list[StationSchema]]
+    teams: dict[str, list[AssignedTeamSchema]]
+
+
+class DashboardRowSchema(BaseModel):
+    """
+    The state of one team on a station
+    """
+
+    team: str
+    state: str
+    score: int | None
+    updated: IsoDatetime | None
+
+
 class RouteSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     name: str
@@ -69,6 +109,11 @@ class JobSchema(BaseModel):
     args: dict[str, Any]
 
 
+class BatchJobSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    jobs: list[JobSchema]
+
+
 class UserSchemaLeaky(UserSchema):
     model_config = ConfigDict(from_attributes=True)
     password: str = ""
@@ -0,0 +1,314 @@
+"""
+Derived images (thumbnails) of uploaded files.
+
+Derivatives are rendered once and stored on disk next to the uploads. Their
+filenames contain the upload UUID, the requested size and the modification
+time of the original, so a replaced original never matches an outdated
+derivative.
+"""
+
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from configparser import ConfigParser
+from os import makedirs, replace, scandir, stat, unlink, utime
+from os.path import exists, join
+from tempfile import NamedTemporaryFile
+from typing import Callable, Iterable
+
+from PIL import ExifTags, Image
+
+from .core import Upload
+
+LOG = logging.getLogger(__name__)
+ORIENTATION_TAG = {v: k for k, v in ExifTags.TAGS.items()}["Orientation"]
+
+#: Maps file extensions to the Pillow format and the media-type
+FILE_MAPPINGS = {
+    "gif": ("gif", "image/gif"),
+    "jpg": ("jpeg", "image/jpeg"),
+    "jpeg": ("jpeg", "image/jpeg"),
+    "png": ("png", "image/png"),
+}
+
+#: Requested sizes from this value upwards are served in full size. This
+#: prevents users from enlarging files to inhumane sizes triggering a DoS.
+MAX_SIZE = 4000
+
+#: The sizes used by the frontend (see "upload_to_json"). These are rendered
+#: right after a file has been uploaded.
+STANDARD_SIZES = (256, 64)
+
+
+def file_type(filename: str) -> tuple[str, str]:
+    """
+    Return the Pillow format and media-type for a filename
+    """
+    _, extension = filename.rsplit(".", 1)
+    return FILE_MAPPINGS[extension.lower()]
+
+
+def normalise_size(size: int) -> int:
+    """
+    Map a requested size to the size which is rendered (0 for full size)
+    """
+    if size <= 0 or size >= MAX_SIZE:
+        return 0
+    return size
+
+
+#: Passed to "Image.thumbnail". Large images are first reduced (for JPEGs
+#: already while decoding, see "Image.draft") to at least this multiple of
+#: the target size before the final resampling step.
+REDUCING_GAP = 2.0
+
+#: Transpositions normalising the EXIF orientations we support
+TRANSPOSITIONS = {
+    3: Image.Transpose.ROTATE_180,
+    6: Image.Transpose.ROTATE_270,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def orientation(im: Image.Image) -> int | None:
+    """
+    Return the EXIF orientation of an image without decoding it
+    """
+    return im.getexif().get(ORIENTATION_TAG)
+
+
+def rotated(im: Image.Image, orientation: int | None) -> Image.Image:
+    """
+    Rotate an image according to an EXIF orientation
+    """
+    transposition = TRANSPOSITIONS.get(orientation)  # type: ignore
+    if transposition is None:
+        return im
+    return im.transpose(transposition)
+
+
+def reduce(im: Image.Image, size: int) -> None:
+    """
+    Downscale an image in-place to fit into a *size* x *size* box.
+
+    For a still unloaded JPEG this only decodes the image at the smallest
+    DCT scale which is still large enough.
+    """
+    im.thumbnail((size, size), reducing_gap=REDUCING_GAP)
+
+
+def render(source: str, size: int, fileobj) -> None:
+    """
+    Write a rotation-normalised derivative of *source* to *fileobj*
+
+    :param size: The bounding-box for the derivative. 0 keeps the original
+        dimensions.
+    """
+    pillow_type, _ = file_type(source)
+    with Image.open(source) as im:
+        # Rotating is done last so it operates on the reduced image
+        exif_orientation = orientation(im)
+        if size:
+            reduce(im, size)
+        rotated(im, exif_orientation).save(fileobj, format=pillow_type)
+
+
+class ThumbnailCache:
+    """
+    A size-bounded on-disk cache of image derivatives.
+
+    When the cache grows beyond its limit, the least recently used
+    derivatives are removed. Recency is tracked with the modification-time
+    of the cached files.
+
+    Derivatives of new uploads can be rendered ahead of time in a pool of
+    *workers* background threads (see :py:meth:`submit`).
+    """
+
+    def __init__(self, folder: str, max_bytes: int, workers: int = 2):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create(config: ConfigParser) -> "ThumbnailCache":
+        upload_folder = config.get(
+            "app", "upload_folder", fallback=Upload.FALLBACK_FOLDER
+        )
+        max_megabytes = config.getint(
+            "app", "thumbnail_cache_size", fallback=512
+        )
+        workers = config.getint("app", "thumbnail_workers", fallback=2)
+        return ThumbnailCache(
+            join(upload_folder, "__thumbnails__"),
+            max_megabytes * 1024 * 1024,
+            workers,
+        )
+
+    def path_for(self, uuid: str, source: str, size: int) -> str:
+        """
+        Return the filename of a derivative (which may not yet exist)
+
+        :raises FileNotFoundError: If *source* does not exist
+        """
+        mtime = stat(source).st_mtime_ns
+        _, extension = source.rsplit(".", 1)
+        return join(self.folder, f"{uuid}_{size}_{mtime}.{extension.lower()}")
+
+    def _store(self, path: str, writer: Callable) -> None:
+        """
+        Atomically create *path* with the data written by *writer*
+        """
+        makedirs(self.folder, exist_ok=True)
+        with NamedTemporaryFile(
+            dir=self.folder, prefix=".tmp", delete=False
+        ) as tmp:
+            try:
+                writer(tmp)
+            except Exception:
+                unlink(tmp.name)
+                raise
+        replace(tmp.name, path)
+
+    def get(self, uuid: str, source: str, size: int) -> str:
+        """
+        Return the filename of a derivative of *source*, rendering it if
+        needed.
+
+        :raises FileNotFoundError: If *source* does not exist
+        """
+        size = normalise_size(size)
+        path = self.path_for(uuid, source, size)
+        try:
+            utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        LOG.debug("Rendering derivative %r", path)
+        self._store(path, lambda fileobj: render(source, size, fileobj))
+        self.evict()
+        return path
+
+    def pregenerate(
+        self,
+        uuid: str,
+        source: str,
+        sizes: Iterable[int] = STANDARD_SIZES,
+        evict: bool = True,
+    ) -> list[str]:
+        """
+        Render all missing derivatives of *source* in *sizes*, decoding the
+        original only once. Returns the filenames of the new derivatives.
+
+        :param evict: Whether to enforce the size-limit afterwards. Bulk
+            operations can disable this and call :py:meth:`evict` once at
+            the end.
+        :raises FileNotFoundError: If *source* does not exist
+        """
+        missing = {}
+        for size in map(normalise_size, sizes):
+            path = self.path_for(uuid, source, size)
+            if not exists(path):
+                missing[size] = path
+        if not missing:
+            return []
+
+        pillow_type, _ = file_type(source)
+        with Image.open(source) as im:
+            exif_orientation = orientation(im)
+            # Going from large to small allows each step to reduce the
+            # previous (already smaller) image. The first step also decides
+            # the scale at which the original is decoded.
+            order = sorted(
+                missing, key=lambda size: size or MAX_SIZE, reverse=True
+            )
+            for size in order:
+                if size:
+                    reduce(im, size)
+                output = rotated(im, exif_orientation)
+                LOG.debug("Rendering derivative %r", missing[size])
+                self._store(
+                    missing[size],
+                    lambda fileobj: output.save(fileobj, format=pillow_type),
+                )
+        if evict:
+            self.evict()
+        return list(missing.values())
+
+    def submit(self, uuid: str, source: str) -> Future | None:
+        """
+        Render the standard derivatives of *source* in the background.
+
+        Returns ``None`` if background rendering is disabled (no workers).
+        """
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix="thumbnails"
+                )
+        future = self._executor.submit(self.pregenerate, uuid, source)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future: Future) -> None:
+        exc = future.exception()
+        if exc is not None:
+            LOG.error("Unable to render thumbnails", exc_info=exc)
+
+    def discard(self, uuid: str) -> None:
+        """
+        Remove all derivatives of an upload
+        """
+        try:
+            entries = list(scandir(self.folder))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if entry.name.startswith(f"{uuid}_"):
+                try:
+                    unlink(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used derivatives until the cache fits into
+        its size-limit.
+        """
+        files = []
+        total = 0
+        for entry in scandir(self.folder):
+            if entry.name.startswith("."):
+                # Files which are currently being written
+                continue
+            try:
+                info = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((info.st_mtime, info.st_size, entry.path))
+            total += info.st_size
+        files.sort()
+        while files and total > self.max_bytes:
+            _, size, path = files.pop(0)
+            LOG.debug("Evicting derivative %r", path)
+            try:
+                unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def backfill(folder: str, uuid: str, source: str) -> list[str]:
+    """
+    Render the standard derivatives of an upload into *folder*.
+
+    This is a module-level function so it can be used in a process-pool.
+    Eviction is left to the caller.
+    """
+    return ThumbnailCache(folder, 0, 0).pregenerate(uuid, source, evict=False)
@@ -1,10 +1,15 @@
 import logging
 import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
 from os.path import splitext
-from typing import TYPE_CHECKING, cast
+from time import time
+from typing import TYPE_CHECKING, Any, cast
 
 import jwt
-from flask import current_app
+from flask import current_app, g
 
 from .exc import AccessDenied
 
@@ -24,6 +29,7 @@ PERMISSION_MAP = {
         "manage_permissions",
         "manage_station",
         "view_audit_log",
+        "view_metrics",
         "view_team_contact",
     },
     "staff": {
@@ -100,6 +106,68 @@ def colorize_werkzeug():  # pragma: no cover
     logging.getLogger("werkzeug").addFilter(WerkzeugColorFilter())
 
 
+class TokenCache:
+    """
+    A bounded LRU cache of verified JWT payloads.
+
+    Entries are keyed by a digest of the secret and the token, so neither is
+    kept in memory in plain text, and changing the secret invalidates all
+    entries. An entry expires after *ttl* seconds or when the token itself
+    expires ("exp" claim), whichever comes first.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[bytes, tuple[float, dict[str, Any]]]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(secret: str, token: str) -> bytes:
+        return sha256(f"{secret}\0{token}".encode("utf8")).digest()
+
+    def get(self, key: bytes) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, payload = entry
+            if expires <= time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: bytes, payload: dict[str, Any]) -> None:
+        expires = time() + self.ttl
+        if isinstance(payload.get("exp"), (int, float)):
+            expires = min(expires, payload["exp"])
+        with self._lock:
+            self._entries[key] = (expires, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+TOKEN_CACHE = TokenCache(1024, 300)
+
+
+@lru_cache(maxsize=128)
+def permissions_for(roles: frozenset[str]) -> frozenset[str]:
+    """
+    Expand user roles to permissions, collecting them all in one big set.
+    """
+    all_permissions: set[str] = set()
+    for role in roles:
+        all_permissions |= PERMISSION_MAP.get(role, set())
+    return frozenset(all_permissions)
+
+
 def get_user_identity(request):
     auth_header = request.headers.get("Authorization")
     if not auth_header:
@@ -111,27 +179,35 @@ def get_user_identity(request):
     if method != "bearer" or not token:
         LOG.debug("Authorization header does not provide " "a bearer token!")
         raise AccessDenied("Access Denied (not a bearer token)!")
-    try:
-        app = cast("MyFlask", current_app)
-        jwt_secret = app.localconfig.get("security", "jwt_secret")
-        auth_payload = jwt.decode(token, jwt_secret, algorithms=["HS256"])
-    except (jwt.exceptions.InvalidTokenError, jwt.exceptions.DecodeError):
-        LOG.info("Bearer token seems to have been tampered with!")
-        raise AccessDenied("Access Denied (invalid token)!")
 
+    # The same token is often checked more than once per request
+    memo = g.get("auth_memo")
+    if memo and memo[0] == token:
+        return memo[1]
+
+    app = cast("MyFlask", current_app)
+    jwt_secret = app.localconfig.get("security", "jwt_secret")
+    cache_key = TokenCache.key(jwt_secret, token)
+    auth_payload = TOKEN_CACHE.get(cache_key)
+    if auth_payload is None:
+        try:
+            auth_payload = jwt.decode(token, jwt_secret, algorithms=["HS256"])
+        except (jwt.exceptions.InvalidTokenError, jwt.exceptions.DecodeError):
+            LOG.info("Bearer token seems to have been tampered with!")
+            raise AccessDenied("Access Denied (invalid token)!")
+        TOKEN_CACHE.set(cache_key, auth_payload)
+
+    # Callers get their own copy so the cached payload stays pristine
+    auth_payload = dict(auth_payload)
+    g.auth_memo = (token, auth_payload)
     return auth_payload
 
 
 def get_user_permissions(request):
     auth_payload = get_user_identity(request)
-    # Expand the user roles to permissions, collecting them all in one
-    # big set.
-    user_roles = set(auth_payload.get("roles", []))
+    user_roles = frozenset(auth_payload.get("roles", []))
     LOG.debug("Bearer token with the following roles: %r", user_roles)
-    all_permissions = set()
-    for role in user_roles:
-        all_permissions |= PERMISSION_MAP.get(role, set())
-
+    all_permissions = permissions_for(user_roles)
     LOG.debug(
         "Bearer token grants the following permissions: %r", all_permissions
     )
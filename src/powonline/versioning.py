@@ -0,0 +1,148 @@
+"""
+Data-versions for cheap change-detection.
+
+Every transaction which writes to a table increments the counter of that
+table in the ``entity_version`` table before it is committed. Readers can
+compare these counters to decide whether data derived from those tables is
+still current, without re-running the queries producing that data.
+"""
+
+import logging
+from datetime import datetime
+from hashlib import sha1
+from itertools import chain
+from typing import Iterable
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from . import model
+
+LOG = logging.getLogger(__name__)
+
+#: The key in "session.info" collecting the names of modified tables
+CHANGED_TABLES = "powonline.changed_tables"
+
+
+def _changed_tables(session: Session) -> set[str]:
+    return session.info.setdefault(CHANGED_TABLES, set())
+
+
+def _track(session: Session, table_name: str | None) -> None:
+    if table_name and table_name != model.EntityVersion.__tablename__:
+        _changed_tables(session).add(table_name)
+
+
+def mark_changed(session: Session, *table_names: str) -> None:
+    """
+    Record writes which the session-events cannot detect, like those made
+    by data-modifying CTEs inside a SELECT statement.
+    """
+    for table_name in table_names:
+        _track(session, table_name)
+
+
+def has_pending_writes(session: Session) -> bool:
+    """
+    Whether the session holds changes (flushed or not) which need to be
+    committed.
+
+    This relies on the session-events (see :py:func:`install`) and on
+    :py:func:`mark_changed` for writes which these cannot detect.
+    """
+    return bool(
+        session.new
+        or session.dirty
+        or session.deleted
+        or session.info.get(CHANGED_TABLES)
+    )
+
+
+def _after_flush(session, flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        _track(session, getattr(instance, "__tablename__", None))
+
+
+def _do_orm_execute(orm_execute_state):
+    """
+    Track bulk statements (f.ex. "query.delete()" or upserts) which bypass
+    the unit-of-work.
+    """
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    _track(orm_execute_state.session, getattr(table, "name", None))
+
+
+def _before_commit(session):
+    session.flush()
+    changed = session.info.pop(CHANGED_TABLES, set())
+    if not changed:
+        return
+    LOG.debug("Bumping data-versions of %r", changed)
+    # Sorted to always lock the rows in the same order
+    query = insert(model.EntityVersion).values(
+        [{"name": name, "version": 1} for name in sorted(changed)]
+    )
+    query = query.on_conflict_do_update(
+        index_elements=[model.EntityVersion.name],
+        set_={
+            "version": model.EntityVersion.version + 1,
+            "updated": func.now(),
+        },
+    )
+    session.execute(query)
+
+
+def _after_rollback(session):
+    session.info.pop(CHANGED_TABLES, None)
+
+
+LISTENERS = [
+    ("after_flush", _after_flush),
+    ("do_orm_execute", _do_orm_execute),
+    ("before_commit", _before_commit),
+    ("after_rollback", _after_rollback),
+]
+
+
+def install(session_class=Session) -> None:
+    """
+    Register the session-events which keep the data-versions up-to-date.
+
+    Calling this more than once is harmless.
+    """
+    for name, listener in LISTENERS:
+        if not event.contains(session_class, name, listener):
+            event.listen(session_class, name, listener)
+
+
+def current_versions(
+    session, tables: Iterable[str]
+) -> dict[str, tuple[int, datetime]]:
+    """
+    Return the current version and modification time of each table.
+
+    Tables which have never been written to are missing from the result.
+    """
+    query = session.query(
+        model.EntityVersion.name,
+        model.EntityVersion.version,
+        model.EntityVersion.updated,
+    ).filter(model.EntityVersion.name.in_(list(tables)))
+    return {row.name: (row.version, row.updated) for row in query}
+
+
+def make_etag(scope: str, versions: dict[str, tuple[int, datetime]]) -> str:
+    """
+    Derive an entity-tag from a scope (f.ex. a URL) and table-versions.
+    """
+    digest = sha1(scope.encode("utf8"))
+    for name, (version, _) in sorted(versions.items()):
+        digest.update(f"\0{name}={version}".encode("utf8"))
+    return digest.hexdigest()
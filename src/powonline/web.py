@@ -8,15 +8,22 @@ from flask_restful import Api
 from powonline import custom_routes
 from powonline.exc import ValidationError  # type: ignore
 
+from . import audit, versioning
+from .audit import AuditSink
+from .cache import ResponseCache
 from .config import default
+from .core import ChangeLogPruner
 from .model import DB, get_dsn
+from .pool import ReplicaSet, engine_options
 from .pusher import PusherWrapper
 from .resources import (
     Assignments,
     AuditLog,
+    BatchJob,
     Dashboard,
     GlobalDashboard,
     Job,
+    Metrics,
     Questionnaire,
     QuestionnaireList,
     Route,
@@ -44,6 +51,7 @@ from .resources import (
     UserRoleList,
 )
 from .rootbp import rootbp
+from .thumbnails import ThumbnailCache
 
 LOG = logging.getLogger(__name__)
 
@@ -64,8 +72,13 @@ class CustomApi(Api):
 
 
 class MyFlask(Flask):
+    audit: AuditSink
+    change_log: ChangeLogPruner
     localconfig: ConfigParser
     pusher: PusherWrapper
+    replicas: ReplicaSet
+    response_cache: ResponseCache
+    thumbnails: ThumbnailCache
 
 
 def make_app(config=None):
@@ -88,6 +101,11 @@ def make_app(config=None):
         config.get("pusher", "key", fallback=""),
         config.get("pusher", "secret", fallback=""),
     )
+    app.response_cache = ResponseCache.create(config)
+    app.thumbnails = ThumbnailCache.create(config)
+    app.replicas = ReplicaSet.create(config)
+    app.audit = AuditSink.create(config)
+    app.change_log = ChangeLogPruner.create(config)
 
     api.add_resource(Assignments, "/assignments")
     api.add_resource(TeamList, "/team")
@@ -144,15 +162,20 @@ def make_app(config=None):
     )
     api.add_resource(GlobalDashboard, "/dashboard")
     api.add_resource(Job, "/job")
+    api.add_resource(BatchJob, "/job/batch")
     api.add_resource(RouteColor, "/route/<route_name>/color")
     api.add_resource(UploadList, "/upload")
     api.add_resource(Upload, "/upload/<uuid>", endpoint="api.get_file")
     api.add_resource(AuditLog, "/auditlog")
+    api.add_resource(Metrics, "/metrics")
     api.add_resource(QuestionnaireList, "/questionnaire")
     api.add_resource(Questionnaire, "/questionnaire/<name>")
 
     app.config["SQLALCHEMY_DATABASE_URI"] = get_dsn()
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(config)
     DB.init_app(app)
+    versioning.install()
+    audit.install()
 
     return app
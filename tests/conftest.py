@@ -5,9 +5,9 @@ from textwrap import dedent
 import alembic.config
 from config_resolver import get_config
 from pytest import fixture
-from sqlalchemy import text
+from sqlalchemy import event, text
 
-from powonline import model
+from powonline import core, model
 from powonline.web import make_app
 
 
@@ -66,6 +66,29 @@ def dbsession():
         model.DB.session.remove()
 
 
+class QueryCounter:
+    """
+    Counts the SQL statements sent to the database
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+@fixture
+def query_counter(dbsession):
+    counter = QueryCounter()
+    engine = model.DB.engine
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
 @fixture
 def seed(dbsession):
     with open(here("seed_cleanup.sql")) as seed:
@@ -78,3 +101,5 @@ def seed(dbsession):
     with open(here("seed.sql")) as seed:
         model.DB.session.execute(text(seed.read()))
         model.DB.session.commit()
+    # The seed bypasses the helpers which keep the access-index up-to-date
+    core.STATION_ACCESS.clear()
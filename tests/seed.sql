@@ -45,3 +45,7 @@ INSERT INTO questionnaire_score (questionnaire, team, score) VALUES
     ('questionnaire_2', 'team-red', 20),
     ('questionnaire_1', 'team-blue', 30)
 ;
+INSERT INTO team_score (team_name, station_score, questionnaire_score) VALUES
+    ('team-red', 10, 30),
+    ('team-blue', 20, 30)
+;
@@ -2,6 +2,8 @@ TRUNCATE
     "user",
     "uploads",
     auditlog,
+    auditlog_outbox,
+    change_log,
     role,
     oauth_connection,
     message,
@@ -10,8 +12,10 @@ TRUNCATE
     station,
     team,
     team_station_state,
+    team_score,
     user_role,
     user_station,
     questionnaire,
     questionnaire_score
 ;
+UPDATE change_log_horizon SET txid = 0;
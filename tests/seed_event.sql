@@ -0,0 +1,41 @@
+-- An event-sized data-set on top of "seed.sql" for the query-plan tests
+INSERT INTO "user" (name, password)
+    SELECT 'event-user-' || i, 'password' FROM generate_series(1, 100) i;
+INSERT INTO route (name)
+    SELECT 'event-route-' || i FROM generate_series(1, 8) i;
+INSERT INTO station (name, "order")
+    SELECT 'event-station-' || i, i FROM generate_series(1, 40) i;
+INSERT INTO team (confirmation_key, name, email, route_name)
+    SELECT
+        'event-' || i,
+        'event-team-' || i,
+        'event-team-' || i || '@example.com',
+        'event-route-' || (i % 8 + 1)
+    FROM generate_series(1, 400) i;
+INSERT INTO route_station (route_name, station_name)
+    SELECT 'event-route-' || r, 'event-station-' || s
+    FROM generate_series(1, 8) r, generate_series(1, 40) s
+    WHERE s % 8 + 1 = r OR s % 4 = 0;
+INSERT INTO user_station (user_name, station_name)
+    SELECT 'event-user-' || i, 'event-station-' || (i % 40 + 1)
+    FROM generate_series(1, 100) i;
+INSERT INTO team_station_state (team_name, station_name, state, score)
+    SELECT 'event-team-' || t, 'event-station-' || s, 'finished', t % 50
+    FROM generate_series(1, 400) t, generate_series(1, 40) s;
+INSERT INTO questionnaire (name, station_name)
+    SELECT 'event-questionnaire-' || i, 'event-station-' || (i % 40 + 1)
+    FROM generate_series(1, 80) i;
+INSERT INTO questionnaire_score (questionnaire, team, score)
+    SELECT 'event-questionnaire-' || q, 'event-team-' || t, t % 20
+    FROM generate_series(1, 80) q, generate_series(1, 400) t;
+INSERT INTO uploads (filename, username)
+    SELECT 'event-user-' || u || '/photo-' || i || '.jpg', 'event-user-' || u
+    FROM generate_series(1, 100) u, generate_series(1, 40) i;
+INSERT INTO auditlog (timestamp, "user", type, message)
+    SELECT
+        now() - i * interval '1 second',
+        'event-user-' || (i % 100 + 1),
+        'admin',
+        'Event ' || i
+    FROM generate_series(1, 20000) i;
+ANALYZE;
@@ -0,0 +1,144 @@
+import time
+from configparser import ConfigParser
+
+import pytest
+from pytest import fixture
+from sqlalchemy import text
+
+from powonline import audit
+from powonline.model import AuditType
+
+ENTRIES = [
+    (AuditType.ADMIN, "first"),
+    (AuditType.STATION_SCORE, "second"),
+]
+
+
+@fixture(autouse=True)
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+@fixture
+def outbox():
+    """
+    Create outbox-sinks which are closed (joining their threads) afterwards
+    """
+    sinks = []
+
+    def create(**kwargs):
+        kwargs.setdefault("background", False)
+        sink = audit.OutboxSink(**kwargs)
+        sinks.append(sink)
+        return sink
+
+    yield create
+    for sink in sinks:
+        sink.close()
+
+
+def messages(session, table):
+    query = text(f'SELECT "user", message FROM {table} ORDER BY message')
+    return [tuple(row) for row in session.execute(query)]
+
+
+def test_create():
+    config = ConfigParser()
+    assert isinstance(audit.AuditSink.create(config), audit.SyncSink)
+    config.read_dict({"audit": {"sink": "outbox", "batch_size": "10"}})
+    sink = audit.AuditSink.create(config)
+    assert isinstance(sink, audit.OutboxSink)
+    assert sink.batch_size == 10
+
+
+@pytest.mark.usefixtures("seed")
+def test_sync(dbsession):
+    audit.SyncSink().add(dbsession, "john", ENTRIES)
+    assert messages(dbsession, "auditlog") == [
+        ("john", "first"),
+        ("john", "second"),
+    ]
+    dbsession.rollback()
+
+
+@pytest.mark.usefixtures("seed")
+def test_outbox(dbsession, outbox):
+    sink = outbox()
+    sink.add(dbsession, "john", ENTRIES)
+    assert messages(dbsession, "auditlog_outbox") == []
+    dbsession.commit()
+    assert messages(dbsession, "auditlog_outbox") == [
+        ("john", "first"),
+        ("john", "second"),
+    ]
+    dbsession.commit()
+
+    sink.flush()
+    assert messages(dbsession, "auditlog_outbox") == []
+    assert messages(dbsession, "auditlog") == [
+        ("john", "first"),
+        ("john", "second"),
+    ]
+    assert sink.stats() == {"moved": 2, "failed": 0}
+
+
+@pytest.mark.usefixtures("seed")
+def test_outbox_rollback(dbsession, outbox):
+    sink = outbox()
+    sink.add(dbsession, "john", ENTRIES)
+    dbsession.rollback()
+    dbsession.commit()
+    assert messages(dbsession, "auditlog_outbox") == []
+
+
+@pytest.mark.usefixtures("seed")
+def test_outbox_batches(dbsession, outbox):
+    sink = outbox(batch_size=2)
+    sink.add(dbsession, "john", ENTRIES[:1])
+    assert messages(dbsession, "auditlog_outbox") == []
+    # Reaching the batch-size writes the pending entries right away
+    sink.add(dbsession, "john", ENTRIES[1:] + [(AuditType.ADMIN, "third")])
+    assert len(messages(dbsession, "auditlog_outbox")) == 3
+    dbsession.rollback()
+
+
+@pytest.mark.usefixtures("seed")
+def test_drain(dbsession, outbox):
+    sink = outbox()
+    sink.add(dbsession, "john", ENTRIES + [(AuditType.ADMIN, "third")])
+    dbsession.commit()
+    with dbsession.get_bind().begin() as connection:
+        assert audit.drain(connection, 2) == 2
+        assert audit.drain(connection, 2) == 1
+    assert [message for _, message in messages(dbsession, "auditlog")] == [
+        "first",
+        "second",
+        "third",
+    ]
+
+
+@pytest.mark.usefixtures("seed")
+def test_drain_deleted_user(dbsession, outbox):
+    sink = outbox()
+    sink.add(dbsession, "unknown-user", ENTRIES[:1])
+    dbsession.commit()
+    sink.flush()
+    assert messages(dbsession, "auditlog") == [(None, "first")]
+
+
+@pytest.mark.usefixtures("seed")
+def test_background_flush(dbsession, outbox):
+    sink = outbox(flush_interval=0.05, background=True)
+    sink.add(dbsession, "john", ENTRIES)
+    dbsession.commit()
+    for _ in range(100):
+        if sink.moved == 2:
+            break
+        time.sleep(0.05)
+    assert messages(dbsession, "auditlog") == [
+        ("john", "first"),
+        ("john", "second"),
+    ]
+    sink.close()
+    assert not sink._thread.is_alive()
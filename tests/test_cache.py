@@ -0,0 +1,57 @@
+import pytest
+
+from powonline import cache
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def factory(ttl=60, max_entries=10):
+        if request.param == "memory":
+            return cache.MemoryCache(ttl, max_entries)
+        return cache.SqliteCache(
+            str(tmp_path / "cache.sqlite"), ttl, max_entries
+        )
+
+    return factory
+
+
+def test_roundtrip(make_cache):
+    instance = make_cache()
+    instance.set("key", "application/json", b"[]")
+    assert instance.get("key") == ("application/json", b"[]")
+
+
+def test_metrics(make_cache):
+    instance = make_cache()
+    assert instance.lookup("key") is None
+    instance.set("key", "application/json", b"[]")
+    assert instance.lookup("key") == ("application/json", b"[]")
+    stats = instance.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_lru_eviction(make_cache):
+    instance = make_cache(max_entries=2)
+    instance.set("a", "text/plain", b"a")
+    instance.set("b", "text/plain", b"b")
+    instance.get("a")
+    instance.set("c", "text/plain", b"c")
+    assert instance.get("a") is not None
+    assert instance.get("b") is None
+    assert instance.get("c") is not None
+
+
+def test_expiry(make_cache):
+    instance = make_cache(ttl=-1)
+    instance.set("key", "text/plain", b"data")
+    assert instance.get("key") is None
+
+
+def test_shared_sqlite_file(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    writer = cache.SqliteCache(path, 60, 10)
+    reader = cache.SqliteCache(path, 60, 10)
+    writer.set("key", "text/plain", b"data")
+    assert reader.get("key") == ("text/plain", b"data")
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from click.testing import CliRunner
+from PIL import Image
+from pytest import fixture
+from sqlalchemy import text
+
+from powonline import cli
+from powonline.thumbnails import ThumbnailCache
+
+
+@fixture(autouse=True)
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+@fixture
+def runner(app, tmp_path):
+    app.localconfig.read_dict({"app": {"upload_folder": str(tmp_path)}})
+    app.thumbnails = ThumbnailCache.create(app.localconfig)
+    with patch.object(cli, "make_app", return_value=app):
+        yield CliRunner()
+
+
+def generate_thumbnails(runner, filenames):
+    uploads = [
+        SimpleNamespace(uuid="upload-%d" % idx, filename=filename)
+        for idx, filename in enumerate(filenames)
+    ]
+    with patch.object(cli.Upload, "all", return_value=uploads):
+        return runner.invoke(cli.generate_thumbnails, ["--jobs", "1"])
+
+
+def test_generate_thumbnails(runner, tmp_path):
+    Image.new("RGB", (80, 60), "red").save(tmp_path / "image.jpg")
+    result = generate_thumbnails(runner, ["image.jpg"])
+    assert result.exit_code == 0, result.output
+
+
+def test_generate_thumbnails_failure(runner, tmp_path):
+    Image.new("RGB", (80, 60), "red").save(tmp_path / "image.jpg")
+    result = generate_thumbnails(runner, ["image.jpg", "missing.jpg"])
+    assert result.exit_code == 1, result.output
+
+
+@pytest.mark.usefixtures("seed")
+def test_check_scoreboard(runner, dbsession):
+    result = runner.invoke(cli.check_scoreboard)
+    assert result.exit_code == 0, result.output
+
+    dbsession.execute(
+        text("UPDATE team_score SET station_score = station_score + 1")
+    )
+    dbsession.commit()
+    result = runner.invoke(cli.check_scoreboard)
+    assert result.exit_code == 1, result.output
+    result = runner.invoke(cli.check_scoreboard, ["--repair"])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(cli.check_scoreboard)
+    assert result.exit_code == 0, result.output
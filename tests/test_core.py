@@ -1,9 +1,14 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest.mock import MagicMock
 
 import pytest
 from pytest import fixture
+from sqlalchemy import func, select, text, update
 
-from powonline import core
+from powonline import core, model
+from powonline.model import TeamState
 
 LOG = logging.getLogger(__name__)
 
@@ -44,6 +49,49 @@ def test_scoreboard(dbsession):
     assert result == expected
 
 
+@pytest.mark.usefixtures("seed")
+def test_ranked_scoreboard_ties(dbsession):
+    core.Team.set_station_score(dbsession, "team-red", "station-red", 10)
+    core.Team.set_station_score(
+        dbsession, "team-without-route", "station-red", 3
+    )
+    dbsession.flush()
+    result = list(core.ranked_scoreboard(dbsession))
+    expected = [
+        (1, "team-blue", 50),
+        (1, "team-red", 50),
+        (3, "team-without-route", 3),
+    ]
+    assert result == expected
+
+
+@pytest.mark.usefixtures("seed")
+def test_materialized_scoreboard(dbsession):
+    core.Team.set_station_score(dbsession, "team-red", "station-red", 15)
+    core.set_questionnaire_score(dbsession, "team-blue", "station-blue", 10)
+    result = list(core.Scoreboard.ranked(dbsession))
+    expected = [
+        (1, "team-red", 55),
+        (2, "team-blue", 30),
+        (3, "team-without-route", 0),
+    ]
+    assert result == expected
+    assert core.Scoreboard.drift(dbsession) == []
+
+
+@pytest.mark.usefixtures("seed")
+def test_materialized_scoreboard_drift(dbsession):
+    dbsession.execute(
+        text(
+            "UPDATE team_station_state SET score = 25 "
+            "WHERE team_name = 'team-blue' AND station_name = 'station-blue'"
+        )
+    )
+    assert core.Scoreboard.drift(dbsession) == [("team-blue", 55, 50)]
+    core.Scoreboard.rebuild(dbsession)
+    assert core.Scoreboard.drift(dbsession) == []
+
+
 @pytest.mark.usefixtures("seed")
 def test_questionnaire_scores(dbsession):
     result = core.questionnaire_scores(dbsession)
@@ -155,3 +203,292 @@ def test_global_dashboard(dbsession):
         },
     ]
     assert result == expected
+
+
+@pytest.mark.usefixtures("seed")
+def test_global_dashboard_query_count(dbsession, query_counter):
+    """
+    The number of queries for the global dashboard must not grow with the
+    number of teams or stations.
+    """
+    core.global_dashboard(dbsession)
+    baseline = query_counter.count
+
+    for idx in range(20):
+        dbsession.add(
+            model.Team(
+                name=f"extra-team-{idx}",
+                email="extra@example.com",
+                confirmation_key=f"extra-{idx}",
+                route_name="route-red",
+            )
+        )
+    for idx in range(5):
+        dbsession.add(model.Station(name=f"extra-station-{idx}"))
+    dbsession.flush()
+
+    query_counter.count = 0
+    result = core.global_dashboard(dbsession)
+    assert query_counter.count == baseline
+    assert len(result) == 23
+    assert all(len(row["stations"]) == 9 for row in result)
+
+
+@pytest.mark.usefixtures("seed")
+def test_concurrent_writes(app, dbsession):
+    """
+    Parallel writers on the same team-state must neither lose transitions
+    nor let the materialized scoreboard drift.
+    """
+    workers = 8
+    rounds = 10
+
+    def write(worker):
+        with app.app_context():
+            session = model.DB.session
+            try:
+                for idx in range(rounds):
+                    core.Team.advance_on_station(
+                        session, "team-blue", "station-red"
+                    )
+                    core.Team.set_station_score(
+                        session, "team-blue", "station-red", worker + idx
+                    )
+                    core.set_questionnaire_score(
+                        session, "team-blue", "station-red", worker * idx
+                    )
+                    session.commit()
+            finally:
+                session.remove()
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(write, range(workers)))
+
+    dbsession.expire_all()
+    state = core.Team.get_station_data(dbsession, "team-blue", "station-red")
+    # The first transition creates the state as "arrived", then it cycles
+    # through "finished", "unknown" and "arrived"
+    cycle = [
+        core.TeamState.ARRIVED,
+        core.TeamState.FINISHED,
+        core.TeamState.UNKNOWN,
+    ]
+    assert state.state == cycle[(workers * rounds - 1) % 3]
+    assert core.Scoreboard.drift(dbsession) == []
+
+
+@pytest.mark.usefixtures("seed")
+def test_concurrent_batch_writes(app, dbsession):
+    """
+    The batch-helpers must be as safe for parallel writers as the single
+    ones, including the first insert of a team-state.
+    """
+    workers = 8
+    rounds = 5
+
+    def write(worker):
+        with app.app_context():
+            session = model.DB.session
+            try:
+                for idx in range(rounds):
+                    states = core.Team.advance_many(
+                        session,
+                        [
+                            ("team-blue", "station-red"),
+                            ("team-red", "station-blue"),
+                            ("team-blue", "station-red"),
+                        ],
+                    )
+                    assert len(states) == 3
+                    core.Team.set_station_scores(
+                        session,
+                        {
+                            ("team-blue", "station-red"): worker + idx,
+                            ("team-red", "station-blue"): worker,
+                        },
+                    )
+                    core.set_questionnaire_scores(
+                        session,
+                        {("team-blue", "questionnaire_2"): worker * idx},
+                    )
+                    session.commit()
+            finally:
+                session.remove()
+
+    with ThreadPoolExecutor(workers) as pool:
+        list(pool.map(write, range(workers)))
+
+    dbsession.expire_all()
+    state = core.Team.get_station_data(dbsession, "team-blue", "station-red")
+    # Created as "arrived" and advanced twice per round
+    cycle = [
+        core.TeamState.ARRIVED,
+        core.TeamState.FINISHED,
+        core.TeamState.UNKNOWN,
+    ]
+    assert state.state == cycle[(2 * workers * rounds - 1) % 3]
+    assert core.Scoreboard.drift(dbsession) == []
+
+
+@pytest.mark.usefixtures("seed")
+def test_dashboard_changes(dbsession):
+    version = core.ChangeLog.version(dbsession)
+    core.Team.set_station_score(dbsession, "team-red", "station-red", 15)
+    core.set_questionnaire_score(dbsession, "team-blue", "station-blue", 35)
+    dbsession.commit()
+
+    result = core.ChangeLog.dashboard_changes(dbsession, version)
+    assert result["stations"] == [
+        {
+            "team": "team-red",
+            "name": "station-red",
+            "score": 15,
+            "state": TeamState.UNKNOWN,
+        }
+    ]
+    assert result["questionnaires"] == [
+        {"team": "team-blue", "name": "questionnaire_1", "score": 35}
+    ]
+    assert result["version"] > version
+
+    dbsession.commit()
+    result = core.ChangeLog.dashboard_changes(dbsession, result["version"])
+    assert result["stations"] == []
+    assert result["questionnaires"] == []
+
+
+@pytest.mark.usefixtures("seed")
+def test_change_log_prune(dbsession):
+    core.Team.set_station_score(dbsession, "team-red", "station-red", 15)
+    dbsession.commit()
+    old_version = core.ChangeLog.version(dbsession)
+    dbsession.execute(
+        text("UPDATE change_log SET inserted = now() - interval '2 hours'")
+    )
+    dbsession.commit()
+    core.Team.set_station_score(dbsession, "team-blue", "station-red", 5)
+    dbsession.commit()
+    assert core.ChangeLog.horizon(dbsession) == 0
+
+    with dbsession.get_bind().begin() as connection:
+        # Including the changes of the seed
+        assert core.ChangeLog.prune(connection, timedelta(hours=1)) > 1
+        assert core.ChangeLog.prune(connection, timedelta(hours=1)) == 0
+    horizon = core.ChangeLog.horizon(dbsession)
+    assert 0 < horizon <= old_version
+    result = core.ChangeLog.dashboard_changes(dbsession, horizon)
+    assert [cell["team"] for cell in result["stations"]] == ["team-blue"]
+
+
+def test_change_log_pruner_interval():
+    pruner = core.ChangeLogPruner(timedelta(hours=1), interval=3600)
+    engine = MagicMock()
+    pruner.maybe_prune(engine)
+    pruner.maybe_prune(engine)
+    engine.begin.assert_called_once()
+
+
+@pytest.mark.usefixtures("seed")
+def test_dashboard_changes_unassigned_team(dbsession):
+    version = core.ChangeLog.version(dbsession)
+    core.Route.unassign_team(dbsession, "route-blue", "team-blue")
+    dbsession.query(model.TeamStation).filter_by(team_name="team-blue").delete()
+    # Changes of the current transaction are visible to itself
+    result = core.ChangeLog.dashboard_changes(dbsession, version)
+    dbsession.rollback()
+    assert result["stations"] == [
+        {
+            "team": "team-blue",
+            "name": name,
+            "score": 0,
+            "state": TeamState.UNREACHABLE,
+        }
+        for name in [
+            "station-blue",
+            "station-end",
+            "station-red",
+            "station-start",
+        ]
+    ]
+
+
+@pytest.mark.usefixtures("seed")
+def test_dashboard_changes_assigned_team(dbsession):
+    version = core.ChangeLog.version(dbsession)
+    core.Route.assign_team(dbsession, "route-red", "team-without-route")
+    dbsession.flush()
+    result = core.ChangeLog.dashboard_changes(dbsession, version)
+    dbsession.rollback()
+    assert result["stations"] == [
+        {
+            "team": "team-without-route",
+            "name": name,
+            "score": 0,
+            "state": state,
+        }
+        for name, state in [
+            ("station-blue", TeamState.UNREACHABLE),
+            ("station-end", TeamState.UNKNOWN),
+            ("station-red", TeamState.UNKNOWN),
+            ("station-start", TeamState.UNKNOWN),
+        ]
+    ]
+
+
+@pytest.mark.usefixtures("seed")
+def test_dashboard_changes_route_station(dbsession):
+    version = core.ChangeLog.version(dbsession)
+    core.Route.assign_station(dbsession, "route-red", "station-blue")
+    dbsession.flush()
+    result = core.ChangeLog.dashboard_changes(dbsession, version)
+    dbsession.rollback()
+    assert result["stations"] == [
+        {
+            "team": "team-red",
+            "name": "station-blue",
+            "score": 0,
+            "state": TeamState.UNKNOWN,
+        }
+    ]
+
+
+@pytest.mark.usefixtures("seed")
+def test_dashboard_changes_new_station(dbsession):
+    version = core.ChangeLog.version(dbsession)
+    core.Station.create_new(dbsession, {"name": "station-new"})
+    dbsession.flush()
+    result = core.ChangeLog.dashboard_changes(dbsession, version)
+    dbsession.rollback()
+    assert [(cell["team"], cell["name"]) for cell in result["stations"]] == [
+        ("team-blue", "station-new"),
+        ("team-red", "station-new"),
+        ("team-without-route", "station-new"),
+    ]
+
+
+@pytest.mark.usefixtures("seed")
+def test_removal_moves_horizon(dbsession):
+    version = core.ChangeLog.version(dbsession)
+    assert core.ChangeLog.horizon(dbsession) <= version
+    core.Station.delete(dbsession, "station-red")
+    assert core.ChangeLog.horizon(dbsession) > version
+    dbsession.rollback()
+
+
+def test_data_modifying_cte_uses_primary(dbsession):
+    table = model.TeamStation.__table__
+    written = update(table).values(score=1).returning(table.c.team_name)
+    replica = MagicMock()
+    dbsession.info[model.REPLICA] = replica
+    try:
+        read = select(table.c.team_name)
+        assert dbsession.get_bind(clause=read) is replica
+        for clause in [
+            written,
+            read.add_cte(written.cte("written")),
+            select(func.count()).select_from(written.cte("written")),
+        ]:
+            assert model.modifies_data(clause)
+            assert dbsession.get_bind(clause=clause) is not replica
+    finally:
+        del dbsession.info[model.REPLICA]
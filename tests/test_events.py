@@ -0,0 +1,143 @@
+import json
+import threading
+from configparser import ConfigParser
+
+import pytest
+
+from powonline import events, pusher
+
+
+@pytest.fixture(params=["local", "postgres"])
+def broker(request):
+    if request.param == "local":
+        return events.LocalBroker(buffer_size=3)
+    return events.PostgresBroker(buffer_size=3)
+
+
+def publish_later(broker, *names):
+    def publish():
+        for name in names:
+            broker.publish("channel", name, {"name": name})
+
+    threading.Timer(0.2, publish).start()
+
+
+def test_subscribe(broker):
+    stream = broker.subscribe(timeout=10)
+    publish_later(broker, "first", "second")
+    first = next(stream)
+    second = next(stream)
+    assert (first["event"], second["event"]) == ("first", "second")
+    assert first["data"] == {"name": "first"}
+    assert first["id"] != second["id"]
+
+
+def test_keepalive():
+    stream = events.LocalBroker().subscribe(timeout=0)
+    assert next(stream) is None
+
+
+def test_resume(broker):
+    stream = broker.subscribe(timeout=10)
+    publish_later(broker, "a", "b", "c")
+    received = [next(stream) for _ in range(3)]
+    resumed = broker.subscribe(last_event_id=received[0]["id"], timeout=0)
+    assert [next(resumed)["event"] for _ in range(2)] == ["b", "c"]
+    assert next(resumed) is None
+
+
+def test_resume_after_buffer(broker):
+    stream = broker.subscribe(timeout=10)
+    publish_later(broker, "a", "b", "c", "d")
+    # Depending on timing, "a" may be gone before the stream sees it
+    while next(stream)["event"] != "d":
+        pass
+    resumed = broker.subscribe(last_event_id="unknown", timeout=0)
+    assert [next(resumed)["event"] for _ in range(3)] == ["b", "c", "d"]
+
+
+def test_large_event(broker):
+    stream = broker.subscribe(timeout=10)
+    data = {
+        "events": [
+            {"name": "\u00e9v\u00e9nement-%d" % idx} for idx in range(2000)
+        ]
+    }
+
+    threading.Timer(0.2, broker.publish, ("channel", "batch", data)).start()
+    message = next(stream)
+    assert message["event"] == "batch"
+    assert message["data"] == data
+
+
+def test_split_payload():
+    payload = '{"data": "%s"}' % ("x" * 10000)
+    parts = events.split_payload("abc", payload)
+    assert len(parts) > 1
+    assert all(len(part) <= events.MAX_PAYLOAD for part in parts)
+    assert "".join(json.loads(part)["chunk"] for part in parts) == payload
+    assert events.split_payload("abc", "{}") == ["{}"]
+
+
+def test_subscribers():
+    broker = events.LocalBroker()
+    stream = broker.subscribe(timeout=0)
+    next(stream)
+    assert broker.subscribers == 1
+    stream.close()
+    assert broker.subscribers == 0
+
+
+def test_channel_filter():
+    broker = events.LocalBroker()
+    stream = broker.subscribe({"files"}, timeout=10)
+
+    def publish():
+        broker.publish("teams", "team-deleted", {})
+        broker.publish("files", "file-added", {})
+
+    threading.Timer(0.2, publish).start()
+    assert next(stream)["event"] == "file-added"
+
+
+def test_format_event():
+    message = {"id": "1", "channel": "c", "event": "e", "data": {"a": 1}}
+    assert events.format_event(message) == 'id: 1\nevent: e\ndata: {"a": 1}\n\n'
+    assert events.format_event(None) == ": keep-alive\n\n"
+
+
+def test_sse_pusher():
+    config = ConfigParser()
+    config.read_dict({"pusher": {"backend": "sse"}})
+    wrapper = pusher.PusherWrapper.create(config, "", "", "")
+    assert isinstance(wrapper, pusher.SsePusher)
+    wrapper.send_file_event("file-added", {"id": "abc"})
+    resumed = wrapper.broker.subscribe(last_event_id="unknown", timeout=0)
+    assert next(resumed) == {
+        "id": "1",
+        "channel": "file-events-dev",
+        "event": "file-added",
+        "data": {"id": "abc"},
+    }
+
+
+def test_endpoint(app):
+    app.pusher = pusher.SsePusher(app.pusher.channels, events.LocalBroker())
+    app.pusher.send_team_event("state-change", {"team": "team-red"})
+    app.pusher.send_file_event("file-added", {"id": "abc"})
+    response = app.test_client().get(
+        "/events?channel=file-events-dev", headers={"Last-Event-ID": "x"}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    chunk = next(response.response)
+    assert chunk == b'id: 2\nevent: file-added\ndata: {"id": "abc"}\n\n'
+    assert app.pusher.broker.subscribers == 1
+    # As done by the server when the client disconnects
+    response.close()
+    assert app.pusher.broker.subscribers == 0
+
+
+def test_endpoint_disabled(app):
+    response = app.test_client().get("/events")
+    assert response.status_code == 404
@@ -0,0 +1,132 @@
+from configparser import ConfigParser
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from powonline import pool
+
+
+def test_defaults():
+    options = pool.engine_options(ConfigParser())
+    assert options["poolclass"] is pool.TimedQueuePool
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"prepare_threshold": 5}
+
+
+def test_options():
+    config = ConfigParser()
+    config.read_dict(
+        {
+            "db": {
+                "pool_size": "2",
+                "max_overflow": "0",
+                "statement_timeout": "5000",
+                "prepare_threshold": "none",
+            }
+        }
+    )
+    options = pool.engine_options(config)
+    assert options["pool_size"] == 2
+    assert options["max_overflow"] == 0
+    assert options["connect_args"] == {
+        "options": "-c statement_timeout=5000",
+        "prepare_threshold": None,
+    }
+
+
+def test_stats(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path}/pool.sqlite",
+        poolclass=pool.TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.01,
+    )
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        stats = engine.pool.stats()
+        assert stats["checked_out"] == 1
+    stats = engine.pool.stats()
+    assert stats["checked_out"] == 0
+    assert stats["checkouts"] == 2
+    assert stats["timeouts"] == 1
+    assert stats["max_checkout_ms"] >= 10
+
+
+@pytest.fixture
+def replicas(tmp_path):
+    engines = [
+        create_engine(f"sqlite:///{tmp_path}/replica-1.sqlite"),
+        create_engine(f"sqlite:///{tmp_path}/replica-2.sqlite"),
+    ]
+    return pool.ReplicaSet(engines, max_lag=5, check_interval=60)
+
+
+def test_replicas_round_robin(replicas):
+    chosen = [replicas.choose() for _ in range(4)]
+    assert chosen == replicas.engines * 2
+    assert [item["uses"] for item in replicas.stats()["replicas"]] == [2, 2]
+
+
+def test_unreachable_replica(replicas, tmp_path):
+    replicas.engines[0] = create_engine(
+        f"sqlite:///{tmp_path}/missing/replica.sqlite"
+    )
+    replicas._uses[replicas.engines[0]] = 0
+    assert [replicas.choose() for _ in range(2)] == [replicas.engines[1]] * 2
+
+
+def test_lagging_replicas(replicas):
+    with patch.object(replicas, "lag", return_value=10):
+        assert replicas.choose() is None
+    assert replicas.stats()["fallbacks"] == 1
+
+
+def test_lag_is_cached(replicas):
+    with patch.object(replicas, "lag", return_value=0) as lag:
+        for _ in range(4):
+            replicas.choose()
+    assert lag.call_count == 2
+
+
+def test_without_replicas():
+    replicas = pool.ReplicaSet.create(ConfigParser())
+    assert replicas.choose() is None
+    assert replicas.stats()["fallbacks"] == 0
+
+
+def test_replica_without_replay(replicas):
+    engine = MagicMock()
+    engine.dialect.name = "postgresql"
+    connection = engine.connect.return_value.__enter__.return_value
+    connection.execute.return_value.scalar_one.return_value = None
+    assert replicas.lag(engine) is None
+
+
+def test_lag_checked_outside_of_lock(replicas):
+    def lag(engine):
+        assert not replicas._lock.locked()
+        return 0
+
+    with patch.object(replicas, "lag", side_effect=lag) as _lag:
+        assert replicas.choose() is replicas.engines[0]
+    _lag.assert_called_once()
+
+
+def test_replica_connect_timeout():
+    config = ConfigParser()
+    config.read_dict(
+        {
+            "db": {
+                "replicas": "postgresql+psycopg://user@replica/powonline",
+                "replica_connect_timeout": "3",
+            }
+        }
+    )
+    with patch("powonline.pool.create_engine") as _create_engine:
+        pool.ReplicaSet.create(config)
+    _, kwargs = _create_engine.call_args
+    assert kwargs["connect_args"]["connect_timeout"] == 3
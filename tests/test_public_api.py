@@ -1,7 +1,8 @@
 import json
 import logging
 import unittest
-from datetime import datetime
+from datetime import datetime, timezone
+from io import BytesIO
 from textwrap import dedent
 from unittest.mock import patch
 
@@ -9,7 +10,7 @@ import jwt
 import pytest
 from config_resolver import get_config
 from flask_testing import TestCase
-from sqlalchemy import text
+from sqlalchemy import create_engine, event, text
 from util import (
     make_dummy_questionnaire_dict,
     make_dummy_route_dict,
@@ -18,7 +19,10 @@ from util import (
 )
 
 import powonline.core as core
-from powonline.model import DB
+from powonline.audit import OutboxSink
+from powonline.model import DB, AuditLog, AuditType, Upload
+from powonline.pool import ReplicaSet
+from powonline.schema import ListResponse, TeamSchema
 from powonline.web import make_app
 
 LOG = logging.getLogger(__name__)
@@ -101,6 +105,7 @@ class BaseAuthTestCase(TestCase):
         with open(here("seed.sql")) as seed:
             DB.session.execute(text(seed.read()))
             DB.session.commit()
+        core.STATION_ACCESS.clear()
 
         self.maxDiff = None
 
@@ -435,6 +440,13 @@ class TestPublicAPIAsAdmin(BaseAuthTestCase):
         self.assertEqual(response_a.status_code, response_b.status_code)
         self.assertEqual(response_a.data, response_b.data)
 
+    def test_list_team_stations(self):
+        response = self.app.get("/team/team-red/stations")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.content_type, "application/json")
+        names = [item["name"] for item in response.json["items"]]
+        self.assertEqual(names, ["station-end", "station-red", "station-start"])
+
     def test_advance_team_state_auto_start(self):
         """
         Advancing on a station flagged as "start" station should set the
@@ -451,20 +463,21 @@ class TestPublicAPIAsAdmin(BaseAuthTestCase):
         headers = {"Content-Type": "application/json"}
 
         # advance 6 times (cycles at least twice over the trigger state). We
-        # expect the call to happen only once though!
-        with patch("powonline.core.func") as _func:
-            _func.now.return_value = "2018-01-01 01:02:03"
-            for _ in range(6):
-                self.app.post("/job", headers=headers, data=json.dumps(job))
-            _func.now.assert_called_once()
+        # expect the time to be set only once though!
+        start_times = []
+        for _ in range(6):
+            self.app.post("/job", headers=headers, data=json.dumps(job))
+            detail_response = self.app.get("/team/team-red")
+            details = json.loads(detail_response.text)
+            start_times.append(details["effective_start_time"])
+            self.assertEqual(details["finish_time"], None)
+        self.assertEqual(start_times[:2], [None, None])
+        self.assertIsNotNone(start_times[2])
+        self.assertEqual(set(start_times[2:]), {start_times[2]})
 
         state_response = self.app.get("/station/station-start/teams/team-red")
         state = json.loads(state_response.text)
         self.assertEqual(state["state"], "finished")
-        detail_response = self.app.get("/team/team-red")
-        details = json.loads(detail_response.text)
-        self.assertEqual(details["effective_start_time"], "2018-01-01T01:02:03")
-        self.assertEqual(details["finish_time"], None)
 
     def test_advance_team_state_auto_finish(self):
         """
@@ -482,20 +495,21 @@ class TestPublicAPIAsAdmin(BaseAuthTestCase):
         headers = {"Content-Type": "application/json"}
 
         # advance 6 times (cycles at least twice over the trigger state). We
-        # expect the call to happen only once though!
-        with patch("powonline.core.func") as _func:
-            _func.now.return_value = "2018-02-03 01:02:03"
-            for _ in range(6):
-                self.app.post("/job", headers=headers, data=json.dumps(job))
-            _func.now.assert_called_once()
+        # expect the time to be set only once though!
+        finish_times = []
+        for _ in range(6):
+            self.app.post("/job", headers=headers, data=json.dumps(job))
+            detail_response = self.app.get("/team/team-red")
+            details = json.loads(detail_response.text)
+            finish_times.append(details["finish_time"])
+            self.assertEqual(details["effective_start_time"], None)
+        self.assertEqual(finish_times[:2], [None, None])
+        self.assertIsNotNone(finish_times[2])
+        self.assertEqual(set(finish_times[2:]), {finish_times[2]})
 
         state_response = self.app.get("/station/station-end/teams/team-red")
         state = json.loads(state_response.text)
         self.assertEqual(state["state"], "arrived")
-        detail_response = self.app.get("/team/team-red")
-        details = json.loads(detail_response.text)
-        self.assertEqual(details["effective_start_time"], None)
-        self.assertEqual(details["finish_time"], "2018-02-03T01:02:03")
 
     def test_advance_team_state(self):
         simplejob = {
@@ -517,10 +531,10 @@ class TestPublicAPIAsAdmin(BaseAuthTestCase):
 
     def test_scoreboard(self):
         with patch("powonline.resources.core") as _core:
-            _core.scoreboard.return_value = [
-                ("team1", 40),
-                ("team2", 20),
-                ("team3", 0),
+            _core.Scoreboard.ranked.return_value = [
+                (1, "team1", 40),
+                (2, "team2", 20),
+                (3, "team3", 0),
             ]
             response = self.app.get("/scoreboard")
             data = json.loads(response.text)
@@ -531,6 +545,468 @@ class TestPublicAPIAsAdmin(BaseAuthTestCase):
             ]
             self.assertEqual(data, expected)
 
+    def test_scoreboard_ranked(self):
+        with patch("powonline.resources.core") as _core:
+            _core.Scoreboard.ranked.return_value = [
+                (1, "team1", 40),
+                (1, "team2", 40),
+                (3, "team3", 0),
+            ]
+            response = self.app.get("/scoreboard?ranked")
+            data = json.loads(response.text)
+            expected = [
+                {"rank": 1, "team": "team1", "score": 40},
+                {"rank": 1, "team": "team2", "score": 40},
+                {"rank": 3, "team": "team3", "score": 0},
+            ]
+            self.assertEqual(data, expected)
+
+    def test_conditional_get(self):
+        response = self.app.get("/dashboard")
+        self.assertEqual(response.status_code, 200, response.data)
+        etag = response.headers["ETag"]
+        response = self.app.get("/dashboard", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304, response.data)
+        self.assertEqual(response.headers["ETag"], etag)
+
+    def test_cached_response(self):
+        first = self.app.get("/dashboard")
+        second = self.app.get("/dashboard")
+        self.assertEqual(first.data, second.data)
+        response = self.app.get("/metrics")
+        self.assertEqual(response.status_code, 200, response.data)
+        stats = json.loads(response.text)["response_cache"]
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_read_request_skips_commit(self):
+        with patch.object(DB.session, "commit") as commit:
+            response = self.app.get("/scoreboard")
+            self.assertEqual(response.status_code, 200, response.data)
+            commit.assert_not_called()
+            response = self.app.post(
+                "/job",
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(
+                    {
+                        "action": "advance",
+                        "args": {
+                            "station_name": "station-red",
+                            "team_name": "team-red",
+                        },
+                    }
+                ),
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+            commit.assert_called_once()
+
+    def test_autocommit_reads(self):
+        self.client.application.localconfig.read_dict(
+            {"db": {"autocommit_reads": "true"}}
+        )
+        isolation_levels = []
+
+        def record(conn, *args):
+            options = conn.get_execution_options()
+            isolation_levels.append(options.get("isolation_level"))
+
+        DB.session.remove()
+        event.listen(DB.engine, "before_cursor_execute", record)
+        try:
+            response = self.app.get("/scoreboard")
+        finally:
+            event.remove(DB.engine, "before_cursor_execute", record)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertTrue(isolation_levels)
+        self.assertEqual(set(isolation_levels), {"AUTOCOMMIT"})
+
+    def test_replica_reads(self):
+        replica = create_engine(DB.engine.url)
+        self.client.application.replicas = ReplicaSet([replica])
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement.split()[0])
+
+        DB.session.remove()
+        event.listen(replica, "before_cursor_execute", record)
+        try:
+            response = self.app.get("/scoreboard")
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(statements[-1], "SELECT")
+            del statements[:]
+            response = self.app.post(
+                "/job",
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(
+                    {
+                        "action": "advance",
+                        "args": {
+                            "station_name": "station-red",
+                            "team_name": "team-red",
+                        },
+                    }
+                ),
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+        finally:
+            event.remove(replica, "before_cursor_execute", record)
+            replica.dispose()
+        self.assertEqual(statements, [])
+
+    def test_pool_metrics(self):
+        response = self.app.get("/metrics")
+        self.assertEqual(response.status_code, 200, response.data)
+        stats = json.loads(response.text)["db_pool"]
+        self.assertGreater(stats["checkouts"], 0)
+        self.assertEqual(stats["timeouts"], 0)
+
+    def test_conditional_get_after_write(self):
+        response = self.app.get("/dashboard")
+        etag = response.headers["ETag"]
+        simplejob = {
+            "action": "advance",
+            "args": {
+                "station_name": "station-start",
+                "team_name": "team-red",
+            },
+        }
+        response = self.app.post(
+            "/job",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(simplejob),
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.app.get("/dashboard", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def test_dashboard_changes(self):
+        response = self.app.get("/dashboard")
+        version = response.headers["X-Change-Version"]
+        simplejob = {
+            "action": "advance",
+            "args": {
+                "station_name": "station-red",
+                "team_name": "team-red",
+            },
+        }
+        response = self.app.post(
+            "/job",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(simplejob),
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.app.get(f"/dashboard?since={version}")
+        self.assertEqual(response.status_code, 200, response.data)
+        data = json.loads(response.text)
+        self.assertEqual(
+            data["stations"],
+            [
+                {
+                    "team": "team-red",
+                    "name": "station-red",
+                    "score": None,
+                    "state": "arrived",
+                }
+            ],
+        )
+        self.assertGreater(data["version"], int(version))
+
+    def test_dashboard_pruned_version(self):
+        response = self.app.get("/dashboard")
+        version = int(response.headers["X-Change-Version"])
+        DB.session.execute(
+            text("UPDATE change_log_horizon SET txid = :txid"),
+            {"txid": version + 1},
+        )
+        DB.session.commit()
+        response = self.app.get(f"/dashboard?since={version}")
+        self.assertEqual(response.status_code, 410, response.data)
+        response = self.app.get(f"/dashboard?since={version + 1}")
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_dashboard_invalid_version(self):
+        response = self.app.get("/dashboard?since=abc")
+        self.assertEqual(response.status_code, 400, response.data)
+
+    def test_upload_pages(self):
+        mtime = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        for name in ("a.jpg", "b.jpg", "c.jpg"):
+            upload = Upload(name, "user-red")
+            upload.size = 100
+            upload.mtime = mtime
+            DB.session.add(upload)
+        DB.session.commit()
+
+        with patch("powonline.resources.stat") as _stat:
+            response = self.app.get("/upload?public&limit=2")
+            self.assertEqual(response.status_code, 200, response.data)
+            first_page = response.json
+            cursor = response.headers["X-Next-Cursor"]
+            response = self.app.get(
+                "/upload?public&limit=2&cursor=%s" % cursor
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+            second_page = response.json
+            _stat.assert_not_called()
+
+        self.assertNotIn("X-Next-Cursor", response.headers)
+        self.assertEqual(len(first_page), 2)
+        self.assertEqual(len(second_page), 1)
+        names = {item["name"] for item in first_page + second_page}
+        self.assertEqual(names, {"a.jpg", "b.jpg", "c.jpg"})
+        self.assertEqual(first_page[0]["when"], mtime.isoformat())
+        self.assertTrue(
+            first_page[0]["tiny"].endswith(
+                "/upload/%s?v=%d&size=64"
+                % (first_page[0]["uuid"], mtime.timestamp())
+            )
+        )
+
+    def test_upload_caching(self):
+        mtime = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        upload = Upload("a.jpg", "user-red")
+        upload.mtime = mtime
+        DB.session.add(upload)
+        DB.session.commit()
+        uuid = upload.uuid
+
+        thumbnails = self.client.application.thumbnails
+        for query, max_age in [
+            ("?v=%d" % mtime.timestamp(), "max-age=31536000"),
+            ("?v=%d&size=64" % mtime.timestamp(), "max-age=31536000"),
+            ("?v=1&size=64", None),
+            ("?size=64", None),
+            ("", None),
+        ]:
+            with patch.object(thumbnails, "get") as _get:
+                _get.return_value = BytesIO(b"image-data")
+                response = self.app.get("/upload/%s%s" % (uuid, query))
+            self.assertEqual(response.status_code, 200, response.data)
+            cache_control = response.headers.get("Cache-Control", "")
+            if max_age:
+                self.assertIn(max_age, cache_control, query)
+            else:
+                self.assertNotIn("max-age=31536000", cache_control, query)
+
+    def test_upload_invalid_cursor(self):
+        response = self.app.get("/upload?public&cursor=foo")
+        self.assertEqual(response.status_code, 400, response.data)
+
+    def _add_audit_entries(self):
+        core.add_audit_logs(
+            DB.session,
+            "user-red",
+            [(AuditType.STATION_SCORE, "red-%d" % i) for i in range(3)],
+        )
+        for day in (1, 2):
+            DB.session.add(
+                AuditLog(
+                    datetime(2020, 1, day, tzinfo=timezone.utc),
+                    "john",
+                    AuditType.ADMIN,
+                    "john-%d" % day,
+                )
+            )
+        DB.session.commit()
+
+    def test_auditlog_pages(self):
+        self._add_audit_entries()
+        messages = []
+        cursor = ""
+        while True:
+            response = self.app.get("/auditlog?limit=2&cursor=%s" % cursor)
+            self.assertEqual(response.status_code, 200, response.data)
+            messages.extend(item["message"] for item in response.json)
+            if "X-Next-Cursor" not in response.headers:
+                break
+            cursor = response.headers["X-Next-Cursor"]
+        # The entries of user-red share the same timestamp
+        self.assertEqual(
+            messages, ["red-2", "red-1", "red-0", "john-2", "john-1"]
+        )
+
+    def test_auditlog_filters(self):
+        self._add_audit_entries()
+        response = self.app.get("/auditlog?username=john")
+        self.assertEqual(
+            [item["message"] for item in response.json], ["john-2", "john-1"]
+        )
+        response = self.app.get("/auditlog?type=station_score&limit=1")
+        self.assertEqual([item["message"] for item in response.json], ["red-2"])
+        response = self.app.get(
+            "/auditlog?since=2020-01-01T12:00:00&until=2020-01-03"
+        )
+        self.assertEqual(
+            [item["message"] for item in response.json], ["john-2"]
+        )
+
+    def test_auditlog_invalid_arguments(self):
+        for query in (
+            "cursor=foo",
+            "type=foo",
+            "since=foo",
+            "format=xml",
+            "limit=-1",
+        ):
+            response = self.app.get("/auditlog?%s" % query)
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_team_pages(self):
+        names = []
+        cursor = ""
+        while True:
+            response = self.app.get("/team?limit=2&cursor=%s" % cursor)
+            self.assertEqual(response.status_code, 200, response.data)
+            names.extend(item["name"] for item in response.json["items"])
+            if "X-Next-Cursor" not in response.headers:
+                break
+            cursor = response.headers["X-Next-Cursor"]
+        self.assertEqual(names, ["team-blue", "team-red", "team-without-route"])
+
+    def test_team_pages_unicode(self):
+        core.Team.create_new(
+            DB.session,
+            {"name": "команда-\U0001f680", "email": "unicode@example.com"},
+        )
+        DB.session.commit()
+        names = []
+        cursor = ""
+        while True:
+            response = self.app.get("/team?limit=1&cursor=%s" % cursor)
+            self.assertEqual(response.status_code, 200, response.data)
+            names.extend(item["name"] for item in response.json["items"])
+            if "X-Next-Cursor" not in response.headers:
+                break
+            cursor = response.headers["X-Next-Cursor"]
+        self.assertEqual(
+            names,
+            [
+                "team-blue",
+                "team-red",
+                "team-without-route",
+                "команда-\U0001f680",
+            ],
+        )
+
+    def test_team_invalid_cursor(self):
+        response = self.app.get("/team?limit=1&cursor=%%%%")
+        self.assertEqual(response.status_code, 400, response.data)
+
+    def test_team_fields(self):
+        response = self.app.get("/team?fields=email,route_name")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertCountEqual(
+            response.json["items"],
+            [
+                {
+                    "name": "team-red",
+                    "email": "email-red@example.com",
+                    "route_name": "route-red",
+                },
+                {
+                    "name": "team-blue",
+                    "email": "email-blue@example.com",
+                    "route_name": "route-blue",
+                },
+                {
+                    "name": "team-without-route",
+                    "email": "email-wr@example.com",
+                    "route_name": None,
+                },
+            ],
+        )
+
+    def test_team_invalid_arguments(self):
+        for query in ("fields=name,password", "limit=-1"):
+            response = self.app.get("/team?%s" % query)
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_team_list_unchanged(self):
+        """
+        The projected rows are rendered like the validated schema
+        """
+        response = self.app.get("/team")
+        teams = core.Team.all(DB.session)
+        expected = ListResponse[TeamSchema](
+            items=[TeamSchema.model_validate(team) for team in teams]
+        ).model_dump_json()
+        self.assertEqual(response.text, expected)
+
+    def test_questionnaire_pages(self):
+        response = self.app.get("/questionnaire?limit=2&fields=station_name")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            response.json["items"],
+            [
+                {"name": "questionnaire_1", "station_name": "station-blue"},
+                {"name": "questionnaire_2", "station_name": "station-red"},
+            ],
+        )
+        cursor = response.headers["X-Next-Cursor"]
+        response = self.app.get(
+            "/questionnaire?limit=2&fields=name&cursor=%s" % cursor
+        )
+        self.assertEqual(
+            response.json["items"], [{"name": "questionnaire_3"}]
+        )
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+    def test_auditlog_outbox(self):
+        sink = OutboxSink(background=False)
+        self.addCleanup(sink.close)
+        simplejob = {
+            "action": "set_score",
+            "args": {
+                "station_name": "station-red",
+                "team_name": "team-red",
+                "score": 5,
+            },
+        }
+        with patch.object(self.client.application, "audit", sink):
+            response = self.app.post(
+                "/job",
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(simplejob),
+            )
+            self.assertEqual(response.status_code, 200, response.data)
+            count = DB.session.execute(
+                text("SELECT COUNT(*) FROM auditlog_outbox")
+            ).scalar_one()
+            self.assertEqual(count, 1)
+            # Reading the audit-log moves the entries out of the outbox
+            response = self.app.get("/auditlog")
+        self.assertEqual(len(response.json), 1)
+        self.assertEqual(response.json[0]["type"], "station_score")
+
+    def test_auditlog_export(self):
+        self._add_audit_entries()
+        response = self.app.get("/auditlog?format=ndjson&username=john")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        self.assertEqual(
+            rows[0],
+            {
+                "timestamp": "2020-01-02T00:00:00+00:00",
+                "username": "john",
+                "type": "admin",
+                "message": "john-2",
+            },
+        )
+        self.assertEqual(len(rows), 2)
+
+        response = self.app.get("/auditlog?format=csv")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.mimetype, "text/csv")
+        lines = response.text.splitlines()
+        self.assertEqual(lines[0], "timestamp,username,type,message")
+        self.assertEqual(
+            lines[-1], "2020-01-01T00:00:00+00:00,john,admin,john-1"
+        )
+        self.assertEqual(len(lines), 6)
+
     def test_questionnaire_scores(self):
         with patch("powonline.rootbp.questionnaire_scores") as _qs:
             _qs.return_value = {
@@ -926,6 +1402,86 @@ class TestPublicAPIAsStationManager(BaseAuthTestCase):
         )
         self.assertEqual(response.status_code, 401, response.data)
 
+    def test_batch_job(self):
+        def job(action, team_name, station_name, **kwargs):
+            args = {"team_name": team_name, "station_name": station_name}
+            args.update(kwargs)
+            return {"action": action, "args": args}
+
+        jobs = [
+            job("advance", "team-red", "station-red"),
+            job("set_score", "team-red", "station-red", score=5),
+            job("set_score", "team-red", "station-red", score="7"),
+            job("set_score", "team-red", "station-blue", score=3),
+            job(
+                "set_questionnaire_score", "team-blue", "station-red", score=15
+            ),
+            job("foo", "team-red", "station-red"),
+            job("set_score", "team-nope", "station-red", score=1),
+        ]
+        pusher = self.client.application.pusher
+        with patch.object(pusher, "send_team_event") as send_team_event:
+            response = self.app.post(
+                "/job/batch",
+                headers={"Content-Type": "application/json"},
+                data=json.dumps({"jobs": jobs}),
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        results = response.json["results"]
+        self.assertEqual(
+            [result["status"] for result in results],
+            [200, 200, 200, 401, 200, 400, 404],
+        )
+        self.assertEqual(results[0]["result"], {"result": {"state": "arrived"}})
+        self.assertEqual(results[2]["result"], {"new_score": 7})
+
+        DB.session.remove()
+        state = core.Team.get_station_data(
+            DB.session, "team-red", "station-red"
+        )
+        self.assertEqual(state.state, core.TeamState.ARRIVED)
+        self.assertEqual(state.score, 7)
+        scores = {
+            team: score for _, team, score in core.Scoreboard.ranked(DB.session)
+        }
+        self.assertEqual(scores["team-red"], 10 + 30 + 7)
+        self.assertEqual(scores["team-blue"], 20 + 30 + 15)
+        messages = DB.session.execute(
+            text("SELECT message FROM auditlog ORDER BY message")
+        ).scalars()
+        self.assertEqual(len(list(messages)), 3)
+        send_team_event.assert_called_once()
+        event, payload = send_team_event.call_args[0]
+        self.assertEqual(event, "batch")
+        self.assertEqual(
+            [item["event"] for item in payload["events"]],
+            ["state-change", "score-change", "questionnaire-score-change"],
+        )
+
+    def test_batch_job_invalid_scores(self):
+        args = {"team_name": "team-red", "station_name": "station-red"}
+        jobs = [{"action": "advance", "args": args}]
+        for score in ("abc", [1], {"score": 1}, 1.5, 4):
+            jobs.append(
+                {"action": "set_score", "args": {**args, "score": score}}
+            )
+        response = self.app.post(
+            "/job/batch",
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"jobs": jobs}),
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [result["status"] for result in response.json["results"]],
+            [200, 400, 400, 400, 400, 200],
+        )
+        DB.session.remove()
+        state = core.Team.get_station_data(
+            DB.session, "team-red", "station-red"
+        )
+        self.assertEqual(state.state, core.TeamState.ARRIVED)
+        self.assertEqual(state.score, 4)
+
 
 class TestPublicAPIAsAnonymous(BaseAuthTestCase):
     USERNAME = ""
@@ -0,0 +1,121 @@
+import threading
+from configparser import ConfigParser
+
+import pytest
+
+from powonline import pusher
+
+
+class FakePusher:
+    """
+    Stands in for the pusher.com client, failing the first *failures* calls
+    """
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+        self.called = threading.Event()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def trigger_batch(self, batch):
+        self.called.set()
+        self.gate.wait(10)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("pusher unavailable")
+        self.batches.append(batch)
+
+
+def make_event(idx):
+    return {"channel": "channel", "name": "event", "data": {"idx": idx}}
+
+
+def test_batches():
+    fake = FakePusher()
+    dispatcher = pusher.Dispatcher(fake.trigger_batch)
+    fake.gate.clear()
+    dispatcher.put(make_event(0))
+    assert fake.called.wait(10)
+    for idx in range(1, 26):
+        dispatcher.put(make_event(idx))
+    fake.gate.set()
+    assert dispatcher.flush(10)
+    assert [len(batch) for batch in fake.batches] == [1, 10, 10, 5]
+    sent = [event["data"]["idx"] for batch in fake.batches for event in batch]
+    assert sent == list(range(26))
+    assert dispatcher.stats()["sent"] == 26
+
+
+def test_retry():
+    fake = FakePusher(failures=2)
+    dispatcher = pusher.Dispatcher(fake.trigger_batch, backoff=0)
+    dispatcher.put(make_event(0))
+    assert dispatcher.flush(10)
+    assert fake.batches == [[make_event(0)]]
+    assert dispatcher.stats()["retries"] == 2
+
+
+def test_give_up():
+    fake = FakePusher(failures=3)
+    dispatcher = pusher.Dispatcher(fake.trigger_batch, max_retries=2, backoff=0)
+    dispatcher.put(make_event(0))
+    assert dispatcher.flush(10)
+    assert fake.batches == []
+    assert dispatcher.stats()["failed"] == 1
+
+
+@pytest.mark.parametrize(
+    "overflow, expected",
+    [
+        (pusher.DROP_OLDEST, [0, 3, 4]),
+        (pusher.DROP_NEWEST, [0, 1, 2]),
+    ],
+)
+def test_overflow(overflow, expected):
+    fake = FakePusher()
+    dispatcher = pusher.Dispatcher(
+        fake.trigger_batch, max_queue=2, overflow=overflow
+    )
+    fake.gate.clear()
+    dispatcher.put(make_event(0))
+    assert fake.called.wait(10)
+    for idx in range(1, 5):
+        dispatcher.put(make_event(idx))
+    fake.gate.set()
+    assert dispatcher.flush(10)
+    sent = [event["data"]["idx"] for batch in fake.batches for event in batch]
+    assert sent == expected
+    assert dispatcher.stats()["dropped"] == 2
+
+
+def test_close_flushes():
+    fake = FakePusher()
+    dispatcher = pusher.Dispatcher(fake.trigger_batch)
+    fake.gate.clear()
+    for idx in range(3):
+        dispatcher.put(make_event(idx))
+    threading.Timer(0.1, fake.gate.set).start()
+    dispatcher.close()
+    assert sum(len(batch) for batch in fake.batches) == 3
+    assert not dispatcher.put(make_event(3))
+
+
+def test_trigger_is_queued():
+    config = ConfigParser()
+    config.read_dict({"pusher": {"max_retries": "0"}})
+    wrapper = pusher.PusherWrapper.create(config, "app", "key", "secret")
+    fake = FakePusher()
+    wrapper.dispatcher.send_batch = fake.trigger_batch
+    wrapper.send_team_event("state-change", {"team": "team-red"})
+    assert wrapper.dispatcher.flush(10)
+    assert fake.batches == [
+        [
+            {
+                "channel": "team-station-state-dev",
+                "name": "state-change",
+                "data": {"team": "team-red"},
+            }
+        ]
+    ]
+    assert wrapper.stats()["sent"] == 1
@@ -0,0 +1,150 @@
+"""
+Regression-tests for the query-plans of frequent lookups.
+
+The lookups are run against an event-sized data-set. The statements they
+send to the database are then explained, and the tests fail if the plan
+reads a table sequentially or does not use the index expected for the
+lookup.
+
+Sequential scans are disabled while explaining: on the smaller tables they
+are cheaper than any index-scan, so they only remain in the plan if no
+index matches the query.
+"""
+
+import json
+from os.path import dirname, join
+
+import pytest
+from pytest import fixture
+from sqlalchemy import event, text
+
+from powonline import core, model
+
+
+@fixture(autouse=True)
+def app_context(app):
+    with app.app_context():
+        yield
+
+
+@fixture
+def event_data(seed, dbsession):
+    with open(join(dirname(__file__), "seed_event.sql")) as seed_event:
+        dbsession.execute(text(seed_event.read()))
+    try:
+        yield dbsession
+    finally:
+        dbsession.rollback()
+
+
+def capture(session, function):
+    """
+    Call *function* and return the SELECT statements (with their
+    parameters) it sent to the database.
+    """
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        function(session)
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    return statements
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(session, function):
+    """
+    Return the sequentially scanned tables and the used indexes of the
+    statements sent by *function*.
+    """
+    statements = capture(session, function)
+    session.execute(text("SET LOCAL enable_seqscan = off"))
+    sequential_scans = set()
+    indexes = set()
+    for statement, parameters in statements:
+        result = session.connection().exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {statement}", parameters
+        )
+        plan = result.scalar_one()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        for node in plan_nodes(plan[0]["Plan"]):
+            if node["Node Type"] == "Seq Scan":
+                sequential_scans.add(node["Relation Name"])
+            if "Index Name" in node:
+                indexes.add(node["Index Name"])
+    return sequential_scans, indexes
+
+
+#: Frequent lookups and the indexes they are expected to use
+HOT_LOOKUPS = {
+    "station-team-states": (
+        lambda session: list(
+            core.Station.team_states(session, "event-station-8")
+        ),
+        {
+            "route_station_station_idx",
+            "team_route_idx",
+            "team_station_state_station_idx",
+        },
+    ),
+    "station-states": (
+        lambda session: session.get(model.Station, "event-station-8").states,
+        {"team_station_state_station_idx"},
+    ),
+    "station-questionnaires": (
+        lambda session: core.Station.questionnaires(
+            session, ["event-station-8"]
+        ),
+        {"questionnaire_station_idx"},
+    ),
+    "questionnaire-teams": (
+        lambda session: session.get(
+            model.Questionnaire, "event-questionnaire-8"
+        ).teams,
+        {"questionnaire_score_questionnaire_idx"},
+    ),
+    "route-teams": (
+        lambda session: session.get(model.Route, "event-route-3").teams,
+        {"team_route_idx"},
+    ),
+    "user-uploads": (
+        lambda session: core.Upload.page(
+            core.Upload.list(session, "event-user-8"), limit=20
+        ).all(),
+        {"uploads_username_id_idx"},
+    ),
+    "auditlog": (
+        lambda session: core.AuditLog.page(
+            core.AuditLog.query(session), limit=100, cursor="10-100"
+        ).all(),
+        {"auditlog_timestamp_idx"},
+    ),
+    "user-auditlog": (
+        lambda session: core.AuditLog.page(
+            core.AuditLog.query(session, "event-user-8"), limit=100
+        ).all(),
+        {"auditlog_user_timestamp_idx"},
+    ),
+}
+
+
+@pytest.mark.parametrize("name", sorted(HOT_LOOKUPS))
+def test_indexed_lookup(event_data, name):
+    function, expected_indexes = HOT_LOOKUPS[name]
+    # Only query the database, not the objects already in the session
+    event_data.expire_all()
+    sequential_scans, indexes = explain(event_data, function)
+    assert sequential_scans == set()
+    assert expected_indexes <= indexes
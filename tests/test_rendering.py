@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from pytest import fixture
+
+from powonline import rendering
+from powonline.model import TeamState
+from powonline.schema import AssignmentsSchema, RouteSchema
+
+
+@fixture(autouse=True)
+def request_context(app):
+    with app.test_request_context():
+        yield
+
+
+def test_list_adapter_cached():
+    assert rendering.list_adapter(RouteSchema) is rendering.list_adapter(
+        RouteSchema
+    )
+
+
+def test_render_list():
+    objects = [
+        SimpleNamespace(name="route-1", color="#ff0000", ignored=1),
+        {"name": "route-2"},
+    ]
+    response = rendering.render_list(RouteSchema, objects, 201)
+    assert response.status_code == 201
+    assert response.content_type == "application/json"
+    assert json.loads(response.data) == {
+        "items": [
+            {"name": "route-1", "color": "#ff0000"},
+            {"name": "route-2", "color": ""},
+        ]
+    }
+
+
+def test_render():
+    document = {
+        "state": TeamState.FINISHED,
+        "stations": {"station-1"},
+        "routes": rendering.validate_list(RouteSchema, [{"name": "r"}]),
+    }
+    response = rendering.render(document)
+    assert json.loads(response.data) == {
+        "state": "finished",
+        "stations": ["station-1"],
+        "routes": [{"name": "r", "color": ""}],
+    }
+
+
+def test_render_as():
+    team = SimpleNamespace(
+        name="team-1",
+        email="team-1@example.com",
+        order=1,
+        contact=None,
+        phone=None,
+        comments=None,
+        confirmation_key="key",
+        num_vegetarians=None,
+        num_participants=None,
+        planned_start_time=datetime(2020, 1, 2, tzinfo=timezone.utc),
+        effective_start_time=None,
+    )
+    document = {
+        "stations": {"route-1": [SimpleNamespace(name="station-1")]},
+        "teams": {"route-1": (team,)},
+    }
+    response = rendering.render_as(AssignmentsSchema, document)
+    result = json.loads(response.data)
+    assert [station["name"] for station in result["stations"]["route-1"]] == [
+        "station-1"
+    ]
+    (item,) = result["teams"]["route-1"]
+    assert item["planned_start_time"] == "2020-01-02T00:00:00+00:00"
@@ -1,7 +1,7 @@
 import pytest
 from pytest import fixture
 
-from powonline import core
+from powonline import core, model
 
 
 @fixture(autouse=True)
@@ -62,6 +62,36 @@ def test_team_states(dbsession):
     assert testable == expected
 
 
+def test_team_states_ordering(dbsession, seed):
+    result = [
+        row[0] for row in core.Station.team_states(dbsession, "station-end")
+    ]
+    assert result == ["team-blue", "team-red"]
+
+
+def test_team_states_query_count(dbsession, seed, query_counter):
+    """
+    The team-states of a station must be fetched with one query, no matter
+    how many routes pass through the station.
+    """
+    for idx in range(5):
+        route = core.Route.create_new(dbsession, {"name": f"extra-route-{idx}"})
+        route.stations.add(core.Station.get(dbsession, "station-start"))
+        route.teams.add(
+            model.Team(
+                name=f"extra-team-{idx}",
+                email="extra@example.com",
+                confirmation_key=f"extra-{idx}",
+            )
+        )
+    dbsession.flush()
+
+    query_counter.count = 0
+    result = list(core.Station.team_states(dbsession, "station-start"))
+    assert query_counter.count == 1
+    assert len(result) == 7
+
+
 @pytest.mark.parametrize(
     "relation, expected",
     [
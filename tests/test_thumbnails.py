@@ -0,0 +1,120 @@
+import io
+from os import listdir, stat, utime
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from powonline import thumbnails
+
+
+@pytest.fixture
+def source(tmp_path):
+    filename = str(tmp_path / "original.jpg")
+    Image.new("RGB", (800, 600), "red").save(filename)
+    return filename
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return thumbnails.ThumbnailCache(str(tmp_path / "__thumbnails__"), 10**7)
+
+
+def test_render_once(cache, source):
+    with patch.object(thumbnails, "render", wraps=thumbnails.render) as render:
+        first = cache.get("abc", source, 64)
+        second = cache.get("abc", source, 64)
+    assert first == second
+    assert render.call_count == 1
+    with Image.open(first) as im:
+        assert im.size == (64, 48)
+
+
+def test_replaced_original(cache, source):
+    first = cache.get("abc", source, 64)
+    info = stat(source)
+    utime(source, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+    second = cache.get("abc", source, 64)
+    assert first != second
+
+
+def test_oversized_request(cache, source):
+    filename = cache.get("abc", source, 10000)
+    with Image.open(filename) as im:
+        assert im.size == (800, 600)
+
+
+def test_missing_original(cache, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        cache.get("abc", str(tmp_path / "missing.jpg"), 64)
+
+
+def test_eviction(cache, source):
+    first = cache.get("abc", source, 64)
+    utime(first, (0, 0))
+    cache.max_bytes = stat(first).st_size + 1
+    second = cache.get("abc", source, 32)
+    assert listdir(cache.folder) == [second.rsplit("/", 1)[1]]
+
+
+def test_discard(cache, source):
+    cache.get("abc", source, 64)
+    cache.get("abc", source, 32)
+    cache.get("def", source, 32)
+    cache.discard("abc")
+    assert [name.split("_")[0] for name in listdir(cache.folder)] == ["def"]
+
+
+def test_pregenerate(cache, source):
+    with patch.object(thumbnails.Image, "open", wraps=Image.open) as open_:
+        created = cache.pregenerate("abc", source)
+    assert open_.call_count == 1
+    assert sorted(created) == sorted(
+        cache.path_for("abc", source, size)
+        for size in thumbnails.STANDARD_SIZES
+    )
+    with patch.object(thumbnails, "render") as render:
+        cache.get("abc", source, 64)
+        cache.get("abc", source, 256)
+    render.assert_not_called()
+    assert cache.pregenerate("abc", source) == []
+
+
+def test_submit(cache, source):
+    future = cache.submit("abc", source)
+    assert len(future.result(timeout=10)) == len(thumbnails.STANDARD_SIZES)
+
+
+def test_submit_without_workers(cache, source):
+    cache.workers = 0
+    assert cache.submit("abc", source) is None
+
+
+def test_backfill(cache, source):
+    created = thumbnails.backfill(cache.folder, "abc", source)
+    assert sorted(listdir(cache.folder)) == sorted(
+        name.rsplit("/", 1)[1] for name in created
+    )
+
+
+@pytest.mark.parametrize("size, expected", [(64, (48, 64)), (0, (600, 800))])
+def test_orientation(cache, tmp_path, size, expected):
+    filename = str(tmp_path / "rotated.jpg")
+    exif = Image.Exif()
+    exif[thumbnails.ORIENTATION_TAG] = 6
+    Image.new("RGB", (800, 600), "red").save(filename, exif=exif)
+    with Image.open(cache.get("abc", filename, size)) as im:
+        assert im.size == expected
+
+
+def test_reduced_decoding(source):
+    decoded_sizes = []
+    original_load = Image.Image.load
+
+    def load(im):
+        decoded_sizes.append(im.size)
+        return original_load(im)
+
+    with patch.object(Image.Image, "load", load):
+        thumbnails.render(source, 64, io.BytesIO())
+    assert decoded_sizes[0] == (200, 150)
@@ -35,3 +35,55 @@ def test_new_social_login(dbsession):
     connection = user.oauth_connection[0]
     assert connection.provider_id == "github"
     assert connection.provider_user_id == "123456789"
+
+
+def test_may_access_station(dbsession, seed, query_counter):
+    assert core.User.may_access_station(dbsession, "user-red", "station-red")
+    query_counter.count = 0
+    assert core.User.may_access_station(dbsession, "user-red", "station-red")
+    assert not core.User.may_access_station(
+        dbsession, "user-red", "station-blue"
+    )
+    assert not core.User.may_access_station(
+        dbsession, "unknown-user", "station-red"
+    )
+    # Only the data-version of the assignments is checked
+    assert query_counter.count == 3
+
+
+def test_station_access_after_assignment(dbsession, seed):
+    assert not core.User.may_access_station(dbsession, "john", "station-blue")
+    core.Station.assign_user(dbsession, "station-blue", "john")
+    dbsession.commit()
+    assert core.User.may_access_station(dbsession, "john", "station-blue")
+    core.User.unassign_station(dbsession, "john", "station-blue")
+    dbsession.commit()
+    assert not core.User.may_access_station(dbsession, "john", "station-blue")
+
+
+def test_station_access_cleared_on_commit(dbsession, seed):
+    core.Station.assign_user(dbsession, "station-blue", "john")
+    # Loading the index before the commit must not leave it stale
+    assert core.User.stations(dbsession, "john") == ["station-blue"]
+    core.STATION_ACCESS._index = {}
+    dbsession.commit()
+    assert core.User.stations(dbsession, "john") == ["station-blue"]
+
+
+def test_station_access_discarded_on_rollback(dbsession, seed):
+    core.Station.assign_user(dbsession, "station-blue", "john")
+    # The pending assignment is only visible in its own transaction
+    assert core.User.may_access_station(dbsession, "john", "station-blue")
+    assert core.STATION_ACCESS._index is None
+    dbsession.rollback()
+    assert not core.User.may_access_station(dbsession, "john", "station-blue")
+
+
+def test_station_access_changed_by_other_process(dbsession, seed):
+    core.User.stations(dbsession, "john")
+    stale = core.STATION_ACCESS._index
+    core.Station.assign_user(dbsession, "station-blue", "john")
+    dbsession.commit()
+    # Other processes still hold the index loaded before the change
+    core.STATION_ACCESS._index = stale
+    assert core.User.may_access_station(dbsession, "john", "station-blue")
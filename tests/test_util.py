@@ -1,4 +1,13 @@
 import unittest
+from time import time
+from unittest.mock import patch
+
+import flask
+import jwt
+import pytest
+
+from powonline import util
+from powonline.exc import AccessDenied
 
 
 class TestUtil(unittest.TestCase):
@@ -9,3 +18,57 @@ class TestUtil(unittest.TestCase):
         Just test that importing works without a hitch
         """
         from powonline import util
+
+
+@pytest.fixture
+def token_cache():
+    util.TOKEN_CACHE.clear()
+    yield util.TOKEN_CACHE
+    util.TOKEN_CACHE.clear()
+
+
+def auth_header(payload):
+    return {"Authorization": "Bearer %s" % jwt.encode(payload, "testing")}
+
+
+def test_token_decoded_once(app, token_cache):
+    headers = auth_header({"username": "john", "roles": ["staff"]})
+    with patch("powonline.util.jwt.decode", wraps=jwt.decode) as decode:
+        for _ in range(2):
+            with app.test_request_context(headers=headers):
+                util.get_user_permissions(flask.request)
+                identity, permissions = util.get_user_permissions(flask.request)
+    assert decode.call_count == 1
+    assert identity["username"] == "john"
+    assert permissions == {"view_team_contact"}
+
+
+def test_invalid_token_not_cached(app, token_cache):
+    headers = {"Authorization": "Bearer %s" % jwt.encode({}, "wrong")}
+    for _ in range(2):
+        with app.test_request_context(headers=headers):
+            with pytest.raises(AccessDenied):
+                util.get_user_identity(flask.request)
+
+
+def test_token_cache_respects_exp(token_cache):
+    key = util.TokenCache.key("secret", "token")
+    token_cache.set(key, {"exp": time() - 1})
+    assert token_cache.get(key) is None
+    token_cache.set(key, {"exp": time() + 60})
+    assert token_cache.get(key) is not None
+
+
+def test_token_cache_bounded():
+    cache = util.TokenCache(2, 60)
+    for token in ("a", "b", "c"):
+        cache.set(util.TokenCache.key("secret", token), {})
+    assert cache.get(util.TokenCache.key("secret", "a")) is None
+    assert cache.get(util.TokenCache.key("secret", "c")) == {}
+
+
+def test_permissions_per_role_combination():
+    first = util.permissions_for(frozenset({"staff", "station_manager"}))
+    second = util.permissions_for(frozenset({"station_manager", "staff"}))
+    assert first is second
+    assert first == {"view_team_contact", "manage_station"}